@@ -1,20 +1,43 @@
+import asyncio
 import orjson
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Dict
 import uvicorn
 
 from backend import settings
-from backend.services.llm.factory import build_clients, pick_client
+from backend.services.llm import get_registry, ratelimit, transport
+from backend.services.llm.factory import get_response_cache, pick_client
+from backend.services.plan_cache import get_fragment_cache, get_plan_cache
+
+# 后台任务的强引用，避免任务在完成前被回收
+_background_tasks: set = set()
 
 def _orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预热 LLM 连接并监听配置变化，关闭时释放长连接池"""
+    registry = get_registry()
+    # 预热在后台进行，网络不可用时不拖慢启动（每个提供商最长等待 5 秒）
+    warm_up = asyncio.create_task(registry.warm_up()) if settings.LLM_WARMUP else None
+    registry.start_watching()
+    yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+    registry.stop_watching()
+    await transport.aclose()
+    transport.shutdown()
+
 app = FastAPI(
     title="Trip App Backend",
     description="智能行程生成系统后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -29,7 +52,7 @@ app.add_middleware(
 @app.get("/api/ai/providers")
 async def ai_providers_status():
     """获取已配置的AI提供商状态"""
-    clients = build_clients()
+    clients = get_registry().clients()
     return {
         "primary": settings.LLM_PRIMARY,
         "providers": [
@@ -38,16 +61,61 @@ async def ai_providers_status():
             # 也把未配置但支持的列出来
             *[
                 {"name": n, "configured": False}
-                for n in ["openai", "aliyun", "openrouter", "ollama", "dify"]
+                for n in ["openai", "aliyun", "openrouter", "ollama", "openai_fallback", "dify", "router"]
                 if n not in clients
             ]
         ]
     }
 
+@app.get("/api/ai/cache/stats")
+async def ai_cache_stats():
+    """LLM 响应缓存统计（命中/未命中/字节数）"""
+    if not settings.LLM_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_response_cache().stats()}
+
+@app.get("/api/ai/plan-cache/stats")
+async def plan_cache_stats():
+    """行程缓存统计（命中层级、陈旧返回、淘汰、后台刷新次数），fragments 为行程片段缓存"""
+    return {**get_plan_cache().stats(), "fragments": get_fragment_cache().stats()}
+
+@app.get("/api/ai/router/stats")
+async def ai_router_stats():
+    """多提供商路由统计：各提供商 p50/p95 延迟、错误率、熔断状态"""
+    router = get_registry().clients().get("router")
+    if router is None:
+        return {"enabled": False}
+    return {"enabled": True, **router.stats()}
+
+@app.get("/api/ai/ratelimit/stats")
+async def ai_ratelimit_stats():
+    """LLM 限流器统计：队列深度、等待时长、429 次数、当前速率比例"""
+    limiter = ratelimit.get_rate_limiter()
+    if limiter is None:
+        return {"enabled": False}
+    return {"enabled": True, **limiter.stats()}
+
+@app.get("/api/ai/registry")
+async def ai_registry_status():
+    """LLM 客户端注册表状态：配置版本、已打开的连接池"""
+    return get_registry().status()
+
+@app.post("/api/ai/registry/reload")
+async def ai_registry_reload():
+    """重新加载 .env 并重建 LLM 客户端（在途请求不受影响）"""
+    registry = get_registry()
+    reloaded = registry.reload()
+    if reloaded and settings.LLM_WARMUP:
+        # 预热在后台进行，不让接口等待网络
+        task = asyncio.create_task(registry.warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return {"reloaded": reloaded, **registry.status()}
+
 # ------- 2) 对话接口：统一入口 -------
 class ChatBody(BaseModel):
     messages: List[Dict[str, str]] = Field(..., description="OpenAI 格式消息")
-    provider: str | None = Field(None, description="可选：openai/aliyun/openrouter/ollama/dify")
+    provider: str | None = Field(None, description="可选：openai/aliyun/openrouter/ollama/openai_fallback/dify/router")
     model: str | None = None
     temperature: float = 0.7
 
@@ -61,6 +129,28 @@ async def ai_chat(body: ChatBody):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/ai/chat/stream")
+async def ai_chat_stream(body: ChatBody):
+    """统一的AI流式对话接口（SSE）：逐段返回 {"delta": ...}，结束时发送 done 事件"""
+    try:
+        client = pick_client(body.provider)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        try:
+            async for delta in client.chat_stream(body.messages, model=body.model, temperature=body.temperature):
+                yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+            yield b"event: done\ndata: " + orjson.dumps({"provider": client.name}) + b"\n\n"
+        except Exception as e:
+            yield b"event: error\ndata: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 注意：原有的Flask路由（如 /api/trips/generate, /api/generate_itinerary 等）
 # 仍然在 backend/routes.py 中定义，需要通过Flask应用运行
 # 如果需要完全迁移到FastAPI，需要将Flask路由逐步转换为FastAPI路由
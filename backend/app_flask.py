@@ -5,9 +5,15 @@ Flask应用（保留原有路由）
 from flask import Flask
 from flask_cors import CORS
 from backend.config import Config
-from backend.models import db
-from backend.routes import api
+from backend.models import db, upgrade_schema
+from backend.routes import api, cache_warmer
+from backend.services.job_service import job_runner
+from backend.services.pdf_renderer import get_pdf_renderer
+from backend import settings
+from backend.services.llm import get_registry, transport
+import atexit
 import os
+import threading
 
 def create_app():
     app = Flask(__name__)
@@ -20,9 +26,38 @@ def create_app():
     # 注册蓝图
     app.register_blueprint(api)
     
+    # LLM 长连接池：启动后台事件循环并在后台预热连接（不阻塞启动），监听配置变化，进程退出时关闭
+    transport.start()
+    registry = get_registry()
+    if settings.LLM_WARMUP:
+        transport.spawn(registry.warm_up())
+    registry.start_watching()
+    atexit.register(registry.stop_watching)
+    atexit.register(transport.shutdown)
+    
+    # 行程缓存预热：按请求热度定时预生成 / 提前刷新热门行程
+    if settings.WARMER_ENABLED:
+        cache_warmer.start()
+        atexit.register(cache_warmer.stop)
+    
     # 创建数据库表
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        # 上次进程退出时未完成的异步任务标记为失败，避免客户端一直等待
+        job_runner.fail_stale()
+    atexit.register(job_runner.shutdown)
+    
+    # PDF 渲染进程池：在后台线程拉起工作进程并预加载样式与字体（不阻塞启动），首个导出请求无需等待
+    pdf_renderer = get_pdf_renderer()
+    if settings.PDF_RENDER_WARMUP:
+        def _warm_up_pdf_renderer():
+            try:
+                pdf_renderer.warm_up()
+            except Exception as e:
+                app.logger.warning(f"PDF renderer warm-up failed: {e}")
+        threading.Thread(target=_warm_up_pdf_renderer, name="pdf-render-warmup", daemon=True).start()
+    atexit.register(pdf_renderer.shutdown)
     
     return app
 
@@ -4,6 +4,30 @@ import json
 
 db = SQLAlchemy()
 
+# create_all 不会给已存在的表加列；这里列出后续新增的可空列，启动时按模型定义补齐
+ADDED_COLUMNS = {
+    'trips': ['snapshot'],
+}
+
+def upgrade_schema():
+    """为已有数据库补上新增的可空列与索引（无迁移工具时的轻量替代）"""
+    inspector = db.inspect(db.engine)
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for name in columns:
+            if name not in existing:
+                # 列类型按当前数据库方言编译（如 LargeBinary：SQLite 为 BLOB，Postgres 为 BYTEA）
+                ddl_type = db.metadata.tables[table].c[name].type.compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl_type}'))
+    db.session.commit()
+
+    # create_all 同样不会给已存在的表建索引（如键集分页依赖的 ix_trips_created_at_id）
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
 class Trip(db.Model):
     """行程主表"""
     __tablename__ = 'trips'
@@ -17,10 +41,27 @@ class Trip(db.Model):
     priority = db.Column(db.String(50))  # 价格优先/效率优先/风景优先等
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    snapshot = db.deferred(db.Column(db.LargeBinary))  # orjson 编码的 to_dict() 结果，每次写入时更新
     
     # 关联
     days_plans = db.relationship('DayPlan', backref='trip', lazy=True, cascade='all, delete-orphan')
     
+    # 列表接口按 (created_at, id) 做键集分页
+    __table_args__ = (db.Index('ix_trips_created_at_id', 'created_at', 'id'),)
+    
+    def to_summary(self):
+        """列表用的摘要：不含每日计划与活动"""
+        return {
+            'id': self.id,
+            'city': self.city,
+            'days': self.days,
+            'preferences': json.loads(self.preferences) if self.preferences else {},
+            'pace': self.pace,
+            'transport_mode': self.transport_mode,
+            'priority': self.priority,
+            'created_at': self.created_at.isoformat()
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -119,3 +160,38 @@ class Route(db.Model):
             'route_data': json.loads(self.route_data) if self.route_data else None
         }
 
+
+class TripJob(db.Model):
+    """异步行程生成任务"""
+    __tablename__ = 'trip_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)  # trips.generate / generate_trip
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued/running/succeeded/failed
+    stage = db.Column(db.String(50))  # 当前阶段：planning / enriching / saving ...
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    params = db.Column(db.Text)  # JSON格式存储请求参数
+    result = db.Column(db.Text)  # JSON格式存储结果
+    error = db.Column(db.Text)
+    trip_id = db.Column(db.Integer, db.ForeignKey('trips.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self, include_result=True):
+        data = {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'error': self.error,
+            'trip_id': self.trip_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_result:
+            data['result'] = json.loads(self.result) if self.result else None
+        return data
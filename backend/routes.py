@@ -1,158 +1,182 @@
-from flask import Blueprint, request, jsonify, send_file
-from backend.models import db, Trip, DayPlan, Activity, Route
+from flask import Blueprint, Response, abort, current_app, request, jsonify, stream_with_context, url_for
+from backend.models import db, Trip, DayPlan, Activity, Route, TripJob
 from backend.services.ai_service import AIService
+from backend.services.cache_warmer import CacheWarmer
+from backend.services.trip_enrichment import enrich_trip_plan
+from backend.services.job_service import JobQueueFull, job_runner
 from backend.services.map_service import MapService
 from backend.services.price_service import PriceService
-from backend.services.export_service import ExportService
+from backend.services.pdf_renderer import PdfRenderTimeout
 from backend.services.poi_service import POIService
 from backend.services.travel_api_service import TravelAPIService
 from backend.services.ai_assistant_service import AIAssistantService
 from backend.services.mcp_client import MCPClient
+from backend.services import bulk_export, export_cache, trip_map, trip_patch, trip_snapshot, trip_writer
+from backend.utils.http_cache import attachment_headers, compress_response, conditional_response
 from backend.schemas import (
     ItineraryRequest, ItineraryResponse, ErrorResponse,
     ActivityResponse, DayPlanResponse
 )
 from backend.config import Config
+from backend import settings
 from datetime import datetime, timedelta
 from pydantic import ValidationError
+from sqlalchemy.orm import selectinload
+import base64
 import json
-import io
+import orjson
 import requests
 import logging
 
 api = Blueprint('api', __name__, url_prefix='/api')
+api.after_request(compress_response)
 
 ai_service = AIService()
 map_service = MapService()
 price_service = PriceService()
-export_service = ExportService()
 poi_service = POIService()
 travel_api_service = TravelAPIService()
 ai_assistant_service = AIAssistantService()
 mcp_client = MCPClient()
+cache_warmer = CacheWarmer(ai_service)
+
+def _wants_async(data):
+    """请求体 async=true、查询参数 ?async=1 或请求头 Prefer: respond-async 时改用异步任务模式"""
+    flag = request.args.get('async') or (data or {}).get('async')
+    return str(flag).lower() in ('1', 'true', 'yes') or 'respond-async' in request.headers.get('Prefer', '')
+
+def _submit_job(kind, params, fn):
+    """提交后台任务，返回 202 与任务 id；排队已满时返回 503"""
+    try:
+        job = job_runner.submit(current_app._get_current_object(), kind, params, fn)
+    except JobQueueFull:
+        return jsonify({'error': '当前生成任务较多，请稍后重试'}), 503, {'Retry-After': '10'}
+    status_url = url_for('api.get_job', job_id=job.id)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'events_url': url_for('api.job_events', job_id=job.id)
+    }), 202, {'Location': status_url}
+
+def _progress(ctx, stage, progress):
+    if ctx is not None:
+        ctx.progress(stage, progress)
+
+def _generate_and_save_trip(params, ctx=None):
+    """生成行程 -> 补全地理编码/价格/路线 -> 批量写库，返回 trip id（同步接口与异步任务共用）"""
+    city = params['city']
+    days = params['days']
+    preferences = params.get('preferences', [])
+    pace = params.get('pace', '中庸')
+    transport_mode = params.get('transport_mode', 'driving')
+    priority = params.get('priority', '效率优先')
+    
+    # 使用AI生成行程
+    _progress(ctx, 'planning', 10)
+    trip_plan = ai_service.generate_trip_plan(
+        city, days, preferences, pace, transport_mode, priority
+    )
+    
+    # 地理编码、价格、评价与路线整趟并发获取，全部就绪后再写数据库
+    _progress(ctx, 'enriching', 50)
+    enriched_days = enrich_trip_plan(trip_plan, city, transport_mode, map_service, price_service, ai_service)
+    
+    # 批量写入：各表一次 executemany，id 在内存中分配（外部调用期间不持有数据库事务）
+    _progress(ctx, 'saving', 90)
+    start_date = datetime.now().date()
+    day_rows = []
+    for enriched in enriched_days:
+        day_data = enriched['day']
+        activities = []
+        for item in enriched['activities']:
+            act_data, location = item['data'], item['location']
+            reviews, price_info = item['reviews'], item['price']
+            activities.append({
+                'name': act_data.get('name', ''),
+                'type': act_data.get('type', ''),
+                'address': act_data.get('address', ''),
+                'latitude': location['latitude'] if location else None,
+                'longitude': location['longitude'] if location else None,
+                'start_time': datetime.strptime(act_data.get('start_time', '09:00'), '%H:%M').time(),
+                'end_time': datetime.strptime(act_data.get('end_time', '12:00'), '%H:%M').time(),
+                'duration_minutes': act_data.get('duration_minutes', 180),
+                'description': act_data.get('description', '') or reviews.get('summary', ''),
+                'rating': reviews.get('rating', 4.5),
+                'price_range': price_info.get('price_range', '$$'),
+                'price_estimate': price_info.get('price_estimate', 50),
+                'tags': json.dumps(reviews.get('tags', []), ensure_ascii=False),
+                'order': act_data.get('order', 1)
+            })
+        routes = [{
+            'from': leg['from'],
+            'to': leg['to'],
+            'transport_mode': transport_mode,
+            'duration_minutes': leg['info']['duration_minutes'],
+            'distance_km': leg['info']['distance_km'],
+            'route_data': json.dumps(leg['info'].get('polyline'), ensure_ascii=False) if leg['info'].get('polyline') else None
+        } for leg in enriched['routes']]
+        day_rows.append({
+            'day_number': day_data['day_number'],
+            'date': start_date + timedelta(days=day_data['day_number'] - 1),
+            'description': day_data.get('description'),
+            'activities': activities,
+            'routes': routes
+        })
+    
+    trip_id = trip_writer.insert_trip({
+        'city': city,
+        'days': days,
+        'preferences': json.dumps(preferences, ensure_ascii=False),
+        'pace': pace,
+        'transport_mode': transport_mode,
+        'priority': priority
+    }, day_rows)
+    return trip_id
+
+def _generate_trip_job(params, ctx):
+    trip_id = _generate_and_save_trip(params, ctx)
+    return {'trip_id': trip_id, 'trip_url': f'/api/trips/{trip_id}'}
 
 @api.route('/trips/generate', methods=['POST'])
 def generate_trip():
-    """生成行程"""
+    """生成行程（async=true 时返回 202 与任务 id，后台生成）"""
     try:
         data = request.json
         city = data.get('city')
         days = data.get('days')
-        preferences = data.get('preferences', [])
-        pace = data.get('pace', '中庸')
-        transport_mode = data.get('transport_mode', 'driving')
-        priority = data.get('priority', '效率优先')
         
         if not city or not days:
             return jsonify({'error': '城市和天数为必填项'}), 400
         
-        # 使用AI生成行程
-        trip_plan = ai_service.generate_trip_plan(
-            city, days, preferences, pace, transport_mode, priority
-        )
+        params = {
+            'city': city,
+            'days': days,
+            'preferences': data.get('preferences', []),
+            'pace': data.get('pace', '中庸'),
+            'transport_mode': data.get('transport_mode', 'driving'),
+            'priority': data.get('priority', '效率优先')
+        }
+        if _wants_async(data):
+            return _submit_job('trips.generate', params, _generate_trip_job)
         
-        # 创建Trip记录
-        trip = Trip(
-            city=city,
-            days=days,
-            preferences=json.dumps(preferences, ensure_ascii=False),
-            pace=pace,
-            transport_mode=transport_mode,
-            priority=priority
-        )
-        db.session.add(trip)
-        db.session.flush()
-        
-        # 处理地理编码和路线
-        start_date = datetime.now().date()
-        
-        for day_data in trip_plan.get('days', []):
-            day_plan = DayPlan(
-                trip_id=trip.id,
-                day_number=day_data['day_number'],
-                date=start_date + timedelta(days=day_data['day_number'] - 1),
-                description=day_data.get('description')
-            )
-            db.session.add(day_plan)
-            db.session.flush()
-            
-            # 处理活动
-            for act_data in day_data.get('activities', []):
-                # 地理编码
-                address = act_data.get('address', '')
-                location = None
-                if address:
-                    location = map_service.geocode_address(address)
-                
-                # 获取评价
-                reviews = ai_service.get_reviews_summary(
-                    act_data.get('name', ''), city
-                )
-                
-                # 价格估算
-                price_info = price_service.estimate_activity_price(
-                    act_data.get('name', ''),
-                    act_data.get('type', ''),
-                    city
-                )
-                
-                activity = Activity(
-                    day_plan_id=day_plan.id,
-                    name=act_data.get('name', ''),
-                    type=act_data.get('type', ''),
-                    address=address,
-                    latitude=location['latitude'] if location else None,
-                    longitude=location['longitude'] if location else None,
-                    start_time=datetime.strptime(act_data.get('start_time', '09:00'), '%H:%M').time(),
-                    end_time=datetime.strptime(act_data.get('end_time', '12:00'), '%H:%M').time(),
-                    duration_minutes=act_data.get('duration_minutes', 180),
-                    description=act_data.get('description', '') or reviews.get('summary', ''),
-                    rating=reviews.get('rating', 4.5),
-                    price_range=price_info.get('price_range', '$$'),
-                    price_estimate=price_info.get('price_estimate', 50),
-                    tags=json.dumps(reviews.get('tags', []), ensure_ascii=False),
-                    order=act_data.get('order', 1)
-                )
-                db.session.add(activity)
-                db.session.flush()
-                
-                # 计算与前一个活动的路线
-                if activity.order > 1:
-                    prev_activity = Activity.query.filter_by(
-                        day_plan_id=day_plan.id,
-                        order=activity.order - 1
-                    ).first()
-                    
-                    if prev_activity and prev_activity.latitude and activity.latitude:
-                        route_info = map_service.calculate_route(
-                            prev_activity.latitude, prev_activity.longitude,
-                            activity.latitude, activity.longitude,
-                            transport_mode
-                        )
-                        
-                        route = Route(
-                            from_activity_id=prev_activity.id,
-                            to_activity_id=activity.id,
-                            transport_mode=transport_mode,
-                            duration_minutes=route_info['duration_minutes'],
-                            distance_km=route_info['distance_km'],
-                            route_data=json.dumps(route_info.get('polyline'), ensure_ascii=False) if route_info.get('polyline') else None
-                        )
-                        db.session.add(route)
-        
-        db.session.commit()
-        
-        return jsonify(trip.to_dict()), 201
+        return _trip_response(_generate_and_save_trip(params), 201)
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _trip_response(trip_id, status=200):
+    """直接返回存储的行程快照（orjson 字节），不加载 ORM 对象；快照未变时按 If-None-Match 返回 304"""
+    snapshot = trip_snapshot.get(trip_id)
+    if snapshot is None:
+        abort(404)
+    return conditional_response(snapshot, status=status)
+
 @api.route('/trips/<int:trip_id>', methods=['GET'])
 def get_trip(trip_id):
     """获取行程详情"""
-    trip = Trip.query.get_or_404(trip_id)
-    return jsonify(trip.to_dict())
+    return _trip_response(trip_id)
 
 @api.route('/trips/<int:trip_id>/adjust', methods=['PUT'])
 def adjust_trip(trip_id):
@@ -165,133 +189,156 @@ def adjust_trip(trip_id):
         if not new_requirements:
             return jsonify({'error': '请提供调整需求'}), 400
         
-        # 获取当前行程数据
-        current_trip_data = trip.to_dict()
-        
-        # 使用AI调整行程
-        adjusted_plan = ai_service.adjust_trip(current_trip_data, new_requirements)
+        # 只把涉及的天发给 AI，得到增量修改操作后在一个事务中写回数据库
+        patch = ai_service.plan_trip_adjustment(trip.to_dict(), new_requirements)
+        if not patch['ops']:
+            return jsonify({'message': '未生成可应用的调整', 'days': patch['days'], 'trip': trip.to_dict()}), 200
         
-        # 更新行程（简化处理，实际应该更细致地更新）
-        # 这里可以重新生成或更新现有记录
+        summary = trip_patch.apply_to_db(trip, patch['ops'], geocode=map_service.geocode_address)
         
-        return jsonify({'message': '行程已调整', 'trip': adjusted_plan}), 200
+        return jsonify({'message': '行程已调整', **summary, 'trip': trip.to_dict()}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @api.route('/trips/<int:trip_id>/map', methods=['GET'])
 def get_trip_map(trip_id):
-    """获取行程地图数据"""
+    """获取行程地图数据（路线读取已存的 Route 记录，结果按行程版本缓存）"""
     trip = Trip.query.get_or_404(trip_id)
-    
-    map_data = {
-        'city': trip.city,
-        'activities': [],
-        'routes': []
-    }
-    
-    for day_plan in trip.days_plans:
-        for activity in day_plan.activities:
-            if activity.latitude and activity.longitude:
-                map_data['activities'].append({
-                    'id': activity.id,
-                    'name': activity.name,
-                    'latitude': activity.latitude,
-                    'longitude': activity.longitude,
-                    'type': activity.type,
-                    'day': day_plan.day_number,
-                    'order': activity.order
-                })
-    
-    # 获取路线
-    for day_plan in trip.days_plans:
-        activities = sorted(day_plan.activities, key=lambda x: x.order)
-        for i in range(len(activities) - 1):
-            from_act = activities[i]
-            to_act = activities[i + 1]
-            
-            if from_act.latitude and to_act.latitude:
-                route_info = map_service.calculate_route(
-                    from_act.latitude, from_act.longitude,
-                    to_act.latitude, to_act.longitude,
-                    trip.transport_mode
-                )
-                
-                map_data['routes'].append({
-                    'from': {
-                        'id': from_act.id,
-                        'name': from_act.name,
-                        'lat': from_act.latitude,
-                        'lng': from_act.longitude
-                    },
-                    'to': {
-                        'id': to_act.id,
-                        'name': to_act.name,
-                        'lat': to_act.latitude,
-                        'lng': to_act.longitude
-                    },
-                    'duration_minutes': route_info['duration_minutes'],
-                    'distance_km': route_info['distance_km'],
-                    'polyline': route_info.get('polyline')
-                })
-    
-    return jsonify(map_data)
+    return conditional_response(orjson.dumps(trip_map.get_trip_map(trip, map_service)))
 
 @api.route('/trips/<int:trip_id>/export', methods=['POST'])
 def export_trip(trip_id):
-    """导出行程"""
+    """导出行程（按行程快照内容缓存在磁盘，行程未变化时直接返回已渲染的文件）"""
     try:
         trip = Trip.query.get_or_404(trip_id)
         export_format = request.json.get('format', 'pdf')
         
-        trip_data = trip.to_dict()
-        
         if export_format == 'pdf':
-            pdf_buffer = export_service.export_to_pdf(trip_data)
-            return send_file(
-                pdf_buffer,
+            pdf_data = export_cache.get_export_cache().get(trip_snapshot.get(trip.id), 'pdf')
+            # PDF 内容流本身已压缩，只加 ETag，不再做传输压缩
+            return conditional_response(
+                pdf_data,
                 mimetype='application/pdf',
-                as_attachment=True,
-                download_name=f'{trip.city}_{trip.days}日游行程.pdf'
+                headers=attachment_headers(f'{trip.city}_{trip.days}日游行程.pdf')
             )
         elif export_format == 'ics':
-            ics_data = export_service.export_to_ics(trip_data)
-            return send_file(
-                io.BytesIO(ics_data),
+            ics_data = export_cache.get_export_cache().get(trip_snapshot.get(trip.id), 'ics')
+            return conditional_response(
+                ics_data,
                 mimetype='text/calendar',
-                as_attachment=True,
-                download_name=f'{trip.city}_{trip.days}日游行程.ics'
+                headers=attachment_headers(f'{trip.city}_{trip.days}日游行程.ics')
             )
         else:
             return jsonify({'error': '不支持的导出格式'}), 400
             
+    except PdfRenderTimeout as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/trips/export', methods=['POST'])
+def bulk_export_trips():
+    """
+    批量导出：请求体 {"trip_ids": [...]} 或 {"filter": {"city", "created_from", "created_to", "limit"}}，
+    可选 "formats"（默认 ["pdf", "ics"]）；流式返回 ZIP，每个文件渲染完即写出，末尾附 manifest.jsonl
+    """
+    data = request.get_json(silent=True) or {}
+    formats = data.get('formats') or ['pdf', 'ics']
+    if not isinstance(formats, list) or not formats or any(f not in export_cache.RENDERERS for f in formats):
+        return jsonify({'error': f'formats 只支持 {sorted(export_cache.RENDERERS)}'}), 400
+    formats = list(dict.fromkeys(formats))
+
+    trip_ids = data.get('trip_ids')
+    if trip_ids is not None:
+        if not isinstance(trip_ids, list) or not trip_ids or not all(isinstance(i, int) for i in trip_ids):
+            return jsonify({'error': 'trip_ids 必须是非空的整数列表'}), 400
+        trip_ids = list(dict.fromkeys(trip_ids))
+        if len(trip_ids) > settings.BULK_EXPORT_MAX_TRIPS:
+            return jsonify({'error': f'单次最多导出 {settings.BULK_EXPORT_MAX_TRIPS} 个行程'}), 400
+    elif data.get('filter') is not None:
+        try:
+            trip_ids = bulk_export.iter_filtered_ids(bulk_export.parse_filter(data['filter']))
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': f'无效的 filter: {e}'}), 400
+    else:
+        return jsonify({'error': '请提供 trip_ids 或 filter'}), 400
+
+    return Response(
+        stream_with_context(bulk_export.iter_zip(trip_ids, formats)),
+        mimetype='application/zip',
+        headers={**attachment_headers(f'trips_{datetime.utcnow():%Y%m%d%H%M%S}.zip'), 'X-Accel-Buffering': 'no'}
+    )
+
+TRIPS_PAGE_SIZE = 20
+TRIPS_MAX_PAGE_SIZE = 100
+
+def _encode_cursor(trip):
+    raw = json.dumps([trip.created_at.isoformat(), trip.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    created_at, trip_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(trip_id)
+
 @api.route('/trips', methods=['GET'])
 def list_trips():
-    """获取所有行程列表"""
-    trips = Trip.query.order_by(Trip.created_at.desc()).all()
-    return jsonify([trip.to_dict() for trip in trips])
+    """
+    行程列表（按创建时间倒序，键集分页）
+    查询参数：limit（默认 20，最多 100）、cursor（上一页返回的 next_cursor）、
+    detail=full 时返回完整行程（每日计划与活动批量预加载），默认只返回摘要与活动数
+    """
+    limit = min(max(request.args.get('limit', TRIPS_PAGE_SIZE, type=int), 1), TRIPS_MAX_PAGE_SIZE)
+    full = request.args.get('detail') == 'full'
+    
+    query = Trip.query.order_by(Trip.created_at.desc(), Trip.id.desc())
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, trip_id = _decode_cursor(cursor)
+        except (ValueError, TypeError):
+            return jsonify({'error': '无效的 cursor'}), 400
+        query = query.filter(db.or_(
+            Trip.created_at < created_at,
+            db.and_(Trip.created_at == created_at, Trip.id < trip_id)
+        ))
+    if full:
+        query = query.options(selectinload(Trip.days_plans).selectinload(DayPlan.activities))
+    
+    # 多取一条用于判断是否还有下一页
+    trips = query.limit(limit + 1).all()
+    has_more = len(trips) > limit
+    trips = trips[:limit]
+    
+    if full:
+        items = [trip.to_dict() for trip in trips]
+    else:
+        counts = dict(db.session.query(DayPlan.trip_id, db.func.count(Activity.id))
+                      .join(Activity, Activity.day_plan_id == DayPlan.id)
+                      .filter(DayPlan.trip_id.in_([trip.id for trip in trips]))
+                      .group_by(DayPlan.trip_id)
+                      .all()) if trips else {}
+        items = [{**trip.to_summary(), 'activity_count': counts.get(trip.id, 0)} for trip in trips]
+    
+    return jsonify({
+        'items': items,
+        'next_cursor': _encode_cursor(trips[-1]) if has_more else None,
+        'limit': limit
+    })
 
-@api.route('/generate_trip', methods=['POST'])
-def generate_trip_new():
-    """使用 AI + 内部服务生成旅行计划"""
-    import logging
+def _generate_trip_payload(data, ctx=None):
+    """MCP 基础行程，enhanced=true 时再用 AI 增强；AI 失败时返回基础行程（同步接口与异步任务共用）"""
     logger = logging.getLogger(__name__)
+    city = data.get('city')
+    days = data.get('days')
+    preferences = data.get('preferences', [])
+    pace = data.get('pace', '中庸')
+    transport = data.get('transport') or data.get('transport_mode', 'driving')
+    priority = data.get('priority', '效率优先')
 
     try:
-        data = request.json or {}
-        city = data.get('city')
-        days = data.get('days')
-        preferences = data.get('preferences', [])
-        pace = data.get('pace', '中庸')
-        transport = data.get('transport') or data.get('transport_mode', 'driving')
-        priority = data.get('priority', '效率优先')
-
-        if not city or not days:
-            return jsonify({'error': 'city and days are required'}), 400
-
+        _progress(ctx, 'base_itinerary', 10)
         base_plan = mcp_client.generate_itinerary(
             city=city,
             days=int(days),
@@ -308,8 +355,9 @@ def generate_trip_new():
 
         enhanced = bool(data.get('enhanced'))
         if not enhanced:
-            return jsonify(base_plan), 200
+            return base_plan, 200
 
+        _progress(ctx, 'planning', 40)
         plan = ai_service.generate_trip_plan(
             city=city,
             days=int(days),
@@ -321,7 +369,7 @@ def generate_trip_new():
         plan['llm_enhanced'] = True
         plan['source'] = 'llm'
         plan.setdefault('base_itinerary', base_plan)
-        return jsonify(plan), 200
+        return plan, 200
 
     except Exception as exc:
         logger.error('生成行程失败: %s', exc, exc_info=True)
@@ -330,8 +378,28 @@ def generate_trip_new():
             fallback.setdefault('llm_enhanced', False)
             fallback.setdefault('source', 'mcp-fallback')
             fallback.setdefault('notice', 'AI generation failed, returning base itinerary')
-            return jsonify(fallback), 200
-        return jsonify({'error': 'Failed to generate plan'}), 500
+            return fallback, 200
+        return {'error': 'Failed to generate plan'}, 500
+
+def _generate_trip_payload_job(params, ctx):
+    payload, status = _generate_trip_payload(params, ctx)
+    if status != 200:
+        raise RuntimeError(payload.get('error', 'Failed to generate plan'))
+    return payload
+
+@api.route('/generate_trip', methods=['POST'])
+def generate_trip_new():
+    """使用 AI + 内部服务生成旅行计划（async=true 时返回 202 与任务 id，后台生成）"""
+    data = request.json or {}
+    if not data.get('city') or not data.get('days'):
+        return jsonify({'error': 'city and days are required'}), 400
+
+    if _wants_async(data):
+        params = {k: v for k, v in data.items() if k != 'async'}
+        return _submit_job('generate_trip', params, _generate_trip_payload_job)
+
+    payload, status = _generate_trip_payload(data)
+    return jsonify(payload), status
 
 
 @api.route('/generate_trip_dify', methods=['POST'])
@@ -469,6 +537,52 @@ def ai_chat():
             error=f'AI助手服务失败: {str(e)}'
         ).model_dump()), 500
 
+def _sse(data, event=None):
+    """格式化一条 SSE 事件"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n" if event else f"data: {payload}\n\n"
+
+@api.route('/ai/chat/stream', methods=['POST'])
+def ai_chat_stream():
+    """
+    AI助手流式对话接口（text/event-stream）
+    
+    请求体同 /ai/chat；响应为 SSE：
+    data: {"delta": "..."}           逐段回复
+    event: done / data: {...}         结束（含建议）
+    event: error / data: {"error"}    出错
+    """
+    data = request.json or {}
+    user_id = data.get('user_id', 'anonymous')
+    message = data.get('message', '')
+    context = data.get('context', {})
+    
+    if not message:
+        return jsonify(ErrorResponse(
+            error='消息内容不能为空'
+        ).model_dump()), 400
+    
+    def generate():
+        parts = []
+        try:
+            for delta in ai_assistant_service.chat_stream(user_id, message, context):
+                parts.append(delta)
+                yield _sse({'delta': delta})
+            reply = ''.join(parts)
+            yield _sse({
+                'reply': reply,
+                'suggestions': ai_assistant_service._extract_suggestions(reply)
+            }, event='done')
+        except Exception as e:
+            logging.getLogger(__name__).error('AI助手流式服务错误: %s', e)
+            yield _sse({'error': f'AI助手服务失败: {str(e)}'}, event='error')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api.route('/ai/history/<user_id>', methods=['GET'])
 def get_chat_history(user_id):
     """获取用户的对话历史"""
@@ -618,6 +732,69 @@ def get_config_status():
             error=f'获取配置状态失败: {str(e)}'
         ).model_dump()), 500
 
+@api.route('/ai/plan-cache/stats', methods=['GET'])
+def plan_cache_stats():
+    """行程缓存统计（命中层级、陈旧返回、淘汰、后台刷新次数），fragments 为行程片段缓存"""
+    return jsonify({**ai_service.plan_cache.stats(), 'fragments': ai_service.fragment_cache.stats()}), 200
+
+@api.route('/ai/plan-cache/warm', methods=['GET', 'POST'])
+def plan_cache_warm():
+    """缓存预热：GET 查看状态与上次运行结果；POST 立即运行一次（force=true 时忽略低峰时段限制）"""
+    if request.method == 'GET':
+        return jsonify(cache_warmer.status()), 200
+    force = bool((request.get_json(silent=True) or {}).get('force'))
+    report = cache_warmer.run_now(offpeak=True if force else None)
+    return jsonify(report), 200 if report.get('status') == 'ok' else 409
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询异步任务状态（轮询）；完成后 result 为任务结果，行程生成任务同时给出 trip_id"""
+    job = db.session.get(TripJob, job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict()), 200
+
+@api.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    异步任务状态推送（text/event-stream）
+    event: progress / data: {...}     状态或进度变化
+    event: done / data: {...}         成功（含 result）
+    event: error / data: {...}        失败
+    """
+    if db.session.get(TripJob, job_id) is None:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    def generate():
+        version, last = -1, None
+        while True:
+            db.session.expire_all()
+            job = db.session.get(TripJob, job_id)
+            if job is None:
+                # 订阅期间任务记录被删除或清理
+                yield _sse({'id': job_id, 'status': 'failed', 'error': '任务不存在'}, event='error')
+                return
+            if job.status == 'succeeded':
+                yield _sse(job.to_dict(), event='done')
+                return
+            if job.status == 'failed':
+                yield _sse(job.to_dict(include_result=False), event='error')
+                return
+            state = (job.status, job.stage, job.progress)
+            if state != last:
+                last = state
+                yield _sse(job.to_dict(include_result=False), event='progress')
+            else:
+                yield ': keep-alive\n\n'
+            # 本进程执行的任务有变化时立即唤醒；其他进程执行的任务按间隔查库
+            version = job_runner.wait_for_change(job_id, version, settings.JOB_EVENTS_POLL_INTERVAL)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api.route('/health', methods=['GET'])
 def health():
     """健康检查"""
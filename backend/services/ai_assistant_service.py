@@ -3,9 +3,8 @@ AI助手服务
 用于处理客户问题和交互
 使用新的LLM服务架构
 """
-import asyncio
-from typing import List, Dict, Optional
-from backend.services.llm import pick_client, Message
+from typing import Iterator, List, Dict, Optional
+from backend.services.llm import LLMClient, pick_client, transport, Message
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,17 +14,30 @@ class AIAssistantService:
     """AI助手服务：处理客户问答和交互"""
     
     def __init__(self):
-        # 使用新的LLM服务
+        # 使用新的LLM服务（客户端来自进程内注册表）
+        self._llm_client: Optional[LLMClient] = None
         try:
-            self.llm_client = pick_client()
-            logger.info(f"使用LLM提供商: {self.llm_client.name}")
+            logger.info(f"使用LLM提供商: {pick_client().name}")
         except RuntimeError as e:
             logger.warning(f"LLM客户端初始化失败: {e}")
-            self.llm_client = None
         
         # 对话历史存储（实际应用中应使用数据库或Redis）
         self.conversation_history: Dict[str, List[Message]] = {}
     
+    @property
+    def llm_client(self) -> Optional[LLMClient]:
+        """每次从客户端注册表解析，配置热加载后立即生效"""
+        if self._llm_client is not None:
+            return self._llm_client
+        try:
+            return pick_client()
+        except RuntimeError:
+            return None
+    
+    @llm_client.setter
+    def llm_client(self, client: Optional[LLMClient]):
+        self._llm_client = client
+    
     def chat(self, user_id: str, message: str, context: Dict = None) -> Dict:
         """
         处理用户消息并返回AI回复
@@ -53,10 +65,11 @@ class AIAssistantService:
         
         # 调用AI服务
         try:
-            if self.llm_client:
+            client = self.llm_client
+            if client:
                 # 使用新的LLM服务
                 messages = self._build_messages(user_id, system_prompt)
-                reply = asyncio.run(self.llm_client.chat(messages))
+                reply = transport.run_sync(client.chat(messages))
             else:
                 reply = self._chat_fallback(message, context).get("reply", "")
             
@@ -79,6 +92,44 @@ class AIAssistantService:
                 "error": str(e)
             }
     
+    def chat_stream(self, user_id: str, message: str, context: Dict = None) -> Iterator[str]:
+        """
+        流式处理用户消息，逐段产出AI回复内容；结束后把完整回复写入对话历史
+        
+        Args:
+            user_id: 用户ID（用于维护对话历史）
+            message: 用户消息
+            context: 上下文信息（如当前行程、城市等）
+        
+        Yields:
+            回复内容的增量片段
+        """
+        if user_id not in self.conversation_history:
+            self.conversation_history[user_id] = []
+        
+        system_prompt = self._build_system_prompt(context)
+        self.conversation_history[user_id].append({
+            "role": "user",
+            "content": message
+        })
+        
+        client = self.llm_client
+        if not client:
+            reply = self._chat_fallback(message, context).get("reply", "")
+            yield reply
+        else:
+            messages = self._build_messages(user_id, system_prompt)
+            parts: List[str] = []
+            for delta in transport.stream_sync(client.chat_stream(messages)):
+                parts.append(delta)
+                yield delta
+            reply = "".join(parts)
+        
+        self.conversation_history[user_id].append({
+            "role": "assistant",
+            "content": reply
+        })
+    
     def _build_system_prompt(self, context: Dict = None) -> str:
         """构建系统提示词"""
         prompt = """你是一个专业的旅游助手，擅长回答关于旅游规划、景点推荐、行程安排等问题。
@@ -3,126 +3,228 @@ import json
 import logging
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List, Tuple
 
+from backend.services.cache_warmer import get_request_stats
+from backend.services.plan_cache import get_fragment_cache, get_plan_cache
 from backend.services.poi_service import POIService
+from backend.services import trip_patch
 from backend.services.travel_api_service import TravelAPIService
-from backend.services.llm import pick_client
+from backend.services.llm import CachingLLMClient, LLMClient, pick_client, transport
+from backend.utils.canonical import canonical_city, canonical_preferences, canonical_transport
+from backend.utils.frozen import freeze
+from backend.utils.json_stream import IncrementalJSONParser
 import backend.settings as settings
 
 
 class AIService:
     """AI服务：用于生成行程、润色描述等"""
 
-    CACHE_TTL_SECONDS = 6 * 3600  # 6小时缓存
+    # LLM 响应缓存 TTL（仅在启用 CachingLLMClient 时生效）
+    REVIEWS_LLM_TTL = 7 * 24 * 3600  # 景点评价变化慢
+    DESCRIPTION_LLM_TTL = 7 * 24 * 3600
+
+    REVIEW_DEFAULT = {
+        "rating": 4.5,
+        "tags": ["热门", "推荐"],
+        "summary": "用户评价普遍较好，是一个值得游览的景点。"
+    }
+
+    @property
+    def plan_llm_ttl(self) -> float:
+        """行程概要/每日增强的 LLM 缓存时长，与行程缓存一致（调用时读取，不在导入时固定）"""
+        return self.plan_cache.ttl
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.poi_service = POIService()
         self.travel_api_service = TravelAPIService()
-        self.plan_cache: Dict[Any, Dict[str, Any]] = {}
+        self.plan_cache = get_plan_cache()  # 进程内所有实例共享，并与其他 worker 共用共享层
+        self.fragment_cache = get_fragment_cache()  # 行程概要 / 每日增强结果按输入内容缓存
+        self.request_stats = get_request_stats()  # 请求热度，供缓存预热使用
+        self._refresh_tasks: set = set()
+        self._llm_client: LLMClient | None = None  # 显式注入的客户端（测试/脚本用）
         try:
-            self.llm_client = pick_client(settings.LLM_PRIMARY)
-            self.logger.info("AIService using LLM provider: %s", self.llm_client.name)
+            self.logger.info("AIService using LLM provider: %s", pick_client(settings.LLM_PRIMARY).name)
         except Exception as exc:
             self.logger.warning("LLM provider not configured: %s", exc)
-            self.llm_client = None
+
+    @property
+    def llm_client(self) -> LLMClient | None:
+        """每次从客户端注册表解析，配置热加载后立即生效"""
+        if self._llm_client is not None:
+            return self._llm_client
+        try:
+            return pick_client(settings.LLM_PRIMARY)
+        except RuntimeError:
+            return None
+
+    @llm_client.setter
+    def llm_client(self, client: LLMClient | None) -> None:
+        self._llm_client = client
 
     # ------------------------------------------------------------------
     # 公开方法
     # ------------------------------------------------------------------
     def generate_trip_plan(self, city: str, days: int, preferences: List[str],
                            pace: str, transport_mode: str, priority: str) -> Dict[str, Any]:
-        """生成行程计划：优先使用 LLM + 外部 API，失败时回退到本地算法"""
+        """生成行程计划（同步封装，在共享的后台事件循环上执行 generate_trip_plan_async）"""
+        return transport.run_sync(self.generate_trip_plan_async(
+            city, days, preferences, pace, transport_mode, priority
+        ))
+
+    async def generate_trip_plan_async(self, city: str, days: int, preferences: List[str],
+                                       pace: str, transport_mode: str, priority: str,
+                                       concurrency: int | None = None) -> Dict[str, Any]:
+        """
+        生成行程计划：优先使用 LLM + 外部 API，失败时回退到本地算法
+        行程概要与每日增强并发请求，同时在途的 LLM 调用不超过 concurrency（默认 LLM_PLAN_CONCURRENCY）
+        城市、偏好、交通方式先规范化（别名/同义词），等价请求生成同一份行程并共用缓存
+        """
+        city = canonical_city(city)
+        preferences = canonical_preferences(preferences)
+        transport_mode = canonical_transport(transport_mode)
         cache_key = self._cache_key(city, days, preferences, pace, transport_mode, priority)
-        cached = self._get_cached_plan(cache_key)
+        self._record_request(cache_key, city, days, preferences, pace, transport_mode, priority)
+        cached = self.plan_cache.get(cache_key)
         if cached:
-            cache_age = time.time() - cached['timestamp']
             self.logger.info(
-                "Returning cached itinerary for %s (age=%.0fs, metrics=%s)",
+                "Returning %s itinerary for %s (age=%.0fs, metrics=%s)",
+                "stale cached" if cached.stale else "cached",
                 cache_key,
-                cache_age,
-                cached.get("metrics"),
+                time.time() - cached.stored_at,
+                cached.metrics,
             )
-            return self._deep_copy(cached['plan'])
+            if cached.stale:
+                self._schedule_refresh(cache_key, city, days, preferences, pace, transport_mode, priority, concurrency)
+            # 缓存中的行程不可变，只复制顶层供调用方追加字段（写时复制）
+            return cached.plan.copy()
+
+        plan, metrics = await self._build_trip_plan(city, days, preferences, pace, transport_mode, priority, concurrency)
+        plan = freeze(plan)
+        self.plan_cache.set(cache_key, plan, metrics)
+        return plan.copy()
+
+    def _record_request(self, cache_key, city, days, preferences, pace, transport_mode, priority) -> None:
+        """记录请求组合的热度，供缓存预热（CacheWarmer）挑选热门组合；统计失败不影响请求"""
+        try:
+            self.request_stats.record(self.plan_cache.digest(cache_key), {
+                "city": city, "days": int(days), "preferences": list(preferences or []),
+                "pace": pace, "transport_mode": transport_mode, "priority": priority,
+            })
+        except Exception as exc:  # pragma: no cover - 防御性
+            self.logger.warning("Failed to record plan request: %s", exc)
+
+    def _schedule_refresh(self, cache_key, *args) -> None:
+        """陈旧条目已返回给调用方，在当前事件循环上后台重新生成；同一条目只刷新一次"""
+        if not self.plan_cache.try_begin_refresh(cache_key, settings.PLAN_CACHE_REFRESH_LEASE):
+            return
+
+        async def _refresh():
+            ok = False
+            try:
+                plan, metrics = await self._build_trip_plan(*args)
+                # 刷新时 LLM 失败得到的回退行程不覆盖仍可用的旧结果
+                if plan.get('source') != 'fallback':
+                    self.plan_cache.set(cache_key, freeze(plan), metrics)
+                    ok = True
+            except Exception as exc:  # pragma: no cover - 防御性
+                self.logger.error("Background plan refresh failed for %s: %s", cache_key, exc, exc_info=True)
+            finally:
+                self.plan_cache.end_refresh(cache_key, ok)
+
+        task = asyncio.get_running_loop().create_task(_refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
 
+    async def _build_trip_plan(self, city: str, days: int, preferences: List[str], pace: str,
+                               transport_mode: str, priority: str,
+                               concurrency: int | None = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """实际生成行程（不读写行程缓存），返回 (行程, 耗时指标)"""
         metrics = {
             "cache_hit": False,
             "meta_duration": 0.0,
             "day_durations": [],
             "llm_calls": 0,
+            "fragment_hits": 0,
         }
         total_start = time.time()
 
-        base_itinerary = self.poi_service.generate_itinerary(
-            city=city,
-            days=days,
-            preferences=preferences,
-            pace=pace,
-            transport_mode=transport_mode
+        # 基础行程与酒店候选互不依赖，放到线程中并行获取，避免阻塞事件循环
+        check_in_date = (datetime.now() + timedelta(days=7)).date().isoformat()
+        check_out_date = (datetime.now() + timedelta(days=7 + int(days))).date().isoformat()
+        base_itinerary, hotels = await asyncio.gather(
+            asyncio.to_thread(
+                self.poi_service.generate_itinerary,
+                city=city,
+                days=days,
+                preferences=preferences,
+                pace=pace,
+                transport_mode=transport_mode
+            ),
+            # 酒店候选（如果未配置外部 API 会返回空列表）
+            asyncio.to_thread(
+                self.travel_api_service.search_hotels,
+                city=city,
+                check_in=check_in_date,
+                check_out=check_out_date
+            ),
         )
         if base_itinerary.get('error'):
             notice = base_itinerary.pop('error')
             base_itinerary.setdefault('notice', notice)
             base_itinerary.setdefault('source', 'baseline')
 
-        # 酒店候选（如果未配置外部 API 会返回空列表）
-        check_in_date = (datetime.now() + timedelta(days=7)).date().isoformat()
-        check_out_date = (datetime.now() + timedelta(days=7 + int(days))).date().isoformat()
-        hotels = self.travel_api_service.search_hotels(
-            city=city,
-            check_in=check_in_date,
-            check_out=check_out_date
-        )
-
         # 如果未配置 LLM，则直接返回基础行程 + 酒店候选
         if not self.llm_client:
-            result = self._deep_copy(base_itinerary)
+            result = dict(base_itinerary)
             if hotels:
                 result['recommended_hotels'] = hotels[:5]
             result['llm_enhanced'] = False
             result['source'] = 'baseline'
             metrics["total_duration"] = time.time() - total_start
-            self._set_cached_plan(cache_key, result, metrics)
-            return result
+            return result, metrics
 
-        try:
-            meta_start = time.time()
-            plan_meta = self._generate_plan_meta(
-                city=city,
-                days=days,
-                preferences=preferences,
-                pace=pace,
-                transport_mode=transport_mode,
-                priority=priority,
-                base_itinerary=base_itinerary,
-                hotels=hotels,
-            )
-            metrics["meta_duration"] = time.time() - meta_start
-            metrics["llm_calls"] += 1
+        limit = asyncio.Semaphore(max(1, concurrency or settings.LLM_PLAN_CONCURRENCY))
 
-            enhanced_days: List[Dict[str, Any]] = []
-            for day in base_itinerary.get('days', []):
+        async def _meta() -> Dict[str, Any]:
+            async with limit:
+                meta_start = time.time()
+                plan_meta = await self._generate_plan_meta(
+                    city=city,
+                    days=days,
+                    preferences=preferences,
+                    pace=pace,
+                    transport_mode=transport_mode,
+                    priority=priority,
+                    base_itinerary=base_itinerary,
+                    hotels=hotels,
+                    metrics=metrics,
+                )
+                metrics["meta_duration"] = time.time() - meta_start
+                return plan_meta
+
+        async def _day(day: Dict[str, Any]) -> Dict[str, Any]:
+            async with limit:
                 day_start = time.time()
                 try:
-                    enriched = self._enhance_day_details(
+                    enriched = await self._enhance_day_details(
                         city=city,
                         day=day,
                         pace=pace,
                         transport_mode=transport_mode,
                         priority=priority,
+                        metrics=metrics,
                     )
                     metrics["day_durations"].append({
                         "day": day.get('day_number'),
                         "duration": time.time() - day_start
                     })
-                    metrics["llm_calls"] += 1
                     if enriched:
-                        enhanced_days.append(enriched)
-                    else:
-                        # 如果返回空，使用原始数据
-                        self.logger.warning("Day %s enhancement returned empty, using base data", day.get('day_number'))
-                        enhanced_days.append(self._enhance_base_day(day, city))
+                        return enriched
+                    # 如果返回空，使用原始数据
+                    self.logger.warning("Day %s enhancement returned empty, using base data", day.get('day_number'))
+                    return self._enhance_base_day(day, city)
                 except Exception as day_exc:  # pragma: no cover - 防御性
                     self.logger.error("LLM day enhancement failed (day=%s): %s", day.get('day_number'), day_exc, exc_info=True)
                     metrics["day_durations"].append({
@@ -131,7 +233,18 @@ class AIService:
                         "error": str(day_exc)
                     })
                     # 即使失败，也保留基础数据并尝试简单增强
-                    enhanced_days.append(self._enhance_base_day(day, city))
+                    return self._enhance_base_day(day, city)
+
+        try:
+            # 每日任务自行兜底；概要失败时等其余任务结束后再整体回退，避免遗留在途请求
+            plan_meta, *enhanced_days = await asyncio.gather(
+                _meta(),
+                *(_day(day) for day in base_itinerary.get('days', [])),
+                return_exceptions=True,
+            )
+            if isinstance(plan_meta, BaseException):
+                raise plan_meta
+            metrics["day_durations"].sort(key=lambda item: item["day"] or 0)
 
             ai_plan = {}
             if plan_meta:
@@ -147,7 +260,6 @@ class AIService:
             merged_plan['llm_enhanced'] = True
             merged_plan['source'] = 'llm-split'
             metrics["total_duration"] = time.time() - total_start
-            self._set_cached_plan(cache_key, merged_plan, metrics)
             self.logger.info(
                 "Split LLM plan generated in %.2fs (meta=%.2fs, day_segments=%s, llm_calls=%s)",
                 metrics["total_duration"],
@@ -155,10 +267,10 @@ class AIService:
                 metrics["day_durations"],
                 metrics["llm_calls"],
             )
-            return merged_plan
+            return merged_plan, metrics
         except Exception as exc:
             self.logger.error("LLM 生成行程失败: %s", exc, exc_info=True)
-            fallback = self._deep_copy(base_itinerary)
+            fallback = dict(base_itinerary)
             if hotels:
                 fallback['recommended_hotels'] = hotels[:5]
             fallback['llm_enhanced'] = False
@@ -167,7 +279,6 @@ class AIService:
             if 'error' in fallback:
                 fallback.setdefault('notice', fallback.pop('error'))
             metrics["total_duration"] = time.time() - total_start
-            self._set_cached_plan(cache_key, fallback, metrics)
             self.logger.info(
                 "Fallback plan returned in %.2fs after %s LLM calls (meta=%.2fs, day_segments=%s)",
                 metrics["total_duration"],
@@ -175,7 +286,7 @@ class AIService:
                 metrics["meta_duration"],
                 metrics["day_durations"],
             )
-            return fallback
+            return fallback, metrics
 
     def enhance_description(self, activity_name: str, activity_type: str, city: str) -> str:
         default = f"{activity_name}是{city}的一个著名{activity_type}景点，值得一游。"
@@ -188,38 +299,67 @@ class AIService:
             "包含亮点、适合人群以及小贴士，控制在 80-120 字。"
         )
         try:
-            reply = self._chat(system_prompt, user_prompt, temperature=0.8).strip()
+            reply = self._chat(system_prompt, user_prompt, temperature=0.8,
+                               cache_ttl=self.DESCRIPTION_LLM_TTL).strip()
             return reply or default
         except Exception as exc:
             self.logger.error("景点描述生成失败: %s", exc, exc_info=True)
             return default
 
     def adjust_trip(self, current_trip: Dict[str, Any], new_requirements: str) -> Dict[str, Any]:
-        if not self.llm_client:
+        """按需求调整行程 dict，返回调整后的副本（数据库中的行程用 plan_trip_adjustment + trip_patch.apply_to_db）"""
+        patch = self.plan_trip_adjustment(current_trip, new_requirements)
+        if not patch["ops"]:
             return current_trip
+        return trip_patch.apply_to_dict(current_trip, patch["ops"])
+
+    def plan_trip_adjustment(self, current_trip: Dict[str, Any], new_requirements: str) -> Dict[str, Any]:
+        """
+        增量调整：只把需求涉及的天以精简 JSON 发给 LLM，要求返回 JSON Patch 风格的修改操作。
+        返回 {"days": 受影响的天, "ops": 校验后的操作}；LLM 不可用或失败时 ops 为空
+        """
+        day_numbers = trip_patch.find_affected_days(current_trip, new_requirements)
+        result = {"days": day_numbers, "ops": []}
+        if not self.llm_client or not day_numbers:
+            return result
 
-        system_prompt = "你是一个帮助用户微调旅行计划的专家。"
+        compact = json.dumps(trip_patch.compact_days(current_trip, day_numbers),
+                             ensure_ascii=False, separators=(",", ":"))
+        system_prompt = (
+            "你是一个帮助用户微调旅行计划的专家。只输出对行程的修改操作（JSON Patch 风格），"
+            "不要返回完整行程，只修改与用户需求直接相关的内容。"
+        )
         user_prompt = (
-            "以下是当前行程，请根据用户的新需求进行调整并保持 JSON 结构。\n"
-            f"当前行程: {json.dumps(current_trip, ensure_ascii=False, indent=2)}\n"
-            f"用户需求: {new_requirements}"
+            f"用户需求: {new_requirements}\n"
+            f"需要调整的天: {compact}\n"
+            "输出格式: {\"ops\": [操作...]}，操作写法：\n"
+            '- 修改字段: {"op":"replace","path":"/days/<day>/activities/<id>/<字段>","value":...}\n'
+            '- 修改当天概述: {"op":"replace","path":"/days/<day>/description","value":"..."}\n'
+            '- 删除活动: {"op":"remove","path":"/days/<day>/activities/<id>"}\n'
+            '- 新增活动: {"op":"add","path":"/days/<day>/activities/-","value":{"name":"...","type":"...",'
+            '"address":"...","start_time":"HH:MM","end_time":"HH:MM","description":"...","price_estimate":0,"tags":[]}}\n'
+            '- 移到其他天: {"op":"move","from":"/days/<day>/activities/<id>","path":"/days/<另一天>/activities/-"}\n'
+            f"可修改的字段: {', '.join(trip_patch.ACTIVITY_FIELDS)}。"
+            "<day> 只能是上面给出的天，<id> 使用活动的 id；新增景点不要与 other_days_pois 重复。"
+            "务必仅返回一个合法 JSON 对象。"
         )
         try:
-            reply = self._chat(system_prompt, user_prompt, force_json=True)
-            adjusted = self._safe_parse_json(reply)
-            if 'days' not in adjusted:
-                raise ValueError('调整结果缺少 days 字段')
-            return adjusted
+            reply = self._chat(system_prompt, user_prompt, force_json=True, cache_ttl=0)
+            raw_ops = self._safe_parse_json(reply).get("ops")
+            result["ops"] = trip_patch.parse_ops(raw_ops, current_trip, day_numbers)
+            self.logger.info(
+                "Trip adjustment planned: days=%s ops=%s/%s prompt_chars=%s",
+                day_numbers,
+                len(result["ops"]),
+                len(raw_ops) if isinstance(raw_ops, list) else 0,
+                len(user_prompt),
+            )
         except Exception as exc:
             self.logger.error("调整行程失败: %s", exc, exc_info=True)
-            return current_trip
+        return result
 
     def get_reviews_summary(self, activity_name: str, city: str) -> Dict[str, Any]:
-        default = {
-            "rating": 4.5,
-            "tags": ["热门", "推荐"],
-            "summary": "用户评价普遍较好，是一个值得游览的景点。"
-        }
+        default = self._default_review()
         if not self.llm_client:
             return default
 
@@ -229,21 +369,89 @@ class AIService:
             "{\"rating\": 4.6, \"tags\": [\"标签\"], \"summary\": \"一句话摘要\"}"
         )
         try:
-            reply = self._chat(system_prompt, user_prompt, temperature=0.6, force_json=True)
+            reply = self._chat(system_prompt, user_prompt, temperature=0.6, force_json=True,
+                               cache_ttl=self.REVIEWS_LLM_TTL, validate=self._json_has_key("rating", (int, float, str)))
             summary = self._safe_parse_json(reply)
-            return {
-                "rating": summary.get("rating", default["rating"]),
-                "tags": summary.get("tags", default["tags"]),
-                "summary": summary.get("summary", default["summary"])
-            }
+            return self._normalize_review(summary)
         except Exception as exc:
             self.logger.error("获取景点评价摘要失败: %s", exc, exc_info=True)
             return default
 
+    def get_reviews_summaries(self, activity_names: List[str], city: str,
+                              batch_size: int | None = None) -> Dict[str, Dict[str, Any]]:
+        """批量获取评价摘要：每批多个景点合并为一次 LLM 调用，返回 {景点名: 摘要}"""
+        names = list(dict.fromkeys(activity_names))
+        results = {name: self._default_review() for name in names if not name}
+        names = [name for name in names if name]
+        if not self.llm_client:
+            results.update({name: self._default_review() for name in names})
+            return results
+
+        size = max(1, batch_size or settings.REVIEWS_BATCH_SIZE)
+        for start in range(0, len(names), size):
+            results.update(self._summarise_review_batch(names[start:start + size], city))
+        return results
+
+    def _summarise_review_batch(self, names: List[str], city: str) -> Dict[str, Dict[str, Any]]:
+        """单批评价摘要；整批解析失败时二分重试，部分缺失时只重试缺失的景点，请求失败时整批使用默认评价"""
+        if len(names) == 1:
+            return {names[0]: self.get_reviews_summary(names[0], city)}
+
+        system_prompt = "你是一名旅游评价分析师。"
+        user_prompt = (
+            f"请分别汇总游客对 {city} 以下景点的评价：\n"
+            f"{json.dumps(names, ensure_ascii=False)}\n"
+            "返回 JSON 对象，reviews 数组按输入顺序、每个景点一项，name 与输入完全一致，格式为：\n"
+            "{\"reviews\": [{\"name\": \"景点名\", \"rating\": 4.6, \"tags\": [\"标签\"], \"summary\": \"一句话摘要\"}]}"
+        )
+        try:
+            reply = self._chat(system_prompt, user_prompt, temperature=0.6, force_json=True,
+                               cache_ttl=self.REVIEWS_LLM_TTL, validate=self._json_has_key("reviews", list))
+        except Exception as exc:
+            # 请求本身失败（上游 5xx、熔断、限流放弃等）时拆批只会放大调用次数，整批使用默认评价
+            self.logger.warning("批量评价摘要请求失败，使用默认评价 (batch=%s): %s", len(names), exc)
+            return {name: self._default_review() for name in names}
+
+        found: Dict[str, Dict[str, Any]] = {}
+        try:
+            items = self._safe_parse_json(reply).get("reviews")
+            if not isinstance(items, list):
+                raise ValueError("批量评价结果缺少 reviews 数组")
+            items = [item for item in items if isinstance(item, dict)]
+            for item in items:
+                if item.get("name") in names:
+                    found[item["name"]] = self._normalize_review(item)
+            if not found and len(items) == len(names):
+                # 名称被模型改写时按顺序对齐
+                found = {name: self._normalize_review(item) for name, item in zip(names, items)}
+        except ValueError as exc:
+            # 回复无法解析或结构不对：下面拆批重试
+            self.logger.warning("批量评价摘要解析失败 (batch=%s): %s", len(names), exc)
+
+        missing = [name for name in names if name not in found]
+        if len(missing) == len(names):
+            mid = len(names) // 2
+            found.update(self._summarise_review_batch(names[:mid], city))
+            found.update(self._summarise_review_batch(names[mid:], city))
+        elif missing:
+            found.update(self._summarise_review_batch(missing, city))
+        return found
+
+    def _default_review(self) -> Dict[str, Any]:
+        return {**self.REVIEW_DEFAULT, "tags": list(self.REVIEW_DEFAULT["tags"])}
+
+    def _normalize_review(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        default = self._default_review()
+        return {
+            "rating": summary.get("rating", default["rating"]),
+            "tags": summary.get("tags", default["tags"]),
+            "summary": summary.get("summary", default["summary"])
+        }
+
     # ------------------------------------------------------------------
     # 工具方法
     # ------------------------------------------------------------------
-    def _generate_plan_meta(
+    async def _generate_plan_meta(
         self,
         city: str,
         days: int,
@@ -253,6 +461,7 @@ class AIService:
         priority: str,
         base_itinerary: Dict[str, Any],
         hotels: List[Dict[str, Any]],
+        metrics: Dict[str, Any] | None = None,
     ) -> Dict[str, Any]:
         outline = []
         placeholder_mode = (
@@ -294,6 +503,11 @@ class AIService:
             ],
             "placeholder": placeholder_mode,
         }
+        fragment_key = ("meta", payload)
+        cached = self.fragment_cache.get(fragment_key)
+        if cached:
+            self._count(metrics, "fragment_hits")
+            return cached.plan
 
         payload_str = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
 
@@ -338,7 +552,9 @@ class AIService:
                 "重新规划真实、吸引人的景点和体验，并生成详细描述。"
             )
 
-        response_text = self._chat(system_prompt, user_prompt, temperature=0.55, force_json=True)
+        response_text = await self._achat(system_prompt, user_prompt, temperature=0.55, force_json=True,
+                                          cache_ttl=self.plan_llm_ttl, validate=self._json_has_key("summary", str))
+        self._count(metrics, "llm_calls")
         try:
             meta = self._safe_parse_json(response_text)
         except Exception as parse_exc:
@@ -350,15 +566,18 @@ class AIService:
         meta.setdefault("city", city)
         meta.setdefault("pace", pace)
         meta.setdefault("transport_mode", transport_mode)
+        meta = freeze(meta)
+        self.fragment_cache.set(fragment_key, meta, {})
         return meta
 
-    def _enhance_day_details(
+    async def _enhance_day_details(
         self,
         city: str,
         day: Dict[str, Any],
         pace: str,
         transport_mode: str,
         priority: str,
+        metrics: Dict[str, Any] | None = None,
     ) -> Dict[str, Any]:
         minimal_day = {
             "day_number": day.get("day_number"),
@@ -386,6 +605,14 @@ class AIService:
             )
         )
 
+        # 按当天输入内容缓存：节奏/交通方式已体现在活动与时间安排中，优先级只影响措辞，
+        # 因此天数或优先级变化时，活动没变的那些天直接复用
+        fragment_key = ("day", city, minimal_day, placeholder_mode)
+        cached = self.fragment_cache.get(fragment_key)
+        if cached:
+            self._count(metrics, "fragment_hits")
+            return cached.plan
+
         payload = {
             "city": city,
             "pace": pace,
@@ -445,98 +672,108 @@ class AIService:
                 "并生成详细描述、实用贴士和合理价格建议。"
             )
 
-        response_text = self._chat(system_prompt, user_prompt, temperature=0.6, force_json=True)
-        try:
-            result = self._safe_parse_json(response_text)
-        except Exception as parse_exc:
-            self.logger.error(
-                "Day detail parse failed (city=%s day=%s): %s; raw=%s",
-                city,
-                day.get("day_number"),
-                parse_exc,
-                response_text,
-            )
-            raise
+        # 流式接收：每个活动对象一闭合就立即补全字段，响应被截断时保留已完成的活动
+        finalized: List[Dict[str, Any]] = []
+        result, complete = await self._achat_json_stream(
+            system_prompt,
+            user_prompt,
+            temperature=0.6,
+            force_json=True,
+            array_key="activities",
+            on_item=lambda activity: finalized.append(self._finalize_activity(activity, day)),
+            cache_ttl=self.plan_llm_ttl,
+            label=f"{city} day {day.get('day_number')}",
+        )
+        self._count(metrics, "llm_calls")
+        result["activities"] = finalized
         result.setdefault("day_number", day.get("day_number"))
-        
-        # 增强活动信息：确保每个活动都有完整的字段
-        for activity in result.get("activities", []):
-            # 从原始数据中补充缺失字段
-            if day.get("activities"):
-                for orig_act in day.get("activities", []):
-                    if orig_act.get("name") == activity.get("name"):
-                        # 补充地址和坐标
-                        if not activity.get("address"):
-                            activity["address"] = orig_act.get("address", "")
-                        if not activity.get("latitude"):
-                            activity["latitude"] = orig_act.get("latitude")
-                        if not activity.get("longitude"):
-                            activity["longitude"] = orig_act.get("longitude")
-                        # 补充评分
-                        if not activity.get("rating"):
-                            activity["rating"] = orig_act.get("rating", 4.5)
-                        # 补充价格
-                        if not activity.get("price_estimate"):
-                            activity["price_estimate"] = orig_act.get("price_estimate", 50)
+        # 截断后恢复的结果不进片段缓存（LLM 缓存也由 _achat_json_stream 校验完整性），下次请求重新生成完整内容
+        if complete:
+            result = freeze(result)
+            self.fragment_cache.set(fragment_key, result, {})
+        return result
+
+    @staticmethod
+    def _count(metrics: Dict[str, Any] | None, key: str) -> None:
+        if metrics is not None:
+            metrics[key] = metrics.get(key, 0) + 1
+
+    def _finalize_activity(self, activity: Dict[str, Any], day: Dict[str, Any]) -> Dict[str, Any]:
+        """增强活动信息：确保每个活动都有完整的字段"""
+        # 从原始数据中补充缺失字段
+        for orig_act in day.get("activities", []):
+            if orig_act.get("name") == activity.get("name"):
+                # 补充地址和坐标
+                if not activity.get("address"):
+                    activity["address"] = orig_act.get("address", "")
+                if not activity.get("latitude"):
+                    activity["latitude"] = orig_act.get("latitude")
+                if not activity.get("longitude"):
+                    activity["longitude"] = orig_act.get("longitude")
+                # 补充评分
+                if not activity.get("rating"):
+                    activity["rating"] = orig_act.get("rating", 4.5)
+                # 补充价格
+                if not activity.get("price_estimate"):
+                    activity["price_estimate"] = orig_act.get("price_estimate", 50)
+                break
+
+        # 确保有评分
+        if not activity.get("rating"):
+            activity["rating"] = 4.5
+
+        # 确保有价格范围
+        if not activity.get("price_range"):
+            price = activity.get("price_estimate", 0)
+            if price == 0:
+                activity["price_range"] = "免费"
+            elif price < 50:
+                activity["price_range"] = "$"
+            elif price < 150:
+                activity["price_range"] = "$$"
+            elif price < 300:
+                activity["price_range"] = "$$$"
+            else:
+                activity["price_range"] = "$$$$"
+
+        # 确保有足够的标签（至少3个）
+        tags = activity.get("tags", [])
+        if len(tags) < 3:
+            name = activity.get("name", "").lower()
+            desc = activity.get("description", "").lower()
+
+            # 根据关键词自动添加标签
+            tag_keywords = {
+                "文化": ["文化", "历史", "博物馆", "艺术", "展览", "古迹"],
+                "自然": ["自然", "公园", "海滩", "山", "湖", "风景", "生态"],
+                "美食": ["美食", "餐厅", "小吃", "特色", "品尝", "料理"],
+                "购物": ["购物", "市场", "商店", "纪念品", "特产"],
+                "娱乐": ["娱乐", "表演", "演出", "体验", "互动", "活动"],
+                "亲子": ["亲子", "家庭", "儿童", "适合", "孩子"],
+                "摄影": ["摄影", "拍照", "风景", "美景", "打卡"],
+                "放松": ["放松", "休闲", "悠闲", "舒适", "惬意"],
+                "历史": ["历史", "古迹", "遗址", "传统", "文化"],
+                "现代": ["现代", "时尚", "潮流", "都市", "商业"]
+            }
+
+            for tag, keywords in tag_keywords.items():
+                if tag not in tags and any(kw in name or kw in desc for kw in keywords):
+                    tags.append(tag)
+                    if len(tags) >= 5:
                         break
-            
-            # 确保有评分
-            if not activity.get("rating"):
-                activity["rating"] = 4.5
-            
-            # 确保有价格范围
-            if not activity.get("price_range"):
-                price = activity.get("price_estimate", 0)
-                if price == 0:
-                    activity["price_range"] = "免费"
-                elif price < 50:
-                    activity["price_range"] = "$"
-                elif price < 150:
-                    activity["price_range"] = "$$"
-                elif price < 300:
-                    activity["price_range"] = "$$$"
-                else:
-                    activity["price_range"] = "$$$$"
-            
-            # 确保有足够的标签（至少3个）
-            tags = activity.get("tags", [])
+
+            # 如果还不够，添加通用标签
             if len(tags) < 3:
-                name = activity.get("name", "").lower()
-                desc = activity.get("description", "").lower()
-                
-                # 根据关键词自动添加标签
-                tag_keywords = {
-                    "文化": ["文化", "历史", "博物馆", "艺术", "展览", "古迹"],
-                    "自然": ["自然", "公园", "海滩", "山", "湖", "风景", "生态"],
-                    "美食": ["美食", "餐厅", "小吃", "特色", "品尝", "料理"],
-                    "购物": ["购物", "市场", "商店", "纪念品", "特产"],
-                    "娱乐": ["娱乐", "表演", "演出", "体验", "互动", "活动"],
-                    "亲子": ["亲子", "家庭", "儿童", "适合", "孩子"],
-                    "摄影": ["摄影", "拍照", "风景", "美景", "打卡"],
-                    "放松": ["放松", "休闲", "悠闲", "舒适", "惬意"],
-                    "历史": ["历史", "古迹", "遗址", "传统", "文化"],
-                    "现代": ["现代", "时尚", "潮流", "都市", "商业"]
-                }
-                
-                for tag, keywords in tag_keywords.items():
-                    if tag not in tags and any(kw in name or kw in desc for kw in keywords):
-                        tags.append(tag)
-                        if len(tags) >= 5:
-                            break
-                
-                # 如果还不够，添加通用标签
-                if len(tags) < 3:
-                    tags.extend(["推荐", "热门", "必游"])
-                
-                activity["tags"] = tags[:5]  # 最多5个标签
-            
-            # 确保描述足够详细（如果太短，提示需要增强）
-            desc = activity.get("description", "")
-            if len(desc) < 50:
-                self.logger.warning(f"活动 {activity.get('name')} 的描述太短: {len(desc)}字")
-        
-        return result
-    
+                tags.extend(["推荐", "热门", "必游"])
+
+            activity["tags"] = tags[:5]  # 最多5个标签
+
+        # 确保描述足够详细（如果太短，提示需要增强）
+        desc = activity.get("description", "")
+        if len(desc) < 50:
+            self.logger.warning(f"活动 {activity.get('name')} 的描述太短: {len(desc)}字")
+        return activity
+
     def _enhance_base_day(self, day: Dict[str, Any], city: str) -> Dict[str, Any]:
         """在AI增强失败时，对基础数据进行简单增强"""
         enhanced_day = {
@@ -573,18 +810,87 @@ class AIService:
         
         return enhanced_day
 
-    def _chat(self, system_prompt: str, user_prompt: str, temperature: float = 0.7, force_json: bool = False) -> str:
-        if not self.llm_client:
+    def _chat(self, system_prompt: str, user_prompt: str, temperature: float = 0.7, force_json: bool = False,
+              cache_ttl: float | None = None, validate: Callable[[str], bool] | None = None) -> str:
+        return transport.run_sync(self._achat(system_prompt, user_prompt, temperature, force_json, cache_ttl,
+                                              validate))
+
+    async def _achat(self, system_prompt: str, user_prompt: str, temperature: float = 0.7,
+                     force_json: bool = False, cache_ttl: float | None = None,
+                     validate: Callable[[str], bool] | None = None) -> str:
+        client = self.llm_client
+        if not client:
             raise RuntimeError("LLM client is not configured")
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
+        kwargs = {}
+        if cache_ttl is not None and isinstance(client, CachingLLMClient):
+            # validate 不通过的回复（如 JSON 解析失败）不写入 LLM 缓存，避免坏回复在整个 TTL 内被反复命中
+            kwargs.update(ttl=cache_ttl, validate=validate)
         start_time = time.time()
-        result = asyncio.run(self.llm_client.chat(messages, temperature=temperature, force_json=force_json))
+        result = await client.chat(messages, temperature=temperature, force_json=force_json, **kwargs)
         self.logger.info("LLM chat completed in %.2fs", time.time() - start_time)
         return result
 
+    async def _achat_json_stream(self, system_prompt: str, user_prompt: str, temperature: float = 0.7,
+                                 force_json: bool = False, array_key: str | None = None,
+                                 on_item: Callable[[Dict[str, Any]], None] | None = None,
+                                 cache_ttl: float | None = None,
+                                 label: str = "") -> Tuple[Dict[str, Any], bool]:
+        """
+        流式调用 LLM 并增量解析 JSON：array_key 数组中每个元素闭合时回调 on_item；
+        流中途失败或被截断时返回已解析出的可用前缀，完全没有可用内容才抛出异常。
+        返回 (解析结果, 响应是否完整)
+        """
+        client = self.llm_client
+        if not client:
+            raise RuntimeError("LLM client is not configured")
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        parser = IncrementalJSONParser(array_key=array_key)
+        kwargs = {}
+        if cache_ttl is not None and isinstance(client, CachingLLMClient):
+            # 流读完后才写缓存，此时解析器已看到全部内容：被截断（如达到 max_tokens）的回复不进 LLM 缓存
+            kwargs.update(ttl=cache_ttl, validate=lambda _reply: parser.complete)
+
+        start_time = time.time()
+        try:
+            async for delta in client.chat_stream(messages, temperature=temperature, force_json=force_json, **kwargs):
+                for item in parser.feed(delta):
+                    if on_item:
+                        on_item(item)
+        except Exception as exc:
+            if not parser.items:
+                raise
+            self.logger.warning("LLM stream interrupted (%s) after %s items: %s", label, len(parser.items), exc)
+        self.logger.info("LLM stream completed in %.2fs (%s, items=%s)",
+                         time.time() - start_time, label, len(parser.items))
+        try:
+            result = parser.result()
+        except ValueError as parse_exc:
+            if not parser.items:
+                self.logger.error("Streamed JSON parse failed (%s): %s", label, parse_exc)
+                raise
+            result = {array_key: list(parser.items)}
+        if not parser.complete:
+            self.logger.warning("LLM JSON response truncated (%s), recovered prefix with %s items",
+                                label, len(parser.items))
+        return result, parser.complete
+
+    def _json_has_key(self, key: str, kind: type | Tuple[type, ...] = object) -> Callable[[str], bool]:
+        """缓存校验：回复能解析为 JSON 对象且 key 的值为 kind 类型"""
+        def validate(reply: str) -> bool:
+            try:
+                parsed = self._safe_parse_json(reply)
+            except ValueError:
+                return False
+            return isinstance(parsed, dict) and isinstance(parsed.get(key), kind)
+        return validate
+
     def _safe_parse_json(self, text: str) -> Dict[str, Any]:
         if not text:
             raise ValueError("空响应，无法解析 JSON")
@@ -606,7 +912,8 @@ class AIService:
         return json.loads(cleaned)
 
     def _merge_itinerary(self, base: Dict[str, Any], ai_plan: Dict[str, Any], hotels: List[Dict[str, Any]]) -> Dict[str, Any]:
-        result = self._deep_copy(base)
+        # 只替换顶层字段和 days 列表，浅拷贝即可，不修改 base
+        result = dict(base)
         for key in ["city", "summary", "pace", "transport_mode", "total_days"]:
             if ai_plan.get(key):
                 result[key] = ai_plan[key]
@@ -629,7 +936,7 @@ class AIService:
         return result
 
     def _merge_day(self, base_day: Dict[str, Any], ai_day: Dict[str, Any]) -> Dict[str, Any]:
-        merged = self._deep_copy(base_day)
+        merged = dict(base_day)
         for key in ['description', 'summary', 'theme', 'hotel']:
             if ai_day.get(key):
                 merged[key] = ai_day[key]
@@ -690,41 +997,15 @@ class AIService:
         return merged
 
     def _cache_key(self, city: str, days: int, preferences: List[str], pace: str, transport_mode: str, priority: str):
-        pref_key = tuple(sorted(
-            [p.strip().lower() for p in (preferences or []) if isinstance(p, str)]
-        ))
         return (
-            city.strip().lower(),
+            canonical_city(city).lower(),
             int(days),
-            pref_key,
+            tuple(canonical_preferences(preferences)),
             pace.strip().lower() if isinstance(pace, str) else pace,
-            transport_mode.strip().lower() if isinstance(transport_mode, str) else transport_mode,
+            canonical_transport(transport_mode),
             priority.strip().lower() if isinstance(priority, str) else priority,
         )
 
-    def _get_cached_plan(self, key):
-        entry = self.plan_cache.get(key)
-        if not entry:
-            return None
-        if time.time() - entry['timestamp'] > self.CACHE_TTL_SECONDS:
-            self.plan_cache.pop(key, None)
-            return None
-        return entry
-
-    def _set_cached_plan(self, key, plan: Dict[str, Any], metrics: Dict[str, Any]):
-        # 简单的容量控制，避免缓存无限增长
-        if len(self.plan_cache) > 50:
-            oldest_key = min(self.plan_cache.items(), key=lambda item: item[1]['timestamp'])[0]
-            self.plan_cache.pop(oldest_key, None)
-        self.plan_cache[key] = {
-            "plan": self._deep_copy(plan),
-            "timestamp": time.time(),
-            "metrics": metrics,
-        }
-
-    def _deep_copy(self, data: Any) -> Any:
-        return json.loads(json.dumps(data, ensure_ascii=False))
-
     # ------------------------------------------------------------------
     # 旧版 mock 方法保留
     # ------------------------------------------------------------------
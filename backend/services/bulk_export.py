@@ -0,0 +1,149 @@
+"""
+批量导出
+把多趟行程的 PDF / ICS 打包成 ZIP 流式返回：行程按批（BULK_EXPORT_BATCH_SIZE）读取快照，
+每个文件渲染（复用导出文件缓存）并写入 ZIP 后立即交给响应，内存占用只与单个文件大小有关，与行程数量无关。
+最后写入 manifest.jsonl：每趟行程一行，记录包含的文件、大小与 sha256，或失败原因。
+"""
+import hashlib
+import logging
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+import orjson
+from sqlalchemy import select
+
+import backend.settings as settings
+from backend.models import Trip, db
+from backend.services import trip_snapshot
+from backend.services.export_cache import get_export_cache
+
+logger = logging.getLogger(__name__)
+
+# PDF 本身已压缩，存储即可；ICS / manifest 为文本，deflate
+_COMPRESS_TYPE = {'pdf': zipfile.ZIP_STORED}
+
+
+class _ChunkWriter:
+    """不可 seek 的写入目标：zipfile 会改用数据描述符，写入的字节由 drain() 取走交给响应"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parse_filter(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """校验筛选条件：city、created_from / created_to（ISO 日期或时间）、limit；不合法时抛 ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('filter 必须是对象')
+    parsed = {'city': raw.get('city') or None}
+    for field in ('created_from', 'created_to'):
+        parsed[field] = datetime.fromisoformat(raw[field]) if raw.get(field) else None
+    limit = int(raw.get('limit') or settings.BULK_EXPORT_MAX_TRIPS)
+    if limit < 1:
+        raise ValueError('limit 必须大于 0')
+    parsed['limit'] = min(limit, settings.BULK_EXPORT_MAX_TRIPS)
+    return parsed
+
+
+def iter_filtered_ids(filters: Dict[str, Any]) -> Iterator[int]:
+    """按创建时间倒序分批取出符合条件的行程 id（键集翻页，走 ix_trips_created_at_id）"""
+    base = select(Trip.id, Trip.created_at).order_by(Trip.created_at.desc(), Trip.id.desc())
+    if filters.get('city'):
+        base = base.where(Trip.city == filters['city'])
+    if filters.get('created_from'):
+        base = base.where(Trip.created_at >= filters['created_from'])
+    if filters.get('created_to'):
+        base = base.where(Trip.created_at <= filters['created_to'])
+
+    remaining = filters['limit']
+    last = None
+    while remaining > 0:
+        query = base
+        if last is not None:
+            query = query.where(db.or_(
+                Trip.created_at < last.created_at,
+                db.and_(Trip.created_at == last.created_at, Trip.id < last.id)
+            ))
+        rows = db.session.execute(query.limit(min(remaining, settings.BULK_EXPORT_BATCH_SIZE))).all()
+        if not rows:
+            return
+        for row in rows:
+            yield row.id
+        remaining -= len(rows)
+        last = rows[-1]
+
+
+def _batched(iterable: Iterable[int], size: int) -> Iterator[List[int]]:
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _file_name(trip_id: int, city: str, days: int, fmt: str) -> str:
+    city = (city or '').replace('/', '_').replace('\\', '_')
+    return f'{trip_id}_{city}_{days}日游行程.{fmt}'
+
+
+def iter_zip(trip_ids: Iterable[int], formats: List[str]) -> Iterator[bytes]:
+    """逐个文件生成 ZIP 字节流；单趟行程或单个格式失败只记入 manifest，不中断整个导出"""
+    cache = get_export_cache()
+    out = _ChunkWriter()
+    exported = failed = 0
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as manifest, \
+            zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for batch in _batched(trip_ids, settings.BULK_EXPORT_BATCH_SIZE):
+            rows = {row.id: row for row in db.session.execute(
+                select(Trip.id, Trip.city, Trip.days, Trip.snapshot).where(Trip.id.in_(batch))
+            )}
+            for trip_id in batch:
+                row = rows.get(trip_id)
+                if row is None:
+                    failed += 1
+                    manifest.write(orjson.dumps({'trip_id': trip_id, 'error': 'not found'}) + b'\n')
+                    continue
+                entry = {'trip_id': trip_id, 'city': row.city, 'days': row.days, 'files': []}
+                try:
+                    snapshot = row.snapshot or trip_snapshot.get(trip_id)
+                except Exception as exc:
+                    snapshot = None
+                    entry['error'] = str(exc)
+                for fmt in formats if snapshot else ():
+                    try:
+                        data = cache.get(snapshot, fmt)
+                    except Exception as exc:
+                        logger.warning("Bulk export of trip %s (%s) failed: %s", trip_id, fmt, exc)
+                        entry.setdefault('errors', {})[fmt] = str(exc)
+                        continue
+                    name = _file_name(trip_id, row.city, row.days, fmt)
+                    zf.writestr(name, data, compress_type=_COMPRESS_TYPE.get(fmt, zipfile.ZIP_DEFLATED))
+                    entry['files'].append({
+                        'name': name, 'format': fmt, 'bytes': len(data),
+                        'sha256': hashlib.sha256(data).hexdigest(),
+                    })
+                    yield out.drain()
+                if entry['files']:
+                    exported += 1
+                else:
+                    failed += 1
+                manifest.write(orjson.dumps(entry) + b'\n')
+
+        manifest.seek(0)
+        with zf.open('manifest.jsonl', 'w') as dest:
+            shutil.copyfileobj(manifest, dest)
+    yield out.drain()
+    logger.info("Bulk export finished: %s trips exported, %s failed", exported, failed)
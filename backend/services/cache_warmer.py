@@ -0,0 +1,250 @@
+"""
+行程缓存预热
+RequestStats 记录 AIService.generate_trip_plan 收到的请求组合及次数；
+CacheWarmer 在低峰时段按热度预生成 top-K 组合，并在缓存过期前刷新，
+受并发数与单次运行的 LLM 调用预算约束。可通过 tools/warm_plan_cache.py 手动/定时运行，
+也可开启 WARMER_ENABLED 在应用内按 WARMER_INTERVAL 周期运行。
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List
+
+import backend.settings as settings
+from backend.services.plan_cache import PlanCache
+from backend.services.llm import transport
+from backend.utils.frozen import freeze
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """
+    请求热度统计：内存中累加，定期合并写入 SQLite（多个 worker 写同一文件）
+    path 为空时只在进程内统计
+    """
+
+    FLUSH_EVERY = 30.0  # 秒
+    FLUSH_PENDING = 50  # 或累计 N 次未写入时立即写
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending: Counter = Counter()
+        self._params: Dict[str, Dict[str, Any]] = {}
+        self._last_flush = time.time()
+        self._memory: Counter = Counter()
+        self._last_seen: Dict[str, float] = {}
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plan_requests ("
+                " key TEXT PRIMARY KEY, params TEXT NOT NULL,"
+                " hits INTEGER NOT NULL, last_seen REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def record(self, key: str, params: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._pending[key] += 1
+            self._params[key] = params
+            self._memory[key] += 1
+            self._last_seen[key] = now
+            due = sum(self._pending.values()) >= self.FLUSH_PENDING or now - self._last_flush >= self.FLUSH_EVERY
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            params = {key: self._params[key] for key in pending}
+            self._last_flush = time.time()
+            if self._db is None or not pending:
+                return
+            now = time.time()
+            self._db.executemany(
+                "INSERT INTO plan_requests (key, params, hits, last_seen) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET hits = hits + excluded.hits, last_seen = excluded.last_seen",
+                [(key, json.dumps(params[key], ensure_ascii=False), count, now) for key, count in pending.items()],
+            )
+            self._db.commit()
+
+    def top(self, k: int, window_days: float | None = None) -> List[Dict[str, Any]]:
+        """最近 window_days 天内出现过的请求组合，按次数降序"""
+        self.flush()
+        since = time.time() - window_days * 86400 if window_days else 0.0
+        with self._lock:
+            if self._db is None:
+                ranked = [key for key, _ in self._memory.most_common() if self._last_seen[key] >= since][:k]
+                return [{"key": key, "hits": self._memory[key], "params": self._params[key]} for key in ranked]
+            rows = self._db.execute(
+                "SELECT key, params, hits FROM plan_requests WHERE last_seen >= ? ORDER BY hits DESC LIMIT ?",
+                (since, k),
+            ).fetchall()
+        return [{"key": key, "hits": hits, "params": json.loads(params)} for key, params, hits in rows]
+
+    def prune(self, window_days: float) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM plan_requests WHERE last_seen < ?", (time.time() - window_days * 86400,))
+            self._db.commit()
+
+
+def in_offpeak(hours: str, now: datetime | None = None) -> bool:
+    """hours 形如 "1-6"（本地时间 1:00~6:59），支持跨零点 "22-5"；为空表示任何时间"""
+    if not hours:
+        return True
+    start, _, end = hours.partition("-")
+    hour = (now or datetime.now()).hour
+    start, end = int(start), int(end or start)
+    return start <= hour <= end if start <= end else hour >= start or hour <= end
+
+
+class CacheWarmer:
+    """按请求热度预生成/刷新行程缓存"""
+
+    LEASE_NAME = "plan-cache-warmer"
+
+    def __init__(self, ai_service, stats: RequestStats | None = None, top_k: int | None = None,
+                 concurrency: int | None = None, max_llm_calls: int | None = None,
+                 refresh_margin: float | None = None):
+        self.ai_service = ai_service
+        self.plan_cache: PlanCache = ai_service.plan_cache
+        self.stats = stats or get_request_stats()
+        self.top_k = settings.WARMER_TOP_K if top_k is None else top_k
+        self.concurrency = settings.WARMER_CONCURRENCY if concurrency is None else concurrency
+        self.max_llm_calls = settings.WARMER_MAX_LLM_CALLS if max_llm_calls is None else max_llm_calls
+        self.refresh_margin = settings.WARMER_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self.last_report: Dict[str, Any] | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def plan(self, offpeak: bool = True) -> List[Dict[str, Any]]:
+        """
+        选出本次需要生成的组合：低峰时段包括未缓存的热门组合，
+        其他时段只刷新已缓存、剩余新鲜期不足 refresh_margin 的组合
+        """
+        now = time.time()
+        selected = []
+        for candidate in self.stats.top(self.top_k, settings.WARMER_WINDOW_DAYS):
+            params = candidate["params"]
+            entry = self.plan_cache.peek(self.ai_service._cache_key(**params))
+            if entry is None:
+                reason = "cold" if offpeak else None
+            elif entry.stored_at + self.plan_cache.ttl - now < self.refresh_margin:
+                reason = "expiring"
+            else:
+                reason = None
+            if reason:
+                selected.append({**candidate, "reason": reason})
+        return selected
+
+    async def run(self, offpeak: bool | None = None) -> Dict[str, Any]:
+        offpeak = in_offpeak(settings.WARMER_OFFPEAK_HOURS) if offpeak is None else offpeak
+        report: Dict[str, Any] = {
+            "started_at": time.time(), "offpeak": offpeak, "warmed": [], "skipped_budget": 0,
+            "failed": 0, "llm_calls": 0,
+        }
+        if not self.plan_cache.acquire_lease(self.LEASE_NAME, settings.WARMER_INTERVAL or 600):
+            report["status"] = "busy"  # 另一个 worker 正在预热
+            return report
+        try:
+            targets = self.plan(offpeak)
+            limit = asyncio.Semaphore(max(1, self.concurrency))
+            budget = {"remaining": self.max_llm_calls}
+
+            async def _warm(target: Dict[str, Any]) -> None:
+                params = target["params"]
+                # 最坏情况下每天一次 + 概要一次；预算不足时跳过，不透支
+                estimate = int(params.get("days") or 1) + 1
+                async with limit:
+                    if budget["remaining"] < estimate:
+                        report["skipped_budget"] += 1
+                        return
+                    budget["remaining"] -= estimate
+                    try:
+                        plan, metrics = await self.ai_service._build_trip_plan(**params)
+                    except Exception as exc:
+                        report["failed"] += 1
+                        logger.warning("Cache warm failed for %s: %s", params, exc)
+                        return
+                    # 返还按最坏情况预留但实际没用掉的额度（片段缓存命中等）
+                    budget["remaining"] += estimate - metrics.get("llm_calls", 0)
+                    report["llm_calls"] += metrics.get("llm_calls", 0)
+                    if plan.get("source") == "fallback":
+                        report["failed"] += 1
+                        return
+                    self.plan_cache.set(self.ai_service._cache_key(**params), freeze(plan), metrics)
+                    report["warmed"].append({"params": params, "reason": target["reason"],
+                                             "llm_calls": metrics.get("llm_calls", 0)})
+
+            await asyncio.gather(*(_warm(target) for target in targets))
+            report["status"] = "ok"
+            report["candidates"] = len(targets)
+        finally:
+            self.plan_cache.release_lease(self.LEASE_NAME)
+            report["duration"] = round(time.time() - report["started_at"], 3)
+            self.last_report = report
+        logger.info("Plan cache warm-up: %s warmed, %s over budget, %s failed, %s LLM calls",
+                    len(report["warmed"]), report["skipped_budget"], report["failed"], report["llm_calls"])
+        return report
+
+    def run_now(self, offpeak: bool | None = None) -> Dict[str, Any]:
+        """同步封装：在共享的后台事件循环上运行一次预热"""
+        return transport.run_sync(self.run(offpeak))
+
+    # --- 应用内定时运行 -----------------------------------------------
+    def start(self, interval: float | None = None) -> None:
+        interval = settings.WARMER_INTERVAL if interval is None else interval
+        if interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.run_now()
+                    self.stats.prune(settings.WARMER_WINDOW_DAYS)
+                except Exception as exc:  # pragma: no cover - 防御性
+                    logger.error("Plan cache warmer run failed: %s", exc, exc_info=True)
+
+        self._thread = threading.Thread(target=_loop, name="plan-cache-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.WARMER_ENABLED,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "top_k": self.top_k,
+            "concurrency": self.concurrency,
+            "max_llm_calls": self.max_llm_calls,
+            "offpeak_hours": settings.WARMER_OFFPEAK_HOURS,
+            "last_report": self.last_report,
+        }
+
+
+_request_stats: RequestStats | None = None
+_stats_lock = threading.Lock()
+
+
+def get_request_stats() -> RequestStats:
+    """进程内共享的请求热度统计；与行程缓存使用同一个 SQLite 文件（非 sqlite 后端时只在内存统计）"""
+    global _request_stats
+    if _request_stats is None:
+        with _stats_lock:
+            if _request_stats is None:
+                path = settings.PLAN_CACHE_PATH if (settings.PLAN_CACHE_BACKEND or "").lower() == "sqlite" else None
+                _request_stats = RequestStats(path or None)
+    return _request_stats
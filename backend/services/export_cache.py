@@ -0,0 +1,204 @@
+"""
+导出文件缓存
+PDF / ICS 按 (行程快照内容哈希, 格式) 存为磁盘文件，行程未变化时下载直接读文件，不再重新渲染；
+总大小超过 EXPORT_CACHE_MAX_MB 时按最近访问时间（文件 mtime，命中时刷新）淘汰最旧的文件。
+行程生成或调整提交后，由 prerender() 在后台线程预先渲染，首次下载也能命中。
+
+ICS 的日期从导出当天开始排，因此 ICS 的键额外带上当天日期。
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, Iterable
+
+import orjson
+
+import backend.settings as settings
+from backend.services.export_service import ExportService
+from backend.services.pdf_renderer import get_pdf_renderer
+
+logger = logging.getLogger(__name__)
+
+_export_service = ExportService()
+
+RENDERERS: Dict[str, Callable[[dict], bytes]] = {
+    'pdf': lambda trip_data: get_pdf_renderer().render(trip_data),
+    'ics': lambda trip_data: _export_service.export_to_ics(trip_data),
+}
+
+
+class ExportCache:
+    def __init__(self, directory: str, max_bytes: int, renderers: Dict[str, Callable[[dict], bytes]] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.renderers = renderers or RENDERERS
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._size: int | None = None  # 目录总大小估计，超限时重新扫描
+        self._executor: ThreadPoolExecutor | None = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "prerendered": 0, "prerender_errors": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, snapshot: bytes, fmt: str) -> str:
+        h = hashlib.blake2b(snapshot, digest_size=16)
+        h.update(fmt.encode())
+        if fmt == 'ics':
+            h.update(date.today().isoformat().encode())
+        return h.hexdigest()
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def get(self, snapshot: bytes, fmt: str) -> bytes:
+        """返回导出文件内容；未缓存时渲染并写入，同一文件同时只渲染一次"""
+        if fmt not in self.renderers:
+            raise ValueError(f"unsupported export format: {fmt}")
+        key = self.key(snapshot, fmt)
+        path = self._path(key, fmt)
+        data = self._read(path)
+        if data is not None:
+            with self._lock:
+                self._stats["hits"] += 1
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._stats["misses"] += 1
+        if not owner:
+            return future.result()
+        try:
+            data = self.renderers[fmt](orjson.loads(snapshot))
+            self._write(path, data)
+            future.set_result(data)
+            return data
+        except Exception as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _read(self, path: str) -> bytes | None:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # 刷新 mtime 作为最近访问时间
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("Export cache read failed for %s: %s", path, exc)
+            return None
+
+    def _write(self, path: str, data: bytes) -> None:
+        """先写临时文件再原子替换，并发读取不会读到半个文件；写入失败只记录日志"""
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("Export cache write failed for %s: %s", path, exc)
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(data)
+            over = self._size is None or self._size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> None:
+        """按 mtime 从旧到新删除，直到总大小不超过上限（目录可能被多个进程共用，以扫描结果为准）"""
+        try:
+            entries = self._scan()
+        except OSError as exc:
+            logger.warning("Export cache scan failed: %s", exc)
+            return
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning("Export cache evict failed for %s: %s", path, exc)
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self._stats["evictions"] += evicted
+        if evicted:
+            logger.info("Export cache evicted %s files, %s bytes left", evicted, total)
+
+    def prerender(self, snapshot: bytes, formats: Iterable[str] = None) -> None:
+        """后台渲染各格式的导出文件（已缓存的跳过），不阻塞调用方"""
+        formats = list(formats or settings.EXPORT_PRERENDER_FORMATS)
+        if not formats:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, settings.EXPORT_PRERENDER_WORKERS),
+                                                    thread_name_prefix="export-prerender")
+        self._executor.submit(self._prerender, snapshot, formats)
+
+    def _prerender(self, snapshot: bytes, formats: list) -> None:
+        for fmt in formats:
+            try:
+                if not os.path.exists(self._path(self.key(snapshot, fmt), fmt)):
+                    self.get(snapshot, fmt)
+                    with self._lock:
+                        self._stats["prerendered"] += 1
+            except Exception as exc:
+                with self._lock:
+                    self._stats["prerender_errors"] += 1
+                logger.warning("Export prerender (%s) failed: %s", fmt, exc)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "bytes": self._size, "max_bytes": self.max_bytes}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_export_cache: ExportCache | None = None
+_export_cache_lock = threading.Lock()
+
+
+def get_export_cache() -> ExportCache:
+    global _export_cache
+    if _export_cache is None:
+        with _export_cache_lock:
+            if _export_cache is None:
+                _export_cache = ExportCache(settings.EXPORT_CACHE_DIR, int(settings.EXPORT_CACHE_MAX_MB * 1024 * 1024))
+    return _export_cache
+
+
+def prerender(snapshot: bytes) -> None:
+    """行程写入提交后调用；EXPORT_PRERENDER 关闭时不做任何事"""
+    if settings.EXPORT_PRERENDER and snapshot:
+        try:
+            get_export_cache().prerender(snapshot)
+        except Exception as exc:
+            logger.warning("Export prerender scheduling failed: %s", exc)
@@ -6,8 +6,46 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from icalendar import Calendar, Event
 from datetime import datetime, timedelta, time
+from functools import lru_cache
 import io
 
+
+@lru_cache(maxsize=1)
+def pdf_styles():
+    """PDF 用到的段落与表格样式：进程内只构建一次（getSampleStyleSheet 每次调用都会新建整套样式）"""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#2c3e50'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=18,
+        textColor=colors.HexColor('#34495e'),
+        spaceAfter=12,
+        spaceBefore=20
+    )
+    
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
+    ])
+    return styles, title_style, heading_style, table_style
+
+
 class ExportService:
     """导出服务：PDF和ICS格式导出"""
     
@@ -17,24 +55,7 @@ class ExportService:
         doc = SimpleDocTemplate(buffer, pagesize=A4)
         story = []
         
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#2c3e50'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=18,
-            textColor=colors.HexColor('#34495e'),
-            spaceAfter=12,
-            spaceBefore=20
-        )
+        styles, title_style, heading_style, table_style = pdf_styles()
         
         # 标题
         story.append(Paragraph(f"{trip_data['city']} {trip_data['days']}日游行程", title_style))
@@ -73,17 +94,7 @@ class ExportService:
             
             if len(activity_data) > 1:
                 table = Table(activity_data, colWidths=[1.5*inch, 2*inch, 2*inch, 1*inch])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')])
-                ]))
+                table.setStyle(table_style)
                 story.append(table)
             
             story.append(Spacer(1, 0.3*inch))
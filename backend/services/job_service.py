@@ -0,0 +1,136 @@
+"""
+异步任务：行程生成等长耗时请求改为后台执行
+submit() 写入 trip_jobs 表后立即返回任务 id，由有界线程池在应用上下文中执行；
+任务通过 JobContext.progress() 更新阶段与进度，客户端轮询 GET /api/jobs/<id>
+或订阅 GET /api/jobs/<id>/events（SSE）获取状态。状态存数据库，多个 worker 进程都能查询。
+"""
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from sqlalchemy import update
+
+import backend.settings as settings
+from backend.models import TripJob, db
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('succeeded', 'failed')
+
+
+class JobQueueFull(Exception):
+    """排队任务已达上限，调用方应返回 503 并提示稍后重试"""
+
+
+class JobContext:
+    """任务执行期间传给任务函数，用于上报进度"""
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self.runner = runner
+        self.job_id = job_id
+
+    def progress(self, stage: str, progress: int) -> None:
+        self.runner._update(self.job_id, stage=stage, progress=progress)
+
+
+class JobRunner:
+    """有界后台线程池 + 进程内状态变更通知（SSE 无需每次都查库）"""
+
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None):
+        self.max_workers = max_workers or settings.JOB_MAX_WORKERS
+        self.max_pending = settings.JOB_MAX_PENDING if max_pending is None else max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending = 0
+        self._versions: Dict[str, int] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers),
+                                                    thread_name_prefix="trip-job")
+            return self._executor
+
+    def submit(self, app, kind: str, params: Dict[str, Any],
+               fn: Callable[[Dict[str, Any], JobContext], Dict[str, Any]]) -> TripJob:
+        """
+        创建任务并排入线程池；fn(params, ctx) 在应用上下文中执行，返回的 dict 作为任务结果
+        （含 trip_id 时同时写入 trip_jobs.trip_id）
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"too many pending jobs ({self._pending})")
+            self._pending += 1
+        try:
+            job = TripJob(id=uuid.uuid4().hex, kind=kind, status='queued', stage='queued', progress=0,
+                          params=json.dumps(params, ensure_ascii=False))
+            db.session.add(job)
+            db.session.commit()
+            executor.submit(self._run, app, job.id, params, fn)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job
+
+    def _run(self, app, job_id: str, params: Dict[str, Any], fn) -> None:
+        with app.app_context():
+            try:
+                self._update(job_id, status='running', stage='running', started_at=datetime.utcnow())
+                result = fn(params, JobContext(self, job_id))
+                self._update(job_id, status='succeeded', stage='done', progress=100,
+                             trip_id=result.get('trip_id') if isinstance(result, dict) else None,
+                             result=json.dumps(result, ensure_ascii=False), finished_at=datetime.utcnow())
+            except Exception as exc:
+                logger.error("Job %s failed: %s", job_id, exc, exc_info=True)
+                db.session.rollback()
+                self._update(job_id, status='failed', error=str(exc), finished_at=datetime.utcnow())
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def _update(self, job_id: str, **values) -> None:
+        values['updated_at'] = datetime.utcnow()
+        db.session.execute(update(TripJob).where(TripJob.id == job_id).values(**values))
+        db.session.commit()
+        with self._changed:
+            self._versions[job_id] = self._versions.get(job_id, 0) + 1
+            if values.get('status') in TERMINAL_STATUSES:
+                self._versions.pop(job_id, None)
+            self._changed.notify_all()
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float) -> int:
+        """阻塞到本进程内该任务有新状态或超时，返回最新版本号；其他进程执行的任务靠超时后查库"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(job_id, -1) != version, timeout)
+            return self._versions.get(job_id, -1)
+
+    def fail_stale(self) -> int:
+        """启动时把长时间无更新的未完成任务标记为失败（执行它的进程已退出）"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        result = db.session.execute(
+            update(TripJob)
+            .where(TripJob.status.in_(('queued', 'running')), TripJob.updated_at < cutoff)
+            .values(status='failed', error='任务中断（服务重启）', finished_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "max_workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_runner = JobRunner()
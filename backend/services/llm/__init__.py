@@ -2,8 +2,15 @@
 LLM服务模块
 提供统一的LLM客户端接口，支持多种提供商
 """
-from .factory import pick_client, build_clients
+from .factory import pick_client, build_clients, get_response_cache
 from .base import LLMClient, Message
+from .cache import CachingLLMClient, LLMResponseCache
+from .router import RouterLLMClient
+from .registry import ClientRegistry, get_registry
+from . import transport
 
-__all__ = ['LLMClient', 'Message', 'pick_client', 'build_clients']
-
+__all__ = [
+    'LLMClient', 'Message', 'pick_client', 'build_clients', 'transport',
+    'CachingLLMClient', 'LLMResponseCache', 'get_response_cache', 'RouterLLMClient',
+    'ClientRegistry', 'get_registry',
+]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 
 Message = Dict[str, str]  # {"role":"user/system/assistant", "content":"..."}
 
@@ -11,3 +11,7 @@ class LLMClient(ABC):
     async def chat(self, messages: List[Message], model: str | None = None,
                    temperature: float = 0.7, force_json: bool = False) -> str: ...
 
+    async def chat_stream(self, messages: List[Message], model: str | None = None,
+                          temperature: float = 0.7, force_json: bool = False) -> AsyncIterator[str]:
+        """逐段返回回复内容；默认实现退化为一次性返回完整回复，子类可覆盖为真正的流式实现"""
+        yield await self.chat(messages, model=model, temperature=temperature, force_json=force_json)
@@ -0,0 +1,217 @@
+"""
+LLM 响应缓存
+CachingLLMClient 包装任意 LLMClient，按 (provider, model, messages, temperature, force_json)
+的内容哈希缓存回复；存储为内存 LRU + SQLite 磁盘两级，TTL 可按调用点指定。
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from .base import LLMClient, Message
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(provider: str, model: str | None, messages: List[Message],
+                   temperature: float, force_json: bool) -> str:
+    """对请求内容做规范化 JSON 序列化后取 sha256"""
+    raw = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "messages": messages,
+            "temperature": round(float(temperature), 4),
+            "force_json": bool(force_json),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """内存 LRU + SQLite 两级缓存（线程安全）"""
+
+    PRUNE_EVERY = 200  # 每写入 N 次清理一次磁盘上的过期条目
+
+    def __init__(self, path: str | None, max_entries: int = 512):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "writes": 0,
+            "bytes_served": 0,
+            "bytes_written": 0,
+        }
+        self._db: sqlite3.Connection | None = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", value)
+                    return value
+                self._memory.pop(key, None)
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at > now:
+                        self._remember(key, value, expires_at)
+                        self._record_hit("disk_hits", value)
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats["writes"] += 1
+            self._stats["bytes_written"] += len(value.encode("utf-8"))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _record_hit(self, tier: str, value: str) -> None:
+        self._stats["hits"] += 1
+        self._stats[tier] += 1
+        self._stats["bytes_served"] += len(value.encode("utf-8"))
+
+
+class CachingLLMClient(LLMClient):
+    """
+    缓存装饰器：命中时直接返回，未命中时调用被包装的客户端并写入缓存
+    chat / chat_stream 额外接受 ttl（秒）由调用点指定缓存时长；ttl<=0 表示跳过缓存
+    还可传 validate(reply)：由调用方确认回复可用（如 JSON 可解析、未被截断）才写入缓存
+    """
+
+    def __init__(self, inner: LLMClient, cache: LLMResponseCache, default_ttl: float):
+        self.inner = inner
+        self.name = inner.name
+        self.cache = cache
+        self.default_ttl = default_ttl
+
+    def __getattr__(self, item):
+        # 透传被包装客户端的其他属性（pool_key、default_model 等）
+        return getattr(self.inner, item)
+
+    def _key(self, messages: List[Message], model: str | None, temperature: float, force_json: bool) -> str:
+        provider = getattr(self.inner, "pool_key", self.inner.name)
+        use_model = model or getattr(self.inner, "default_model", None)
+        return make_cache_key(provider, use_model, messages, temperature, force_json)
+
+    async def chat(self, messages: List[Message], model: str | None = None,
+                   temperature: float = 0.7, force_json: bool = False,
+                   ttl: float | None = None, validate: Callable[[str], bool] | None = None) -> str:
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return await self.inner.chat(messages, model=model, temperature=temperature, force_json=force_json)
+
+        key = self._key(messages, model, temperature, force_json)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug("LLM cache hit: %s", key[:12])
+            return cached
+
+        reply = await self.inner.chat(messages, model=model, temperature=temperature, force_json=force_json)
+        if not reply:
+            return reply
+        if validate is not None and not validate(reply):
+            logger.debug("LLM reply rejected by caller, not cached: %s", key[:12])
+            return reply
+        self.cache.set(key, reply, ttl)
+        return reply
+
+    async def chat_stream(self, messages: List[Message], model: str | None = None,
+                          temperature: float = 0.7, force_json: bool = False, ttl: float | None = None,
+                          validate: Callable[[str], bool] | None = None) -> AsyncIterator[str]:
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            async for delta in self.inner.chat_stream(messages, model=model, temperature=temperature,
+                                                      force_json=force_json):
+                yield delta
+            return
+
+        key = self._key(messages, model, temperature, force_json)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts: List[str] = []
+        async for delta in self.inner.chat_stream(messages, model=model, temperature=temperature,
+                                                  force_json=force_json):
+            parts.append(delta)
+            yield delta
+        reply = "".join(parts)
+        if not reply:
+            return
+        if validate is not None and not validate(reply):
+            logger.debug("LLM stream reply rejected by caller, not cached: %s", key[:12])
+            return
+        self.cache.set(key, reply, ttl)
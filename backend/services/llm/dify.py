@@ -1,21 +1,24 @@
+import json
 import httpx
-from typing import List
+from typing import Any, AsyncIterator, Dict, List
 from .base import LLMClient, Message
+from . import ratelimit, transport
+import backend.settings as settings
 
 
 class DifyClient(LLMClient):
     """
     Dify 原生接口：POST /v1/chat-messages
-    简化实现：只取 blocking 模式的 answer 字段
+    chat 使用 blocking 模式的 answer 字段，chat_stream 使用 streaming 模式的 SSE 事件
     """
     def __init__(self, base_url: str, api_key: str, app_user: str):
         self.name = "dify"
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.app_user = app_user
+        self.pool_key = f"{self.name}@{self.base_url}"
 
-    async def chat(self, messages: List[Message], model: str | None = None,
-                   temperature: float = 0.7, force_json: bool = False) -> str:
+    def _build_payload(self, messages: List[Message], response_mode: str) -> Dict[str, Any]:
         # 取最后一条 user 内容作为 query，其余拼成上下文（简化版）
         last_user = ""
         context = []
@@ -24,19 +27,61 @@ class DifyClient(LLMClient):
                 last_user = m["content"]
             else:
                 context.append(m)
-
-        url = f"{self.base_url}/chat-messages"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        payload = {
+        return {
             "inputs": {"context": context},   # 供工作流使用（如不需要可省）
             "query": last_user,
-            "response_mode": "blocking",
+            "response_mode": response_mode,
             "user": self.app_user
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
-            # 常见字段为 "answer"
-            return data.get("answer", "")
 
+    async def _acquire(self, messages: List[Message]) -> ratelimit.TokenBucketLimiter | None:
+        limiter = ratelimit.get_rate_limiter()
+        if limiter:
+            await limiter.acquire(ratelimit.estimate_tokens(messages, settings.LLM_RATE_COMPLETION_TOKENS))
+        return limiter
+
+    def _report(self, limiter: ratelimit.TokenBucketLimiter | None, r: httpx.Response) -> None:
+        if not limiter:
+            return
+        if r.status_code == 429:
+            limiter.report_throttled(ratelimit.parse_retry_after(r.headers.get("retry-after")))
+        elif r.status_code == 200:
+            limiter.report_success()
+
+    async def chat(self, messages: List[Message], model: str | None = None,
+                   temperature: float = 0.7, force_json: bool = False) -> str:
+        url = f"{self.base_url}/chat-messages"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        payload = self._build_payload(messages, "blocking")
+        client = transport.get_client(self.pool_key)
+        limiter = await self._acquire(messages)
+        r = await client.post(url, headers=headers, json=payload)
+        self._report(limiter, r)
+        r.raise_for_status()
+        data = r.json()
+        # 常见字段为 "answer"
+        return data.get("answer", "")
+
+    async def chat_stream(self, messages: List[Message], model: str | None = None,
+                          temperature: float = 0.7, force_json: bool = False) -> AsyncIterator[str]:
+        url = f"{self.base_url}/chat-messages"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        payload = self._build_payload(messages, "streaming")
+        client = transport.get_client(self.pool_key)
+        limiter = await self._acquire(messages)
+        async with client.stream("POST", url, headers=headers, json=payload) as r:
+            self._report(limiter, r)
+            if r.status_code != 200:
+                await r.aread()
+                r.raise_for_status()
+            async for _event, data in transport.iter_sse(r):
+                chunk = json.loads(data)
+                # Dify 把事件类型放在 data.event 中：message/agent_message 携带增量 answer
+                event = chunk.get("event")
+                if event in ("message", "agent_message"):
+                    if chunk.get("answer"):
+                        yield chunk["answer"]
+                elif event == "message_end":
+                    break
+                elif event == "error":
+                    raise Exception(f"Dify stream error: {chunk.get('message', chunk)}")
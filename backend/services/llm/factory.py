@@ -2,10 +2,23 @@ from typing import Dict
 from .base import LLMClient
 from .openai_compat import OpenAICompat
 from .dify import DifyClient
+from .cache import CachingLLMClient, LLMResponseCache
+from .router import RouterLLMClient
 import backend.settings as settings
 
+_response_cache: LLMResponseCache | None = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """进程内共享的 LLM 响应缓存（首次使用时创建）"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache(settings.LLM_CACHE_PATH or None, settings.LLM_CACHE_MAX_ENTRIES)
+    return _response_cache
+
 
 def build_clients() -> Dict[str, LLMClient]:
+    """按当前 settings 构建全部客户端；常规调用请使用注册表（pick_client / get_registry）"""
     clients: Dict[str, LLMClient] = {}
 
     # OpenAI 兼容（含阿里云百炼兼容、OpenRouter、Ollama、真·OpenAI等）
@@ -15,22 +28,44 @@ def build_clients() -> Dict[str, LLMClient]:
         clients["openrouter"] = clients["openai"]    # 同理
         clients["ollama"]  = clients["openai"]       # 同理
 
+    # 备用 OpenAI 兼容提供商
+    if settings.OPENAI_FALLBACK_BASE_URL and settings.OPENAI_FALLBACK_API_KEY:
+        clients["openai_fallback"] = OpenAICompat(settings.OPENAI_FALLBACK_BASE_URL,
+                                                  settings.OPENAI_FALLBACK_API_KEY,
+                                                  settings.OPENAI_FALLBACK_MODEL)
+
     # Dify 原生
     if settings.DIFY_API_BASE and settings.DIFY_API_KEY:
         clients["dify"] = DifyClient(settings.DIFY_API_BASE, settings.DIFY_API_KEY, settings.DIFY_APP_USER)
 
+    # 多提供商路由：别名指向同一客户端时只保留第一个
+    routed, seen = [], set()
+    for name in settings.LLM_ROUTER_PROVIDERS:
+        client = clients.get(name)
+        if client is not None and id(client) not in seen:
+            seen.add(id(client))
+            routed.append((name, client))
+    if routed:
+        clients["router"] = RouterLLMClient(
+            routed,
+            hedge_delay=settings.LLM_HEDGE_DELAY,
+            min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            cooldown=settings.LLM_BREAKER_COOLDOWN,
+        )
+
+    # 响应缓存：同一个底层客户端（含别名）只包装一次
+    if settings.LLM_CACHE_ENABLED:
+        wrapped: Dict[int, LLMClient] = {}
+        for key, client in clients.items():
+            if id(client) not in wrapped:
+                wrapped[id(client)] = CachingLLMClient(client, get_response_cache(), settings.LLM_CACHE_DEFAULT_TTL)
+            clients[key] = wrapped[id(client)]
+
     return clients
 
 
 def pick_client(prefer: str | None = None) -> LLMClient:
-    clients = build_clients()
-    if prefer and prefer in clients:
-        return clients[prefer]
-    # 默认选择
-    if settings.LLM_PRIMARY in clients:
-        return clients[settings.LLM_PRIMARY]
-    # 兜底任选一个
-    if clients:
-        return next(iter(clients.values()))
-    raise RuntimeError("No LLM providers configured")
-
+    """从进程内注册表中选择客户端（每个提供商只构建一次）"""
+    from .registry import get_registry
+    return get_registry().pick(prefer)
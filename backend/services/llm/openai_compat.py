@@ -1,6 +1,9 @@
+import json
 import httpx
-from typing import List, Dict
+from typing import Any, AsyncIterator, List, Dict, Tuple
+import backend.settings as settings
 from .base import LLMClient, Message
+from . import ratelimit, transport
 
 
 class OpenAICompat(LLMClient):
@@ -9,13 +12,18 @@ class OpenAICompat(LLMClient):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.default_model = default_model
+        self.pool_key = f"{self.name}@{self.base_url}"
 
-    async def chat(self, messages: List[Message], model: str | None = None,
-                   temperature: float = 0.7, force_json: bool = False) -> str:
+    @property
+    def is_dashscope(self) -> bool:
+        return "dashscope" in self.base_url or "aliyun" in self.base_url
+
+    def _build_request(self, messages: List[Message], model: str | None, temperature: float,
+                       force_json: bool = False, stream: bool = False) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
         use_model = model or self.default_model
         
         # 处理阿里云百炼的特殊路径
-        if "dashscope" in self.base_url or "aliyun" in self.base_url:
+        if self.is_dashscope:
             url = f"{self.base_url}/services/aigc/text-generation/generation"
             headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
             payload = {
@@ -27,6 +35,10 @@ class OpenAICompat(LLMClient):
                     "temperature": temperature
                 }
             }
+            if stream:
+                # 百炼 SSE：incremental_output 让每个事件只携带新增内容
+                headers["X-DashScope-SSE"] = "enable"
+                payload["parameters"]["incremental_output"] = True
         else:
             # 标准OpenAI兼容接口
             # 确保base_url正确：https://api.openai.com/v1 -> /v1/chat/completions
@@ -47,6 +59,13 @@ class OpenAICompat(LLMClient):
             # 只在明确要求JSON格式时使用（并且提示词中需要包含"json"）
             if force_json and "openai.com" in self.base_url:
                 payload["response_format"] = {"type": "json_object"}
+            if stream:
+                payload["stream"] = True
+        return url, headers, payload
+
+    async def chat(self, messages: List[Message], model: str | None = None,
+                   temperature: float = 0.7, force_json: bool = False) -> str:
+        url, headers, payload = self._build_request(messages, model, temperature, force_json)
         
         # 对429错误和网络错误进行指数退避重试
         import asyncio
@@ -54,57 +73,105 @@ class OpenAICompat(LLMClient):
         max_retries = 3  # 增加重试次数
         backoff = 1.0
         
+        # 复用按提供商共享的长连接池（keep-alive / HTTP/2），不再每次重试都新建客户端
+        client = transport.get_client(self.pool_key)
+        # 进程内共享限流器：每次尝试（含重试）都先排队获取额度
+        limiter = ratelimit.get_rate_limiter()
+        tokens = ratelimit.estimate_tokens(messages, settings.LLM_RATE_COMPLETION_TOKENS)
         for attempt in range(max_retries):
-            async with httpx.AsyncClient(timeout=60) as client:  # 增加超时时间到60秒
-                try:
-                    r = await client.post(url, headers=headers, json=payload)
-                except httpx.RequestError as exc:
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(backoff)
-                        backoff *= 2
+            if limiter:
+                await limiter.acquire(tokens)
+            try:
+                r = await client.post(url, headers=headers, json=payload)
+            except httpx.RequestError as exc:
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise Exception(f"HTTP request failed: {exc}")
+            
+            # 检查响应状态
+            if r.status_code == 200:
+                if limiter:
+                    limiter.report_success()
+                data = r.json()
+                # 处理阿里云百炼的响应格式
+                if self.is_dashscope:
+                    return data.get("output", {}).get("choices", [{}])[0].get("message", {}).get("content", "")
+                else:
+                    # 标准OpenAI格式
+                    return data["choices"][0]["message"]["content"]
+            
+            elif r.status_code == 404:
+                error_msg = f"API endpoint not found (404). URL: {url}. "
+                error_msg += "Check: 1) Base URL is correct (https://api.openai.com/v1 for OpenAI), "
+                error_msg += "2) Model name exists (try gpt-4o-mini), 3) Path is /v1/chat/completions"
+                raise Exception(error_msg)
+            
+            elif r.status_code == 401:
+                raise Exception("Invalid API key (401). Please check your API key in .env file.")
+            
+            elif r.status_code == 429:
+                # 429错误：配额不足或速率限制，进行退避重试
+                if limiter:
+                    limiter.report_throttled(ratelimit.parse_retry_after(r.headers.get("retry-after")))
+                if attempt < max_retries - 1:
+                    error_data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
+                    error_type = error_data.get("error", {}).get("type", "")
+                    
+                    if error_type == "insufficient_quota":
+                        raise Exception("Insufficient quota (429). Please add credits to your OpenAI account: https://platform.openai.com/account/billing")
+                    elif limiter:
+                        # rate_limit_exceeded: 由限流器统一暂停并降速，下一轮 acquire 时排队等待
                         continue
-                    raise Exception(f"HTTP request failed: {exc}")
-                
-                # 检查响应状态
-                if r.status_code == 200:
-                    data = r.json()
-                    # 处理阿里云百炼的响应格式
-                    if "dashscope" in self.base_url or "aliyun" in self.base_url:
-                        return data.get("output", {}).get("choices", [{}])[0].get("message", {}).get("content", "")
-                    else:
-                        # 标准OpenAI格式
-                        return data["choices"][0]["message"]["content"]
-                
-                elif r.status_code == 404:
-                    error_msg = f"API endpoint not found (404). URL: {url}. "
-                    error_msg += "Check: 1) Base URL is correct (https://api.openai.com/v1 for OpenAI), "
-                    error_msg += "2) Model name exists (try gpt-4o-mini), 3) Path is /v1/chat/completions"
-                    raise Exception(error_msg)
-                
-                elif r.status_code == 401:
-                    raise Exception("Invalid API key (401). Please check your API key in .env file.")
-                
-                elif r.status_code == 429:
-                    # 429错误：配额不足或速率限制，进行退避重试
-                    if attempt < max_retries - 1:
-                        error_data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {}
-                        error_type = error_data.get("error", {}).get("type", "")
-                        
-                        if error_type == "insufficient_quota":
-                            raise Exception("Insufficient quota (429). Please add credits to your OpenAI account: https://platform.openai.com/account/billing")
-                        else:
-                            # rate_limit_exceeded: 等待后重试
-                            wait_time = backoff + random.random()
-                            await asyncio.sleep(wait_time)
-                            backoff *= 2
-                            continue
                     else:
-                        raise Exception("Rate limit exceeded (429). Max retries reached. Please wait and try again later.")
-                
+                        # rate_limit_exceeded: 等待后重试
+                        wait_time = backoff + random.random()
+                        await asyncio.sleep(wait_time)
+                        backoff *= 2
+                        continue
                 else:
-                    # 其他错误
-                    error_data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {"error": r.text}
-                    raise Exception(f"API error ({r.status_code}): {error_data}")
+                    raise Exception("Rate limit exceeded (429). Max retries reached. Please wait and try again later.")
+            
+            else:
+                # 其他错误
+                error_data = r.json() if r.headers.get("content-type", "").startswith("application/json") else {"error": r.text}
+                raise Exception(f"API error ({r.status_code}): {error_data}")
         
         raise RuntimeError("Max retries reached for API request")
 
+
+
+    async def chat_stream(self, messages: List[Message], model: str | None = None,
+                          temperature: float = 0.7, force_json: bool = False) -> AsyncIterator[str]:
+        """流式对话：OpenAI 兼容接口走 SSE（choices[].delta），百炼走 incremental_output；JSON 模式与 chat 相同"""
+        url, headers, payload = self._build_request(messages, model, temperature, force_json, stream=True)
+        client = transport.get_client(self.pool_key)
+        limiter = ratelimit.get_rate_limiter()
+        if limiter:
+            await limiter.acquire(ratelimit.estimate_tokens(messages, settings.LLM_RATE_COMPLETION_TOKENS))
+        try:
+            async with client.stream("POST", url, headers=headers, json=payload) as r:
+                if r.status_code == 429 and limiter:
+                    limiter.report_throttled(ratelimit.parse_retry_after(r.headers.get("retry-after")))
+                if r.status_code != 200:
+                    body = (await r.aread()).decode("utf-8", errors="replace")
+                    raise Exception(f"API error ({r.status_code}): {body[:500]}")
+                async for _event, data in transport.iter_sse(r):
+                    if data.strip() == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if self.is_dashscope:
+                        output = chunk.get("output", {})
+                        choices = output.get("choices") or [{}]
+                        delta = choices[0].get("message", {}).get("content") or output.get("text") or ""
+                    else:
+                        choices = chunk.get("choices") or [{}]
+                        delta = choices[0].get("delta", {}).get("content") or ""
+                    if delta:
+                        yield delta
+            # 与 chat 一致：成功完成的请求逐步恢复 429 后被调低的速率
+            if limiter:
+                limiter.report_success()
+        except httpx.RequestError as exc:
+            raise Exception(f"HTTP request failed: {exc}")
@@ -0,0 +1,205 @@
+"""
+LLM 客户端限流
+进程内共享的令牌桶（请求数/分钟 + token 数/分钟），所有 LLM 调用在发请求前排队获取额度。
+按 FIFO 顺序放行，避免并发请求同时撞上 429 后又同时重试；
+收到 429 / Retry-After 时整体暂停并按比例降速，成功后逐步恢复。
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+import backend.settings as settings
+
+from .base import Message
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(messages: List[Message], completion_tokens: int = 0) -> int:
+    """粗略估算请求 token 数：中文约 1 字 1 token、英文约 4 字符 1 token，取折中按 2 字符计"""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return math.ceil(chars / 2) + completion_tokens
+
+
+class TokenBucketLimiter:
+    """
+    双令牌桶限流器（线程安全，可在多个事件循环中 await）
+    rpm/tpm 为每分钟额度，<=0 表示该维度不限；burst_seconds 决定桶容量（允许的突发量）
+    """
+
+    MIN_SCALE = 0.1        # 429 降速下限
+    RECOVERY_STEP = 0.05   # 每次成功恢复的速率比例
+    POLL_INTERVAL = 0.05   # 非队首等待者的轮询间隔
+
+    def __init__(self, rpm: float, tpm: float, burst_seconds: float = 5.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._queue: deque = deque()
+        self._scale = 1.0
+        self._paused_until = 0.0
+        now = time.monotonic()
+        self._last_refill = now
+        self._req_tokens = self._req_capacity()
+        self._tok_tokens = self._tok_capacity()
+        self._waits: deque = deque(maxlen=500)
+        self._stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "max_queue_depth": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    # --- 令牌桶 -------------------------------------------------------
+    def _req_rate(self) -> float:
+        return self.rpm / 60.0 * self._scale
+
+    def _tok_rate(self) -> float:
+        return self.tpm / 60.0 * self._scale
+
+    def _req_capacity(self) -> float:
+        return max(1.0, self.rpm / 60.0 * self.burst_seconds) if self.rpm > 0 else math.inf
+
+    def _tok_capacity(self) -> float:
+        return max(1.0, self.tpm / 60.0 * self.burst_seconds) if self.tpm > 0 else math.inf
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.rpm > 0:
+            self._req_tokens = min(self._req_capacity(), self._req_tokens + elapsed * self._req_rate())
+        if self.tpm > 0:
+            self._tok_tokens = min(self._tok_capacity(), self._tok_tokens + elapsed * self._tok_rate())
+
+    def _try_take(self, tokens: int, now: float) -> float:
+        """队首尝试获取额度：成功返回 0，否则返回还需等待的秒数"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        # 单个请求超过桶容量时按容量计，避免永远等不到
+        need = min(tokens, self._tok_capacity())
+        wait = 0.0
+        if self.rpm > 0 and self._req_tokens < 1:
+            wait = max(wait, (1 - self._req_tokens) / self._req_rate())
+        if self.tpm > 0 and self._tok_tokens < need:
+            wait = max(wait, (need - self._tok_tokens) / self._tok_rate())
+        if wait > 0:
+            return wait
+        if self.rpm > 0:
+            self._req_tokens -= 1
+        if self.tpm > 0:
+            self._tok_tokens -= need
+        return 0.0
+
+    # --- 公开接口 -----------------------------------------------------
+    async def acquire(self, tokens: int = 0) -> float:
+        """排队获取一次请求额度，返回等待时长（秒）"""
+        ticket = object()
+        start = time.monotonic()
+        with self._lock:
+            self._queue.append(ticket)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    if self._queue[0] is ticket:
+                        self._refill(now)
+                        wait = self._try_take(tokens, now)
+                        if wait == 0:
+                            self._queue.popleft()
+                            waited = now - start
+                            self._record_wait(waited)
+                            return waited
+                    else:
+                        wait = self.POLL_INTERVAL
+                await asyncio.sleep(min(max(wait, 0.001), 1.0))
+        except BaseException:
+            with self._lock:
+                try:
+                    self._queue.remove(ticket)
+                except ValueError:
+                    pass
+            raise
+
+    def report_throttled(self, retry_after: float | None = None) -> None:
+        """上游返回 429：清空桶、按 Retry-After（或 1 秒）暂停，并把速率减半"""
+        with self._lock:
+            now = time.monotonic()
+            pause = retry_after if retry_after and retry_after > 0 else 1.0
+            self._paused_until = max(self._paused_until, now + pause)
+            self._scale = max(self.MIN_SCALE, self._scale * 0.5)
+            self._refill(now)
+            self._req_tokens = min(self._req_tokens, 0.0)
+            self._tok_tokens = min(self._tok_tokens, 0.0)
+            self._stats["throttled"] += 1
+        logger.warning("LLM rate limited upstream, pausing %.1fs (rate scale=%.2f)", pause, self._scale)
+
+    def report_success(self) -> None:
+        with self._lock:
+            if self._scale < 1.0:
+                self._scale = min(1.0, self._scale + self.RECOVERY_STEP)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._waits)
+            stats.update({
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "rate_scale": round(self._scale, 3),
+                "queue_depth": len(self._queue),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            })
+        acquired = stats["acquired"]
+        stats["avg_wait_ms"] = round(stats.pop("total_wait") / acquired * 1000, 1) if acquired else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait") * 1000, 1)
+        stats["p95_wait_ms"] = round(waits[max(0, int(len(waits) * 0.95) - 1)] * 1000, 1) if waits else 0.0
+        return stats
+
+    def _record_wait(self, waited: float) -> None:
+        self._waits.append(waited)
+        self._stats["acquired"] += 1
+        self._stats["total_wait"] += waited
+        self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+
+
+_limiter: TokenBucketLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucketLimiter | None:
+    """进程内共享的限流器；LLM_RATE_LIMIT_RPM 与 LLM_RATE_LIMIT_TPM 都未配置时返回 None"""
+    global _limiter
+    if settings.LLM_RATE_LIMIT_RPM <= 0 and settings.LLM_RATE_LIMIT_TPM <= 0:
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucketLimiter(
+                settings.LLM_RATE_LIMIT_RPM,
+                settings.LLM_RATE_LIMIT_TPM,
+                settings.LLM_RATE_BURST_SECONDS,
+            )
+        return _limiter
+
+
+def reset_rate_limiter() -> None:
+    """丢弃当前限流器（配置热加载后按新配置重建）；已在排队的请求继续使用旧实例"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After 头（秒数形式；HTTP 日期形式忽略）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,182 @@
+"""
+LLM 客户端注册表
+进程内单例：每个提供商只构建一次客户端，启动时预解析 DNS 并预建 TLS 连接；
+收到 SIGHUP 或 .env 文件变化时重新加载配置，原子替换客户端表，
+已在途的请求继续使用旧客户端完成；不再使用的连接池在 LLM_POOL_RETIRE_GRACE 秒后关闭。
+"""
+import asyncio
+import importlib
+import logging
+import os
+import signal
+import threading
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+from dotenv import dotenv_values, load_dotenv
+
+import backend.settings as settings
+
+from .base import LLMClient
+from . import factory, ratelimit, transport
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """LLM 客户端注册表（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, LLMClient] = factory.build_clients()
+        self.generation = 1
+        self._env_mtime = self._read_env_mtime()
+        self._env_values = self._read_env_values()
+        self._watcher: threading.Thread | None = None
+        self._stop_watching = threading.Event()
+
+    # --- 查询 ---------------------------------------------------------
+    def clients(self) -> Dict[str, LLMClient]:
+        # 读取时直接拿当前字典引用；reload 用整体替换保证原子性
+        return self._clients
+
+    def pick(self, prefer: str | None = None) -> LLMClient:
+        clients = self._clients
+        if prefer and prefer in clients:
+            return clients[prefer]
+        # 默认选择
+        if settings.LLM_PRIMARY in clients:
+            return clients[settings.LLM_PRIMARY]
+        # 兜底任选一个
+        if clients:
+            return next(iter(clients.values()))
+        raise RuntimeError("No LLM providers configured")
+
+    # --- 预热 ---------------------------------------------------------
+    def _endpoints(self) -> List[Any]:
+        """去重后的底层 HTTP 客户端（包装器通过属性透传 pool_key/base_url，路由器本身没有）"""
+        seen, endpoints = set(), []
+        for client in self._clients.values():
+            pool_key = getattr(client, "pool_key", None)
+            base_url = getattr(client, "base_url", None)
+            if pool_key and base_url and pool_key not in seen:
+                seen.add(pool_key)
+                endpoints.append(client)
+        return endpoints
+
+    async def warm_up(self, timeout: float = 5.0) -> Dict[str, str]:
+        """在当前事件循环上预解析 DNS 并预建连接，失败只记录日志不影响启动"""
+        loop = asyncio.get_running_loop()
+
+        async def _warm(client) -> str:
+            parts = urlsplit(client.base_url)
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            try:
+                await asyncio.wait_for(loop.getaddrinfo(parts.hostname, port), timeout)
+                # 任意轻量请求即可完成 TCP+TLS 握手，连接随后留在 keep-alive 池中
+                http = transport.get_client(client.pool_key)
+                await asyncio.wait_for(http.head(client.base_url), timeout)
+                return "ok"
+            except Exception as exc:
+                logger.warning("LLM warm-up failed for %s: %s", client.pool_key, exc)
+                return f"error: {exc}"
+
+        endpoints = self._endpoints()
+        results = await asyncio.gather(*(_warm(client) for client in endpoints))
+        summary = {client.pool_key: result for client, result in zip(endpoints, results)}
+        logger.info("LLM warm-up finished: %s", summary)
+        return summary
+
+    # --- 热加载 -------------------------------------------------------
+    def _read_env_mtime(self) -> float | None:
+        try:
+            return os.stat(settings.ENV_FILE).st_mtime
+        except OSError:
+            return None
+
+    def _read_env_values(self) -> Dict[str, str | None]:
+        try:
+            return dotenv_values(settings.ENV_FILE)
+        except OSError:
+            return {}
+
+    def _unset_removed_env(self, env_values: Dict[str, str | None]) -> None:
+        """load_dotenv 不会删除变量：从 .env 中删掉的键，若环境变量仍是 .env 中的旧值则一并移除"""
+        for key, old in self._env_values.items():
+            if key not in env_values and old is not None and os.environ.get(key) == old:
+                del os.environ[key]
+
+    def _pool_keys(self) -> set:
+        return {client.pool_key for client in self._endpoints()}
+
+    def reload(self) -> bool:
+        """重新读取 .env 与 settings 并重建客户端；构建失败时保留旧客户端"""
+        with self._lock:
+            old_limits = (settings.LLM_RATE_LIMIT_RPM, settings.LLM_RATE_LIMIT_TPM, settings.LLM_RATE_BURST_SECONDS)
+            old_pools = self._pool_keys()
+            try:
+                env_values = self._read_env_values()
+                self._unset_removed_env(env_values)
+                load_dotenv(settings.ENV_FILE, override=True)
+                importlib.reload(settings)
+                clients = factory.build_clients()
+            except Exception as exc:
+                logger.error("LLM config reload failed, keeping previous clients: %s", exc, exc_info=True)
+                return False
+            self._clients = clients
+            self.generation += 1
+            self._env_mtime = self._read_env_mtime()
+            self._env_values = env_values
+            # 地址变化后旧 pool_key 不再使用：等在途请求完成后关闭，避免每次重载遗留连接
+            transport.retire(old_pools - self._pool_keys(), settings.LLM_POOL_RETIRE_GRACE,
+                             in_use=lambda key: key in self._pool_keys())
+            if old_limits != (settings.LLM_RATE_LIMIT_RPM, settings.LLM_RATE_LIMIT_TPM, settings.LLM_RATE_BURST_SECONDS):
+                ratelimit.reset_rate_limiter()
+        logger.info("LLM clients reloaded (generation=%s, providers=%s)", self.generation, list(clients))
+        return True
+
+    def start_watching(self, interval: float | None = None) -> None:
+        """后台轮询 .env 修改时间；主线程中同时注册 SIGHUP 触发重载"""
+        interval = settings.LLM_RELOAD_INTERVAL if interval is None else interval
+        if threading.current_thread() is threading.main_thread() and hasattr(signal, "SIGHUP"):
+            try:
+                signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=self.reload, daemon=True).start())
+            except ValueError:  # pragma: no cover - 非主解释器线程
+                pass
+        if interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+
+        def _watch():
+            while not self._stop_watching.wait(interval):
+                if self._read_env_mtime() != self._env_mtime:
+                    logger.info("Detected change in %s, reloading LLM config", settings.ENV_FILE)
+                    self.reload()
+
+        self._watcher = threading.Thread(target=_watch, name="llm-config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop_watching.set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "providers": list(self._clients),
+            "env_file": settings.ENV_FILE,
+            "watching": bool(self._watcher and self._watcher.is_alive()),
+            **transport.pool_stats(),
+        }
+
+
+_registry: ClientRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+    return _registry
@@ -0,0 +1,281 @@
+"""
+多提供商 LLM 路由
+RouterLLMClient 按配置顺序选择提供商，统计滚动 p50/p95 延迟与错误率；
+首选提供商超过其 p95 仍未返回时向下一个提供商发送对冲请求，取先返回的结果；
+连续失败的提供商会触发熔断，冷却后以半开状态试探恢复。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from .base import LLMClient, Message
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ProviderHealth:
+    """单个提供商的滚动延迟/错误率统计与熔断器状态（线程安全，跨事件循环共享）"""
+
+    def __init__(self, name: str, window: int, failure_threshold: int, cooldown: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._latencies: deque = deque(maxlen=window)
+        self._outcomes: deque = deque(maxlen=window)  # True=成功
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.trips = 0
+
+    def allow_request(self) -> bool:
+        """熔断器是否放行；半开状态只放行一个试探请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.cooldown:
+                    return False
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self, latency: float | None = None) -> None:
+        with self._lock:
+            if latency is not None:
+                self._latencies.append(latency)
+            self._outcomes.append(True)
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info("LLM provider %s recovered, circuit closed", self.name)
+            self.state = CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                    logger.warning("LLM provider %s circuit opened after %s failures",
+                                   self.name, self.consecutive_failures)
+                self.state = OPEN
+                self.opened_at = time.time()
+            self._trial_in_flight = False
+
+    def record_cancelled(self) -> None:
+        """对冲中被取消的请求不计入统计，但要释放半开试探名额"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, max(0, int(round(q * len(samples))) - 1))
+        return samples[idx]
+
+    @property
+    def sample_count(self) -> int:
+        return len(self._latencies)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            outcomes = list(self._outcomes)
+        if not outcomes:
+            return 0.0
+        return outcomes.count(False) / len(outcomes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": self.state,
+            "samples": self.sample_count,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 4),
+            "consecutive_failures": self.consecutive_failures,
+            "trips": self.trips,
+        }
+
+
+# 提供商健康状态按名称进程内共享，多个 RouterLLMClient 实例看到同一份统计
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_health(name: str, window: int = 200, failure_threshold: int = 5, cooldown: float = 30.0) -> ProviderHealth:
+    """取得（或创建）提供商的健康状态；已存在时保留统计，熔断阈值与冷却时间更新为本次传入的值（配置热加载）"""
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = ProviderHealth(name, window, failure_threshold, cooldown)
+        else:
+            with health._lock:
+                health.failure_threshold = failure_threshold
+                health.cooldown = cooldown
+        return health
+
+
+class RouterLLMClient(LLMClient):
+    """
+    对冲路由客户端：providers 为按优先级排序的 (名称, 客户端) 列表
+    hedge_delay 为首选提供商样本不足时使用的对冲等待时间（秒）
+    """
+
+    def __init__(self, providers: List[Tuple[str, LLMClient]], hedge_delay: float = 8.0,
+                 min_samples: int = 20, max_hedges: int = 1, window: int = 200,
+                 failure_threshold: int = 5, cooldown: float = 30.0):
+        if not providers:
+            raise ValueError("RouterLLMClient requires at least one provider")
+        self.name = "router"
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.health = {
+            name: get_health(name, window, failure_threshold, cooldown)
+            for name, _ in providers
+        }
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def _next_provider(self, tried: set) -> Tuple[str, LLMClient] | None:
+        for name, client in self.providers:
+            if name not in tried and self.health[name].allow_request():
+                return name, client
+        return None
+
+    def _hedge_after(self, name: str) -> float:
+        health = self.health[name]
+        p95 = health.percentile(0.95)
+        if p95 is None or health.sample_count < self.min_samples:
+            return self.hedge_delay
+        return max(p95, 0.05)
+
+    async def _call(self, name: str, client: LLMClient, messages: List[Message], model: str | None,
+                    temperature: float, force_json: bool) -> str:
+        health = self.health[name]
+        start = time.time()
+        try:
+            result = await client.chat(messages, model=model, temperature=temperature, force_json=force_json)
+        except asyncio.CancelledError:
+            health.record_cancelled()
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.time() - start)
+        return result
+
+    async def chat(self, messages: List[Message], model: str | None = None,
+                   temperature: float = 0.7, force_json: bool = False) -> str:
+        tried: set = set()
+        pending: Dict[asyncio.Future, str] = {}
+        primary = None
+        last_exc: BaseException | None = None
+        hedges = 0
+        hedge_tasks: set = set()
+
+        def launch(hedge: bool = False) -> bool:
+            nonlocal primary
+            picked = self._next_provider(tried)
+            if picked is None:
+                return False
+            name, client = picked
+            tried.add(name)
+            # 指定的 model 只对首选提供商有意义，其他提供商用各自默认模型
+            use_model = model if primary is None else None
+            task = asyncio.ensure_future(self._call(name, client, messages, use_model, temperature, force_json))
+            pending[task] = name
+            if hedge:
+                hedge_tasks.add(task)
+            if primary is None:
+                primary = name
+            return True
+
+        if not launch():
+            raise RuntimeError("All LLM providers are unavailable (circuit open)")
+
+        try:
+            while pending:
+                timeout = None
+                if hedges < self.max_hedges and len(pending) == 1 and primary in pending.values():
+                    timeout = self._hedge_after(primary)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 首选提供商超过 p95 仍未返回：发送对冲请求
+                    hedges += 1
+                    if launch(hedge=True):
+                        self.hedges_sent += 1
+                        logger.info("Hedging LLM request from %s after %.2fs", primary, timeout)
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    exc = task.exception()
+                    if exc is None:
+                        if task in hedge_tasks:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_exc = exc
+                    logger.warning("LLM provider %s failed: %s", name, exc)
+                if not pending:
+                    # 全部在途请求失败：故障转移到下一个可用提供商
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise last_exc if last_exc else RuntimeError("All LLM providers failed")
+
+    async def chat_stream(self, messages: List[Message], model: str | None = None,
+                          temperature: float = 0.7, force_json: bool = False) -> AsyncIterator[str]:
+        """流式输出无法对冲合并；在产出第一个片段之前失败则切换到下一个提供商"""
+        tried: set = set()
+        last_exc: BaseException | None = None
+        while True:
+            picked = self._next_provider(tried)
+            if picked is None:
+                break
+            name, client = picked
+            use_model = model if not tried else None
+            tried.add(name)
+            health = self.health[name]
+            started = False
+            try:
+                async for delta in client.chat_stream(messages, model=use_model, temperature=temperature,
+                                                      force_json=force_json):
+                    started = True
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                health.record_cancelled()
+                raise
+            except Exception as exc:
+                health.record_failure()
+                if started:
+                    raise
+                last_exc = exc
+                logger.warning("LLM provider %s stream failed: %s", name, exc)
+                continue
+            # 流式总时长与一次性调用不可比，不计入延迟样本
+            health.record_success()
+            return
+        raise last_exc if last_exc else RuntimeError("All LLM providers are unavailable (circuit open)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "providers": {name: self.health[name].snapshot() for name, _ in self.providers},
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
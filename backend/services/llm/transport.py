@@ -0,0 +1,225 @@
+"""
+LLM HTTP 传输层
+按提供商共享长连接的 httpx.AsyncClient（keep-alive + HTTP/2 + 可配置连接池），
+并为同步调用方（Flask 路由、AIService 等）提供一个常驻的后台事件循环，
+避免每次 asyncio.run 新建事件循环导致连接池无法复用。
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Tuple, TypeVar
+
+import httpx
+
+import backend.settings as settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 事件循环 -> {pool_key: AsyncClient}；AsyncClient 绑定创建它的事件循环，不能跨循环复用。
+# 以循环对象为弱引用键：短命循环（脚本里的 asyncio.run 等）被回收后条目自动消失，也不会因 id() 复用拿到旧循环的连接池
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = \
+    weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_loop_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if not settings.LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("LLM_HTTP2 已开启但未安装 h2，回退到 HTTP/1.1（pip install httpx[http2]）")
+        return False
+    return True
+
+
+def _new_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        timeout=settings.LLM_HTTP_TIMEOUT,
+        limits=limits,
+        http2=_http2_enabled(),
+    )
+
+
+def get_client(pool_key: str) -> httpx.AsyncClient:
+    """获取当前事件循环上 pool_key 对应的共享连接池（不存在则创建）"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        # 已关闭但尚未被回收的循环上的连接池无法再使用，直接丢弃
+        for closed in [other for other in _clients if other.is_closed()]:
+            del _clients[closed]
+        pools = _clients.setdefault(loop, {})
+        client = pools.get(pool_key)
+        if client is None or client.is_closed:
+            client = _new_client()
+            pools[pool_key] = client
+            logger.info("Opened LLM connection pool: %s", pool_key)
+        return client
+
+
+async def aclose() -> None:
+    """关闭当前事件循环上的所有连接池（FastAPI shutdown 时调用）"""
+    with _clients_lock:
+        clients = list(_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as exc:  # pragma: no cover - 防御性
+            logger.warning("Failed to close LLM connection pool: %s", exc)
+
+
+def retire(pool_keys: Iterable[str], grace: float, in_use: Callable[[str], bool] | None = None) -> None:
+    """
+    配置重载后不再使用的连接池：grace 秒后（在途请求已完成）在各自的事件循环上关闭；
+    届时 in_use(pool_key) 为真（又被新配置用上）的连接池保留
+    """
+    pool_keys = set(pool_keys)
+    if not pool_keys:
+        return
+    with _clients_lock:
+        targets = [(loop, key) for loop, pools in _clients.items() for key in pools if key in pool_keys]
+    for loop, key in targets:
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(_retire(key, grace, in_use), loop)
+
+
+async def _retire(pool_key: str, grace: float, in_use: Callable[[str], bool] | None) -> None:
+    await asyncio.sleep(grace)
+    if in_use is not None and in_use(pool_key):
+        return
+    with _clients_lock:
+        client = _clients.get(asyncio.get_running_loop(), {}).pop(pool_key, None)
+    if client is None:
+        return
+    try:
+        await client.aclose()
+        logger.info("Closed retired LLM connection pool: %s", pool_key)
+    except Exception as exc:  # pragma: no cover - 防御性
+        logger.warning("Failed to close retired LLM connection pool %s: %s", pool_key, exc)
+
+
+# ----------------------------------------------------------------------
+# 同步调用入口：后台常驻事件循环
+# ----------------------------------------------------------------------
+def start() -> asyncio.AbstractEventLoop:
+    """启动（或返回已启动的）后台事件循环线程"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is not None and _loop.is_running():
+            return _loop
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=_run, name="llm-transport-loop", daemon=True)
+        thread.start()
+        ready.wait()
+        _loop, _loop_thread = loop, thread
+        return loop
+
+
+def spawn(coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+    """在后台事件循环上执行协程但不等待，返回可选等待的 Future"""
+    return asyncio.run_coroutine_threadsafe(coro, start())
+
+
+def _ensure_not_loop_thread(coro: Any = None) -> None:
+    if threading.current_thread() is _loop_thread:
+        if hasattr(coro, "close"):
+            coro.close()
+        raise RuntimeError("run_sync/stream_sync called from the LLM transport loop thread; await the coroutine instead")
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """在后台事件循环上执行协程并阻塞等待结果，供同步代码调用（不能在后台循环线程内调用，否则死锁）"""
+    _ensure_not_loop_thread(coro)
+    loop = start()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result()
+
+
+def shutdown() -> None:
+    """关闭后台事件循环上的连接池并停止线程（Flask 进程退出时调用）"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, None
+    if loop is None or not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(aclose(), loop).result(timeout=5)
+    except Exception as exc:  # pragma: no cover - 防御性
+        logger.warning("Failed to close LLM connection pools: %s", exc)
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout=5)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """返回当前已打开的连接池（用于调试/监控）"""
+    with _clients_lock:
+        return {
+            "pools": sorted({key for pools in _clients.values() for key, client in pools.items()
+                             if not client.is_closed}),
+            "http2": settings.LLM_HTTP2,
+            "max_connections": settings.LLM_HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.LLM_HTTP_MAX_KEEPALIVE,
+        }
+
+
+def stream_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """把异步迭代器桥接为同步迭代器（在后台事件循环上逐项拉取），供 Flask 流式响应使用"""
+    _ensure_not_loop_thread()
+    loop = start()
+    iterator = agen.__aiter__()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose_gen = getattr(iterator, "aclose", None)
+        if aclose_gen is not None and loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(aclose_gen(), loop).result(timeout=5)
+            except Exception:  # pragma: no cover - 防御性
+                pass
+
+
+async def iter_sse(response: httpx.Response) -> AsyncIterator[Tuple[str, str]]:
+    """解析 text/event-stream 响应，逐个产出 (event, data)；未声明 event 时为 "message" """
+    event, data_lines = "message", []
+    async for line in response.aiter_lines():
+        if not line:
+            if data_lines:
+                yield event, "\n".join(data_lines)
+            event, data_lines = "message", []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data_lines.append(value)
+    if data_lines:
+        yield event, "\n".join(data_lines)
@@ -1,7 +1,27 @@
 import os
+import threading
+import time
 import requests
 from geopy.geocoders import Nominatim
 from backend.config import Config
+import backend.settings as settings
+
+# Nominatim 使用政策：每秒最多 1 次请求；进程内所有 MapService 共用
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+
+
+def _nominatim_geocode(geocoder, address):
+    """串行调用 Nominatim，两次请求间隔不少于 NOMINATIM_MIN_INTERVAL 秒"""
+    global _nominatim_last_call
+    with _nominatim_lock:
+        wait = _nominatim_last_call + settings.NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return geocoder.geocode(address)
+        finally:
+            _nominatim_last_call = time.monotonic()
 
 class MapService:
     """地图服务：处理地理编码、路线计算等"""
@@ -61,7 +81,7 @@ class MapService:
         
         # 如果没有 Geoapify 或失败，使用 Nominatim
         try:
-            location = self.geocoder.geocode(address)
+            location = _nominatim_geocode(self.geocoder, address)
             if location:
                 return {
                     "latitude": location.latitude,
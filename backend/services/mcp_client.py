@@ -1,8 +1,10 @@
+import inspect
 import json
 import logging
 from typing import Any, Dict, List, Optional
 
 from backend.services.ai_service import AIService
+from backend.services.llm import transport
 
 
 class MCPClient:
@@ -44,6 +46,9 @@ class MCPClient:
                     transport_mode=transport_mode,
                     priority=priority,
                 )
+                # MCP 工具是协程函数，在共享的后台事件循环上执行
+                if inspect.isawaitable(response):
+                    response = transport.run_sync(response)
                 if isinstance(response, str):
                     return json.loads(response)
                 if isinstance(response, dict):
@@ -0,0 +1,228 @@
+"""
+PDF 渲染进程池
+reportlab 排版是纯 CPU 计算，在请求线程里渲染会持有 GIL、拖慢同进程的其他请求；
+这里把 ExportService.export_to_pdf 放到独立的进程池执行：
+- 工作进程启动时构建样式并渲染一份样例文档，字体度量与样式缓存在首个真实请求前就已加载；
+- 超时（PDF_RENDER_TIMEOUT）从工作进程真正开始渲染时计时（工作进程开始时通过队列上报），
+  在队列中等待的时间不计入；只有正在运行的渲染超时才替换进程池并终止其工作进程，
+  同一时刻在旧进程池上的渲染会在新进程池上重试一次；
+- 排队超过 PDF_RENDER_QUEUE_TIMEOUT 仍未开始的渲染直接失败，不影响进程池；
+- PDF_RENDER_WORKERS=0 时不启用进程池，直接在调用线程渲染。
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Set
+
+import backend.settings as settings
+from backend.services.export_service import ExportService, pdf_styles
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_TRIP = {
+    'city': 'warmup', 'days': 1, 'pace': '', 'transport_mode': '', 'priority': '',
+    'days_plans': [{'day_number': 1, 'description': 'warmup', 'activities': [
+        {'start_time': '09:00', 'end_time': '10:00', 'name': 'warmup', 'address': '', 'type': ''}
+    ]}],
+}
+_POLL_INTERVAL = 0.2
+
+_worker_service: ExportService | None = None
+_worker_events = None
+_worker_generation = 0
+
+
+class PdfRenderTimeout(TimeoutError):
+    """渲染超过 PDF_RENDER_TIMEOUT 秒（running=True），或排队超过 PDF_RENDER_QUEUE_TIMEOUT 秒仍未开始"""
+
+    def __init__(self, message: str, running: bool = True):
+        super().__init__(message)
+        self.running = running
+
+
+def _init_worker(events, generation: int) -> None:
+    """工作进程初始化：上报 pid，构建样式并渲染一次样例，加载字体与表格样式"""
+    global _worker_service, _worker_events, _worker_generation
+    _worker_events, _worker_generation = events, generation
+    events.put((generation, None, os.getpid()))
+    _worker_service = ExportService()
+    pdf_styles()
+    _worker_service.export_to_pdf(_WARMUP_TRIP)
+
+
+def _render(task_id: int, trip_data: Dict[str, Any]) -> bytes:
+    _worker_events.put((_worker_generation, task_id, os.getpid()))
+    return _worker_service.export_to_pdf(trip_data).getvalue()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class PdfRenderer:
+    def __init__(self, max_workers: int, timeout: float, queue_timeout: float | None = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout if queue_timeout is not None else max(timeout * 4, 60)
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._generation = 0
+        self._local = ExportService()
+        self._stats = {"rendered": 0, "timeouts": 0, "queue_timeouts": 0, "restarts": 0}
+        self._task_ids = itertools.count(1)
+        self._started: Dict[int, float] = {}        # task_id -> 开始渲染的时间（本进程 monotonic）
+        self._workers: Dict[int, Set[int]] = {}     # 进程池代数 -> 工作进程 pid
+        self._events = None
+        self._listener: threading.Thread | None = None
+
+    def _listen(self, events) -> None:
+        """接收工作进程的启动与开始渲染消息"""
+        while True:
+            message = events.get()
+            if message is None:
+                return
+            generation, task_id, pid = message
+            with self._lock:
+                self._workers.setdefault(generation, set()).add(pid)
+                if task_id is not None:
+                    self._started[task_id] = time.monotonic()
+
+    def _get_executor(self) -> tuple:
+        with self._lock:
+            if self._executor is None:
+                # spawn：Flask 进程里已有多个线程，fork 出的子进程可能继承被占用的锁
+                context = multiprocessing.get_context("spawn")
+                if self._events is None:
+                    self._events = context.SimpleQueue()
+                    self._listener = threading.Thread(target=self._listen, args=(self._events,),
+                                                      name="pdf-render-events", daemon=True)
+                    self._listener.start()
+                self._generation += 1
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._events, self._generation),
+                )
+            return self._executor, self._generation
+
+    def _replace(self, broken: ProcessPoolExecutor, generation: int) -> None:
+        """丢弃进程池并终止其工作进程（其中有卡住的渲染）；下次提交时重建"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self._stats["restarts"] += 1
+            pids = self._workers.pop(generation, set())
+        broken.shutdown(wait=False, cancel_futures=True)
+        kill_workers = getattr(broken, "kill_workers", None)  # Python 3.14+
+        if kill_workers is not None:
+            kill_workers()
+            return
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def warm_up(self) -> None:
+        """启动全部工作进程并等待初始化完成"""
+        if self.max_workers <= 0:
+            pdf_styles()
+            return
+        executor, _ = self._get_executor()
+        pids = {f.result(timeout=max(self.timeout, 60))
+                for f in [executor.submit(_ping) for _ in range(self.max_workers * 2)]}
+        logger.info("PDF renderer warmed up: %s worker processes", len(pids))
+
+    def render(self, trip_data: Dict[str, Any]) -> bytes:
+        if self.max_workers <= 0:
+            return self._local.export_to_pdf(trip_data).getvalue()
+        for attempt in range(2):
+            executor, generation = self._get_executor()
+            task_id = next(self._task_ids)
+            try:
+                future = executor.submit(_render, task_id, trip_data)
+            except (BrokenProcessPool, RuntimeError):
+                self._replace(executor, generation)
+                continue
+            try:
+                data = self._wait(future, task_id)
+            except PdfRenderTimeout as exc:
+                if exc.running:
+                    self._replace(executor, generation)
+                raise
+            except (BrokenProcessPool, CancelledError):
+                # 进程池因其他渲染超时被替换（排队中的任务被取消、运行中的随进程终止），在新进程池上重试
+                self._replace(executor, generation)
+                if attempt:
+                    raise
+                continue
+            finally:
+                with self._lock:
+                    self._started.pop(task_id, None)
+            with self._lock:
+                self._stats["rendered"] += 1
+            return data
+        raise BrokenProcessPool("PDF renderer pool unavailable")
+
+    def _wait(self, future, task_id: int) -> bytes:
+        """等待结果：开始渲染前只受排队上限约束，开始后按 timeout 计时"""
+        submitted = time.monotonic()
+        while True:
+            with self._lock:
+                started = self._started.get(task_id)
+            now = time.monotonic()
+            if started is None:
+                if now - submitted > self.queue_timeout and future.cancel():
+                    with self._lock:
+                        self._stats["queue_timeouts"] += 1
+                    logger.warning("PDF render waited %.1fs in queue without starting", now - submitted)
+                    raise PdfRenderTimeout(f"PDF 渲染排队超时（{self.queue_timeout:g} 秒）", running=False)
+                wait = _POLL_INTERVAL
+            else:
+                wait = started + self.timeout - now
+                if wait <= 0:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    logger.warning("PDF render ran longer than %.1fs; restarting worker pool", self.timeout)
+                    raise PdfRenderTimeout(f"PDF 渲染超时（{self.timeout:g} 秒）")
+                wait = min(wait, _POLL_INTERVAL)
+            try:
+                return future.result(timeout=wait)
+            except FutureTimeoutError:
+                continue
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "workers": self.max_workers, "timeout": self.timeout,
+                    "queue_timeout": self.queue_timeout}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            events, self._events = self._events, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if events is not None:
+            events.put(None)
+
+
+_pdf_renderer: PdfRenderer | None = None
+_pdf_renderer_lock = threading.Lock()
+
+
+def get_pdf_renderer() -> PdfRenderer:
+    global _pdf_renderer
+    if _pdf_renderer is None:
+        with _pdf_renderer_lock:
+            if _pdf_renderer is None:
+                _pdf_renderer = PdfRenderer(settings.PDF_RENDER_WORKERS, settings.PDF_RENDER_TIMEOUT,
+                                             settings.PDF_RENDER_QUEUE_TIMEOUT)
+    return _pdf_renderer
@@ -0,0 +1,444 @@
+"""
+行程计划缓存
+进程内 LRU 在前、跨进程共享存储（SQLite 文件或 Redis）在后的两级缓存，
+同一台机器上的多个 worker / AIService 实例共用一份结果。
+条目过期后的一段时间内仍可作为"陈旧"结果返回，由调用方在后台刷新（stale-while-revalidate）；
+刷新通过共享存储中的租约去重，同一条目同一时刻只有一个进程在重新生成。
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Tuple
+
+import backend.settings as settings
+from backend.utils.frozen import freeze
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCacheEntry(NamedTuple):
+    plan: Dict[str, Any]
+    metrics: Dict[str, Any]
+    stored_at: float
+    stale: bool
+
+
+class SQLitePlanStore:
+    """基于 SQLite 文件（WAL 模式）的共享存储，多个进程各自打开同一个文件"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, table: str = "plan_cache"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_leases (key TEXT PRIMARY KEY, until REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Tuple[str, float, float] | None:
+        with self._lock:
+            return self._db.execute(
+                f"SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+
+    def set(self, key: str, value: str, stored_at: float, expires_at: float) -> None:
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, stored_at, expires_at),
+            )
+            self._db.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._db.commit()
+
+    def prune(self, now: float) -> int:
+        with self._lock:
+            removed = self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+            self._db.execute(f"DELETE FROM {self.table}_leases WHERE until <= ?", (now,))
+            self._db.commit()
+            return removed
+
+    def acquire_lease(self, key: str, seconds: float) -> bool:
+        """租约未被持有或已过期时获取成功（单条 UPSERT 语句，跨进程原子）"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                f"INSERT INTO {self.table}_leases (key, until) VALUES (?, ?)"
+                f" ON CONFLICT(key) DO UPDATE SET until = excluded.until WHERE {self.table}_leases.until <= ?",
+                (key, now + seconds, now),
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def release_lease(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}_leases WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+            self._db.execute(f"DELETE FROM {self.table}_leases")
+            self._db.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class RedisPlanStore:
+    """Redis（或协议兼容的服务）共享存储，适合多台机器共用缓存；需要安装 redis 包"""
+
+    name = "redis"
+    PREFIX = "travel:plan:"
+
+    def __init__(self, url: str, prefix: str = PREFIX):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError('redis package not found. Install via "pip install redis"') from exc
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Tuple[str, float, float] | None:
+        raw = self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        return record["value"], record["stored_at"], record["expires_at"]
+
+    def set(self, key: str, value: str, stored_at: float, expires_at: float) -> None:
+        record = json.dumps({"value": value, "stored_at": stored_at, "expires_at": expires_at}, ensure_ascii=False)
+        ttl_ms = max(1, int((expires_at - time.time()) * 1000))
+        self._redis.set(self.prefix + key, record, px=ttl_ms)
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(self.prefix + key)
+
+    def prune(self, now: float) -> int:
+        return 0  # 由 Redis 自身的过期机制清理
+
+    def acquire_lease(self, key: str, seconds: float) -> bool:
+        return bool(self._redis.set(self.prefix + "lease:" + key, "1", nx=True, px=max(1, int(seconds * 1000))))
+
+    def release_lease(self, key: str) -> None:
+        self._redis.delete(self.prefix + "lease:" + key)
+
+    def clear(self) -> None:
+        keys = list(self._redis.scan_iter(self.prefix + "*"))
+        if keys:
+            self._redis.delete(*keys)
+
+    def count(self) -> int:
+        return sum(1 for key in self._redis.scan_iter(self.prefix + "*") if b":lease:" not in key)
+
+
+class PlanCache:
+    """
+    两级行程缓存（线程安全）
+    行程以 FrozenDict 保存，读取时直接返回同一份不可变结构，不做拷贝；
+    ttl 内为新鲜条目；过期后 stale_ttl 内仍返回但标记 stale；
+    内存层条目最多保留 memory_ttl 秒，之后回共享层确认，以便看到其他进程的刷新结果
+    """
+
+    PRUNE_EVERY = 100  # 每写入 N 次清理一次共享层的过期条目
+
+    def __init__(self, store: Any | None, ttl: float, stale_ttl: float = 0.0,
+                 max_entries: int = 50, memory_ttl: float = 60.0):
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.memory_ttl = memory_ttl
+        # 内存层：key -> (entry, 放入内存的时间)
+        self._memory: "OrderedDict[str, Tuple[PlanCacheEntry, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._leases: set = set()  # 仅内存模式下的通用租约
+        self._writes = 0
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0,
+            "shared_errors": 0,
+            "refreshes_started": 0,
+            "refreshes_skipped": 0,
+            "refreshes_failed": 0,
+        }
+
+    @staticmethod
+    def digest(key: Any) -> str:
+        raw = json.dumps(key, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: Any) -> PlanCacheEntry | None:
+        digest = self.digest(key)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(digest)
+            if cached is not None:
+                entry, loaded_at = cached
+                recheck = self.store is not None and now - loaded_at > self.memory_ttl
+                if not recheck and self._alive(entry, now):
+                    self._memory.move_to_end(digest)
+                    return self._hit("memory_hits", entry, now)
+                self._memory.pop(digest, None)
+
+        row = None
+        if self.store is not None:
+            try:
+                row = self.store.get(digest)
+            except Exception as exc:
+                self._shared_error("get", exc)
+        with self._lock:
+            if row is not None:
+                value, stored_at, _ = row
+                record = json.loads(value)
+                entry = PlanCacheEntry(freeze(record["plan"]), record.get("metrics") or {}, stored_at, False)
+                if self._alive(entry, now):
+                    self._remember(digest, entry, now)
+                    return self._hit("shared_hits", entry, now)
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def peek(self, key: Any) -> PlanCacheEntry | None:
+        """查看条目（含陈旧条目）但不计入命中统计、不调整 LRU 顺序，供缓存预热判断剩余寿命"""
+        digest = self.digest(key)
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(digest)
+        entry = cached[0] if cached is not None else None
+        if entry is None and self.store is not None:
+            try:
+                row = self.store.get(digest)
+            except Exception as exc:
+                self._shared_error("get", exc)
+                row = None
+            if row is not None:
+                value, stored_at, _ = row
+                entry = PlanCacheEntry(freeze(json.loads(value)["plan"]), {}, stored_at, False)
+        if entry is None or not self._alive(entry, now):
+            return None
+        return entry._replace(stale=now - entry.stored_at > self.ttl)
+
+    def set(self, key: Any, plan: Dict[str, Any], metrics: Dict[str, Any]) -> None:
+        digest = self.digest(key)
+        now = time.time()
+        plan = freeze(plan)
+        entry = PlanCacheEntry(plan, metrics, now, False)
+        with self._lock:
+            self._remember(digest, entry, now)
+            self._stats["writes"] += 1
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if self.store is None:
+            return
+        try:
+            value = json.dumps({"plan": plan, "metrics": metrics}, ensure_ascii=False)
+            self.store.set(digest, value, now, now + self.ttl + self.stale_ttl)
+            if prune:
+                self.store.prune(now)
+        except Exception as exc:
+            self._shared_error("set", exc)
+
+    # --- 后台刷新 -----------------------------------------------------
+    def try_begin_refresh(self, key: Any, lease_seconds: float = 600.0) -> bool:
+        """为陈旧条目申请刷新权：本进程内去重，并在共享层获取租约避免多个进程重复生成"""
+        digest = self.digest(key)
+        with self._lock:
+            if digest in self._refreshing:
+                self._stats["refreshes_skipped"] += 1
+                return False
+            self._refreshing.add(digest)
+        acquired = True
+        if self.store is not None:
+            try:
+                acquired = self.store.acquire_lease(digest, lease_seconds)
+            except Exception as exc:
+                self._shared_error("lease", exc)
+        with self._lock:
+            if acquired:
+                self._stats["refreshes_started"] += 1
+            else:
+                self._refreshing.discard(digest)
+                self._stats["refreshes_skipped"] += 1
+        return acquired
+
+    def end_refresh(self, key: Any, ok: bool) -> None:
+        digest = self.digest(key)
+        with self._lock:
+            self._refreshing.discard(digest)
+            if not ok:
+                self._stats["refreshes_failed"] += 1
+        if self.store is not None:
+            try:
+                self.store.release_lease(digest)
+            except Exception as exc:
+                self._shared_error("lease", exc)
+
+    def acquire_lease(self, name: str, seconds: float) -> bool:
+        """通用租约（如缓存预热任务），多个 worker 中只有一个能拿到"""
+        digest = self.digest(["lease", name])
+        if self.store is None:
+            with self._lock:
+                if digest in self._leases:
+                    return False
+                self._leases.add(digest)
+                return True
+        try:
+            return self.store.acquire_lease(digest, seconds)
+        except Exception as exc:
+            self._shared_error("lease", exc)
+            return False
+
+    def release_lease(self, name: str) -> None:
+        digest = self.digest(["lease", name])
+        with self._lock:
+            self._leases.discard(digest)
+        if self.store is not None:
+            try:
+                self.store.release_lease(digest)
+            except Exception as exc:
+                self._shared_error("lease", exc)
+
+    # --- 维护 ---------------------------------------------------------
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["refreshing"] = len(self._refreshing)
+        stats["backend"] = getattr(self.store, "name", "memory")
+        if self.store is not None:
+            try:
+                stats["shared_entries"] = self.store.count()
+            except Exception as exc:
+                stats["shared_entries"] = None
+                logger.warning("Plan cache count failed: %s", exc)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats.update({"ttl": self.ttl, "stale_ttl": self.stale_ttl, "max_entries": self.max_entries})
+        return stats
+
+    # ------------------------------------------------------------------
+    def _alive(self, entry: PlanCacheEntry, now: float) -> bool:
+        return now - entry.stored_at <= self.ttl + self.stale_ttl
+
+    def _hit(self, tier: str, entry: PlanCacheEntry, now: float) -> PlanCacheEntry:
+        self._stats["hits"] += 1
+        self._stats[tier] += 1
+        if now - entry.stored_at > self.ttl:
+            self._stats["stale_served"] += 1
+            return entry._replace(stale=True)
+        return entry
+
+    def _remember(self, digest: str, entry: PlanCacheEntry, now: float) -> None:
+        self._memory[digest] = (entry, now)
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _shared_error(self, op: str, exc: Exception) -> None:
+        with self._lock:
+            self._stats["shared_errors"] += 1
+        logger.warning("Plan cache shared tier %s failed: %s", op, exc)
+
+
+_plan_cache: PlanCache | None = None
+_fragment_cache: PlanCache | None = None
+_map_cache: PlanCache | None = None
+_plan_cache_lock = threading.Lock()
+
+
+def _build_store(name: str) -> Any | None:
+    """共享层按 name 区分：SQLite 用同一个文件中的不同表，Redis 用不同键前缀"""
+    backend = (settings.PLAN_CACHE_BACKEND or "memory").lower()
+    try:
+        if backend == "sqlite" and settings.PLAN_CACHE_PATH:
+            return SQLitePlanStore(settings.PLAN_CACHE_PATH, table=name)
+        if backend == "redis":
+            return RedisPlanStore(settings.PLAN_CACHE_REDIS_URL, prefix=f"travel:{name}:")
+    except Exception as exc:
+        logger.warning("Plan cache shared tier unavailable for %s, using memory only: %s", name, exc)
+    return None
+
+
+def get_plan_cache() -> PlanCache:
+    """进程内共享的行程缓存；共享层初始化失败时退化为仅内存缓存"""
+    global _plan_cache
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                _plan_cache = PlanCache(
+                    _build_store("plan_cache"),
+                    ttl=settings.PLAN_CACHE_TTL,
+                    stale_ttl=settings.PLAN_CACHE_STALE_TTL,
+                    max_entries=settings.PLAN_CACHE_MAX_ENTRIES,
+                    memory_ttl=settings.PLAN_CACHE_MEMORY_TTL,
+                )
+    return _plan_cache
+
+
+def get_fragment_cache() -> PlanCache:
+    """
+    行程片段缓存：行程概要与每一天的增强结果分别按输入内容哈希缓存，
+    天数或优先级不同的请求可以复用没有变化的部分
+    """
+    global _fragment_cache
+    if _fragment_cache is None:
+        with _plan_cache_lock:
+            if _fragment_cache is None:
+                _fragment_cache = PlanCache(
+                    _build_store("plan_fragments"),
+                    ttl=settings.PLAN_FRAGMENT_TTL,
+                    max_entries=settings.PLAN_FRAGMENT_MAX_ENTRIES,
+                    memory_ttl=settings.PLAN_CACHE_MEMORY_TTL,
+                )
+    return _fragment_cache
+
+
+def get_map_cache() -> PlanCache:
+    """
+    行程地图缓存：按 (trip_id, 行程更新时间) 缓存组装好的地图数据，
+    行程被调整后更新时间变化，旧条目自然失效，各 worker 之间无需显式清除
+    """
+    global _map_cache
+    if _map_cache is None:
+        with _plan_cache_lock:
+            if _map_cache is None:
+                _map_cache = PlanCache(
+                    _build_store("trip_maps"),
+                    ttl=settings.TRIP_MAP_CACHE_TTL,
+                    max_entries=settings.TRIP_MAP_CACHE_MAX_ENTRIES,
+                    memory_ttl=settings.TRIP_MAP_CACHE_TTL,  # 键中含版本，内存层无需回共享层确认
+                )
+    return _map_cache
@@ -4,6 +4,7 @@ from typing import List, Dict, Optional
 from math import radians, sin, cos, sqrt, atan2
 from pathlib import Path
 from backend.services.travel_api_service import TravelAPIService
+from backend.utils.canonical import canonical_city
 import logging
 
 logger = logging.getLogger(__name__)
@@ -157,7 +158,8 @@ class POIService:
             with open(data_path, 'r', encoding='utf-8') as fp:
                 data = json.load(fp)
             normalized = city.strip()
-            candidates = [normalized, normalized.title(), normalized.lower(), normalized.upper()]
+            # 先按别名表取规范名（Beijing/北京市 -> 北京），再兼容数据集中的其他写法
+            candidates = [canonical_city(normalized), normalized, normalized.title(), normalized.lower(), normalized.upper()]
             for key in candidates:
                 if key in data:
                     return data[key]
@@ -0,0 +1,151 @@
+"""
+行程补全流水线：地理编码、价格估算、评价摘要与相邻活动间路线
+原先按活动逐个串行调用（每个外部调用最长阻塞 10~60 秒），现在整趟行程的调用一次性提交到
+有界线程池并发执行：地址去重后各编码一次，路线在两端坐标就绪后立即计算，评价摘要整批并行。
+结果汇总后由调用方一次写入数据库，总耗时接近最慢的一条依赖链，而不是所有调用之和。
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import backend.settings as settings
+from backend.services.llm import transport
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """进程内共享的线程池：所有请求的外部调用合计不超过 ENRICH_MAX_WORKERS 个"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, settings.ENRICH_MAX_WORKERS),
+                                               thread_name_prefix="trip-enrich")
+    return _executor
+
+
+def enrich_trip_plan(trip_plan: Dict[str, Any], city: str, transport_mode: str,
+                     map_service, price_service, ai_service) -> List[Dict[str, Any]]:
+    """同步封装：在共享的后台事件循环上运行 enrich_trip_plan_async"""
+    return transport.run_sync(enrich_trip_plan_async(
+        trip_plan, city, transport_mode, map_service, price_service, ai_service
+    ))
+
+
+async def enrich_trip_plan_async(trip_plan: Dict[str, Any], city: str, transport_mode: str,
+                                 map_service, price_service, ai_service) -> List[Dict[str, Any]]:
+    """
+    返回按天的补全结果：
+    [{"day": day_data, "activities": [{"data", "location", "price", "reviews"}],
+      "routes": [{"from": 下标, "to": 下标, "info": calculate_route 结果}]}]
+    路线规则与原逻辑一致：同一天内 order 相邻且两端都有坐标的活动之间计算一条
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    timings: List[float] = []
+
+    def _submit(fn: Callable, *args) -> "asyncio.Future":
+        def _timed():
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings.append(time.perf_counter() - start)
+        return loop.run_in_executor(executor, _timed)
+
+    started = time.perf_counter()
+    days = trip_plan.get('days', [])
+    activities = [act for day in days for act in day.get('activities', [])]
+
+    # 评价摘要本身已合并为少量 LLM 调用，整体作为一个任务与其他调用并行
+    reviews_task = _submit(ai_service.get_reviews_summaries, [act.get('name', '') for act in activities], city)
+
+    # 地理编码单独限流（ENRICH_GEOCODE_CONCURRENCY）：回落到 Nominatim 时其公共服务只允许 1 次/秒，
+    # 价格与评价仍按线程池全部并发
+    geocode_slots = asyncio.Semaphore(max(1, settings.ENRICH_GEOCODE_CONCURRENCY))
+
+    async def _geocode(address: str):
+        async with geocode_slots:
+            return await _submit(map_service.geocode_address, address)
+
+    geocode_tasks: Dict[str, asyncio.Future] = {}
+    price_tasks: Dict[tuple, asyncio.Future] = {}
+    for act in activities:
+        address = act.get('address', '')
+        if address and address not in geocode_tasks:
+            geocode_tasks[address] = asyncio.ensure_future(_geocode(address))
+        price_key = (act.get('name', ''), act.get('type', ''))
+        if price_key not in price_tasks:
+            price_tasks[price_key] = _submit(price_service.estimate_activity_price, *price_key, city)
+
+    async def _location(address: str):
+        return await geocode_tasks[address] if address else None
+
+    async def _route(from_address: str, to_address: str):
+        # 两端坐标一就绪就计算路线，不等待整趟行程的地理编码完成
+        start, end = await asyncio.gather(_location(from_address), _location(to_address))
+        if not (start and end and start.get('latitude') and end.get('latitude')):
+            return None
+        return await _submit(map_service.calculate_route, start['latitude'], start['longitude'],
+                             end['latitude'], end['longitude'], transport_mode)
+
+    route_tasks = []
+    for day_index, day in enumerate(days):
+        by_order = {act.get('order', 1): index for index, act in enumerate(day.get('activities', []))}
+        for index, act in enumerate(day.get('activities', [])):
+            order = act.get('order', 1)
+            if order > 1 and order - 1 in by_order:
+                prev = day['activities'][by_order[order - 1]]
+                route_tasks.append((day_index, by_order[order - 1], index,
+                                    asyncio.ensure_future(_route(prev.get('address', ''), act.get('address', '')))))
+
+    await asyncio.gather(reviews_task, *geocode_tasks.values(), *price_tasks.values(),
+                         *(task for *_, task in route_tasks))
+
+    reviews = reviews_task.result()
+    result = []
+    for day in days:
+        result.append({
+            'day': day,
+            'activities': [{
+                'data': act,
+                'location': geocode_tasks[act['address']].result() if act.get('address') else None,
+                'price': price_tasks[(act.get('name', ''), act.get('type', ''))].result(),
+                'reviews': reviews.get(act.get('name', ''), {}),
+            } for act in day.get('activities', [])],
+            'routes': [],
+        })
+    for day_index, from_index, to_index, task in route_tasks:
+        if task.result():
+            result[day_index]['routes'].append({'from': from_index, 'to': to_index, 'info': task.result()})
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Enriched %s activities (%s geocodes, %s prices, %s routes) in %.2fs; sequential would take ~%.2fs",
+        len(activities), len(geocode_tasks), len(price_tasks), len(route_tasks), elapsed, sum(timings),
+    )
+    return result
+
+
+def calculate_routes(map_service, legs: List[tuple], transport_mode: str) -> List[Dict[str, Any] | None]:
+    """
+    批量计算路线：legs 为 [(from_lat, from_lng, to_lat, to_lng)]，全部提交到共享线程池后一起等待，
+    按输入顺序返回结果；单条失败时对应位置为 None
+    """
+    executor = _get_executor()
+    futures = [executor.submit(map_service.calculate_route, *leg, transport_mode) for leg in legs]
+    results = []
+    for leg, future in zip(legs, futures):
+        try:
+            results.append(future.result())
+        except Exception as exc:
+            logger.warning("Route calculation failed for %s: %s", leg, exc)
+            results.append(None)
+    return results
@@ -0,0 +1,135 @@
+"""
+行程地图数据
+路线优先读取生成行程时写入的 Route 记录，缺失的路段（如行程调整后被删除）一次性批量计算并写回；
+组装好的地图数据按 (trip_id, 行程更新时间) 缓存，行程变化后自动失效。
+"""
+import json
+import logging
+from typing import Any, Dict
+
+from backend.models import DayPlan, Route, Trip
+from backend.services import trip_writer
+from backend.services.plan_cache import get_map_cache
+from backend.services.trip_enrichment import calculate_routes
+from backend.utils.frozen import freeze
+from sqlalchemy.orm import selectinload
+
+logger = logging.getLogger(__name__)
+
+
+def map_cache_key(trip) -> tuple:
+    """行程版本：Trip.updated_at 在生成与调整时更新"""
+    return ("map", trip.id, trip.updated_at.isoformat() if trip.updated_at else None)
+
+
+def get_trip_map(trip, map_service) -> Dict[str, Any]:
+    """返回行程地图数据（缓存命中时为只读结构，可直接 jsonify）"""
+    cache = get_map_cache()
+    key = map_cache_key(trip)
+    cached = cache.get(key)
+    if cached:
+        return cached.plan
+
+    map_data, complete = build_trip_map(trip.id, map_service)
+    # 有路段计算失败时不缓存，下次请求重试
+    if complete:
+        map_data = freeze(map_data)
+        cache.set(key, map_data, {})
+    return map_data
+
+
+def build_trip_map(trip_id: int, map_service) -> tuple:
+    """组装地图数据，返回 (map_data, 是否所有路段都已就绪)"""
+    trip = Trip.query.options(
+        selectinload(Trip.days_plans).selectinload(DayPlan.activities)
+    ).filter_by(id=trip_id).one()
+
+    map_data = {
+        'city': trip.city,
+        'activities': [],
+        'routes': []
+    }
+
+    for day_plan in trip.days_plans:
+        for activity in day_plan.activities:
+            if activity.latitude and activity.longitude:
+                map_data['activities'].append({
+                    'id': activity.id,
+                    'name': activity.name,
+                    'latitude': activity.latitude,
+                    'longitude': activity.longitude,
+                    'type': activity.type,
+                    'day': day_plan.day_number,
+                    'order': activity.order
+                })
+
+    legs = []
+    for day_plan in trip.days_plans:
+        activities = sorted(day_plan.activities, key=lambda x: x.order)
+        legs.extend(
+            (from_act, to_act) for from_act, to_act in zip(activities, activities[1:])
+            if from_act.latitude and to_act.latitude
+        )
+
+    # 一次查询取出所有已存路线；交通方式不同的旧路线不复用
+    activity_ids = [from_act.id for from_act, _ in legs]
+    stored = {}
+    if activity_ids:
+        for route in Route.query.filter(Route.from_activity_id.in_(activity_ids)):
+            if not trip.transport_mode or route.transport_mode in (None, trip.transport_mode):
+                stored[(route.from_activity_id, route.to_activity_id)] = {
+                    'duration_minutes': route.duration_minutes,
+                    'distance_km': route.distance_km,
+                    'polyline': json.loads(route.route_data) if route.route_data else None
+                }
+
+    missing = [leg for leg in legs if (leg[0].id, leg[1].id) not in stored]
+    complete = True
+    rows = []
+    if missing:
+        results = calculate_routes(
+            map_service,
+            [(a.latitude, a.longitude, b.latitude, b.longitude) for a, b in missing],
+            trip.transport_mode
+        )
+        for (from_act, to_act), route_info in zip(missing, results):
+            if not route_info:
+                complete = False
+                continue
+            stored[(from_act.id, to_act.id)] = route_info
+            rows.append({
+                'from_activity_id': from_act.id,
+                'to_activity_id': to_act.id,
+                'transport_mode': trip.transport_mode,
+                'duration_minutes': route_info['duration_minutes'],
+                'distance_km': route_info['distance_km'],
+                'route_data': json.dumps(route_info.get('polyline'), ensure_ascii=False) if route_info.get('polyline') else None
+            })
+        logger.info("Trip %s map: %s stored legs, %s computed", trip_id, len(legs) - len(missing), len(rows))
+
+    for from_act, to_act in legs:
+        route_info = stored.get((from_act.id, to_act.id))
+        if not route_info:
+            continue
+        map_data['routes'].append({
+            'from': {
+                'id': from_act.id,
+                'name': from_act.name,
+                'lat': from_act.latitude,
+                'lng': from_act.longitude
+            },
+            'to': {
+                'id': to_act.id,
+                'name': to_act.name,
+                'lat': to_act.latitude,
+                'lng': to_act.longitude
+            },
+            'duration_minutes': route_info['duration_minutes'],
+            'distance_km': route_info['distance_km'],
+            'polyline': route_info.get('polyline')
+        })
+
+    # 最后再写回：提交会使已加载的 ORM 对象过期，放在组装之后避免逐个重新加载
+    if rows:
+        trip_writer.insert_routes(rows)
+    return map_data, complete
@@ -0,0 +1,340 @@
+"""
+行程增量调整
+根据用户需求找出受影响的天，把这些天以精简 JSON 交给 LLM，LLM 返回 JSON Patch 风格的修改操作，
+校验后应用到行程 dict 或数据库中的 DayPlan/Activity 记录（单个事务）。
+
+路径使用天数与活动 id（没有 id 时用 order）定位，而不是数组下标，避免前面的操作改变后面的下标：
+    /days/<天数>/description
+    /days/<天数>/activities/<活动id>/<字段>     replace
+    /days/<天数>/activities/<活动id>            remove
+    /days/<天数>/activities/-                  add（value 为活动对象）
+    {"op": "move", "from": "/days/2/activities/15", "path": "/days/3/activities/-"}
+"""
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from backend.utils.frozen import thaw
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_FIELDS = (
+    "name", "type", "address", "start_time", "end_time", "duration_minutes",
+    "description", "price_estimate", "price_range", "tags", "rating",
+)
+OPS = ("replace", "add", "remove", "move")
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUM = r"[0-9零一二两三四五六七八九十]+"
+_DAY_RANGE_RE = re.compile(rf"第\s*({_NUM})\s*(?:天)?\s*[-~～到至]\s*(?:第)?\s*({_NUM})\s*天")
+_DAY_RE = re.compile(rf"第\s*({_NUM})\s*天|day\s*(\d+)|D(\d+)\b", re.IGNORECASE)
+_ALL_DAYS_RE = re.compile(r"每天|每一天|所有|全部|整个|整体|every\s*day|all\s*days|whole\s*trip", re.IGNORECASE)
+_LAST_DAY_RE = re.compile(r"最后一天|last\s*day", re.IGNORECASE)
+_PATH_RE = re.compile(r"^/days/(\d+)(?:/(description)|/activities/([^/]+)(?:/([a-z_]+))?)$")
+
+
+def _cn_to_int(text: str) -> int | None:
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        value = (_CN_DIGITS.get(tens, 0) if tens else 1) * 10
+        return value + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    return _CN_DIGITS.get(text)
+
+
+def trip_days(trip: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """兼容数据库行程（days_plans）与生成的行程（days 为列表）"""
+    days = trip.get("days_plans")
+    if days is None and isinstance(trip.get("days"), list):
+        days = trip["days"]
+    return days or []
+
+
+def activity_ref(activity: Dict[str, Any]) -> str:
+    ref = activity.get("id")
+    return str(ref if ref is not None else activity.get("order"))
+
+
+def find_affected_days(trip: Dict[str, Any], requirements: str) -> List[int]:
+    """从需求文本中找出涉及的天：显式提到的天数、范围、最后一天，以及提到的活动名所在的天；都没有则视为全部"""
+    days = trip_days(trip)
+    all_numbers = [day.get("day_number") for day in days]
+    if not requirements or _ALL_DAYS_RE.search(requirements):
+        return all_numbers
+
+    found = set()
+    for start, end in _DAY_RANGE_RE.findall(requirements):
+        lo, hi = _cn_to_int(start), _cn_to_int(end)
+        if lo and hi:
+            found.update(range(min(lo, hi), max(lo, hi) + 1))
+    for groups in _DAY_RE.findall(requirements):
+        value = next((g for g in groups if g), None)
+        number = _cn_to_int(value) if value else None
+        if number:
+            found.add(number)
+    if _LAST_DAY_RE.search(requirements) and all_numbers:
+        found.add(max(all_numbers))
+    for day in days:
+        for act in day.get("activities", []):
+            name = (act.get("name") or "").strip()
+            if len(name) >= 2 and name in requirements:
+                found.add(day.get("day_number"))
+
+    scoped = [number for number in all_numbers if number in found]
+    return scoped or all_numbers
+
+
+def compact_days(trip: Dict[str, Any], day_numbers: List[int]) -> Dict[str, Any]:
+    """受影响天的精简表示（只含定位与排程需要的字段），外加其他天已安排的景点名用于避免重复"""
+    scope = set(day_numbers)
+    selected, others = [], []
+    for day in trip_days(trip):
+        if day.get("day_number") in scope:
+            selected.append({
+                "day": day.get("day_number"),
+                "description": (day.get("description") or "")[:60],
+                "activities": [
+                    {
+                        "id": activity_ref(act),
+                        "name": act.get("name"),
+                        "type": act.get("type"),
+                        "start_time": act.get("start_time"),
+                        "end_time": act.get("end_time"),
+                        "price_estimate": act.get("price_estimate"),
+                    }
+                    for act in day.get("activities", [])
+                ],
+            })
+        else:
+            others.extend(act.get("name") for act in day.get("activities", []) if act.get("name"))
+    return {"city": trip.get("city"), "days": selected, "other_days_pois": others}
+
+
+def parse_ops(raw_ops: Any, trip: Dict[str, Any], day_numbers: List[int]) -> List[Dict[str, Any]]:
+    """校验 LLM 返回的操作：只保留作用于受影响天、字段在白名单内、目标存在的操作"""
+    scope = set(day_numbers)
+    refs = {
+        day.get("day_number"): {activity_ref(act) for act in day.get("activities", [])}
+        for day in trip_days(trip)
+    }
+    ops: List[Dict[str, Any]] = []
+    for raw in raw_ops if isinstance(raw_ops, list) else []:
+        try:
+            op = _parse_op(raw, scope, refs)
+        except (ValueError, TypeError) as exc:
+            logger.warning("Dropping invalid trip patch op %s: %s", raw, exc)
+            continue
+        # 跟踪删除/移动后的活动归属，后续操作引用已不存在的活动时会被丢弃
+        if op["op"] == "remove":
+            refs[op["day"]].discard(op["activity"])
+        elif op["op"] == "move":
+            refs[op["from_day"]].discard(op["from_activity"])
+            refs[op["day"]].add(op["from_activity"])
+        ops.append(op)
+    return ops
+
+
+def _parse_path(path: Any, scope: set, refs: Dict[int, set]) -> tuple:
+    match = _PATH_RE.match(path or "") if isinstance(path, str) else None
+    if not match:
+        raise ValueError(f"unsupported path {path!r}")
+    day, day_field, act, field = int(match.group(1)), match.group(2), match.group(3), match.group(4)
+    if day not in scope:
+        raise ValueError(f"day {day} is outside the adjustment scope")
+    if act is not None and act != "-" and act not in refs.get(day, set()):
+        raise ValueError(f"activity {act} not found on day {day}")
+    if field is not None and field not in ACTIVITY_FIELDS:
+        raise ValueError(f"field {field} is not editable")
+    return day, day_field, act, field
+
+
+def _parse_op(raw: Any, scope: set, refs: Dict[int, set]) -> Dict[str, Any]:
+    if not isinstance(raw, dict) or raw.get("op") not in OPS:
+        raise ValueError("unknown op")
+    kind = raw["op"]
+    day, day_field, act, field = _parse_path(raw.get("path"), scope, refs)
+    op: Dict[str, Any] = {"op": kind, "day": day, "activity": act, "field": day_field or field}
+
+    if kind == "replace":
+        if act == "-" or (act is not None and field is None) or (act is None and day_field is None):
+            raise ValueError("replace must target a single field")
+        op["value"] = _coerce(op["field"], raw.get("value"))
+    elif kind == "remove":
+        if act in (None, "-") or field is not None:
+            raise ValueError("remove must target an activity")
+    elif kind == "add":
+        if act != "-" or not isinstance(raw.get("value"), dict) or not raw["value"].get("name"):
+            raise ValueError("add must append an activity object with a name to /activities/-")
+        op["value"] = {
+            key: _coerce(key, value) for key, value in raw["value"].items() if key in ACTIVITY_FIELDS
+        }
+    else:  # move
+        from_day, _, from_act, from_field = _parse_path(raw.get("from"), scope, refs)
+        if from_act in (None, "-") or from_field is not None or act != "-":
+            raise ValueError("move must take an activity and append it to /activities/-")
+        op.update({"from_day": from_day, "from_activity": from_act})
+    return op
+
+
+def _coerce(field: str, value: Any) -> Any:
+    if field in ("start_time", "end_time"):
+        datetime.strptime(str(value), "%H:%M")
+        return str(value)
+    if field in ("price_estimate", "rating"):
+        return float(value)
+    if field == "duration_minutes":
+        return int(value)
+    if field == "tags":
+        if not isinstance(value, list):
+            raise ValueError("tags must be a list")
+        return [str(tag) for tag in value][:5]
+    return "" if value is None else str(value)
+
+
+# ----------------------------------------------------------------------
+# 应用
+# ----------------------------------------------------------------------
+def _sort_key(activity: Dict[str, Any]):
+    return (activity.get("start_time") or "99:99", activity.get("order") or 0)
+
+
+def apply_to_dict(trip: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把操作应用到行程 dict 的副本上，受影响的天按开始时间重新排序编号"""
+    result = thaw(trip)
+    days = {day.get("day_number"): day for day in trip_days(result)}
+    touched = set()
+    for op in ops:
+        day = days[op["day"]]
+        activities = day.setdefault("activities", [])
+        touched.add(op["day"])
+        if op["op"] == "replace" and op["activity"] is None:
+            day[op["field"]] = op["value"]
+        elif op["op"] == "replace":
+            _find(activities, op["activity"])[op["field"]] = op["value"]
+        elif op["op"] == "remove":
+            activities.remove(_find(activities, op["activity"]))
+        elif op["op"] == "add":
+            activities.append({**op["value"], "order": len(activities) + 1})
+        else:
+            source = days[op["from_day"]].setdefault("activities", [])
+            moved = _find(source, op["from_activity"])
+            source.remove(moved)
+            activities.append(moved)
+            touched.add(op["from_day"])
+    for number in touched:
+        activities = sorted(days[number].get("activities", []), key=_sort_key)
+        for order, act in enumerate(activities, start=1):
+            act["order"] = order
+        days[number]["activities"] = activities
+    return result
+
+
+def _find(activities: List[Dict[str, Any]], ref: str) -> Dict[str, Any]:
+    for act in activities:
+        if activity_ref(act) == ref:
+            return act
+    raise KeyError(f"activity {ref} not found")
+
+
+def apply_to_db(trip, ops: List[Dict[str, Any]],
+                geocode: Callable[[str], Dict[str, Any] | None] | None = None) -> Dict[str, Any]:
+    """
+    在一个事务中把操作应用到 Trip 的 DayPlan/Activity 记录；任一操作失败则整体回滚。
+    受影响天的活动重新编号，涉及这些活动的 Route 记录被删除（下次查看地图时重新计算）。
+    geocode 用于为新增或改了地址的活动补坐标：外部请求较慢，在第一次写入之前完成，不占用数据库写锁。
+    """
+    from backend.models import Activity, Route, db
+    from backend.services import export_cache, trip_snapshot
+
+    days = {dp.day_number: dp for dp in trip.days_plans}
+    touched = set()
+    try:
+        locations = _geocode_addresses(ops, geocode)
+
+        # 先删掉受影响天（含被删除 / 移走的活动）的路线：外键约束生效时，删除活动前必须先删引用它的 Route
+        affected_days = {op["day"] for op in ops} | {op["from_day"] for op in ops if op.get("from_day")}
+        activity_ids = [a.id for number in affected_days if number in days for a in days[number].activities]
+        if activity_ids:
+            Route.query.filter(
+                db.or_(Route.from_activity_id.in_(activity_ids), Route.to_activity_id.in_(activity_ids))
+            ).delete(synchronize_session=False)
+
+        for op in ops:
+            day_plan = days[op["day"]]
+            touched.add(op["day"])
+            if op["op"] == "replace" and op["activity"] is None:
+                setattr(day_plan, op["field"], op["value"])
+            elif op["op"] == "replace":
+                activity = _find_row(day_plan, op["activity"])
+                _set_field(activity, op["field"], op["value"], locations)
+            elif op["op"] == "remove":
+                activity = _find_row(day_plan, op["activity"])
+                day_plan.activities.remove(activity)
+                db.session.delete(activity)
+            elif op["op"] == "add":
+                activity = Activity(name=op["value"]["name"], order=len(day_plan.activities) + 1)
+                for field, value in op["value"].items():
+                    if field != "name":
+                        _set_field(activity, field, value, locations)
+                day_plan.activities.append(activity)
+            else:
+                source = days[op["from_day"]]
+                activity = _find_row(source, op["from_activity"])
+                source.activities.remove(activity)
+                day_plan.activities.append(activity)
+                touched.add(op["from_day"])
+        db.session.flush()
+
+        for number in touched:
+            rows = sorted(
+                days[number].activities,
+                key=lambda a: (a.start_time.strftime("%H:%M") if a.start_time else "99:99", a.order or 0),
+            )
+            for order, activity in enumerate(rows, start=1):
+                activity.order = order
+        # 更新行程版本，按版本缓存的地图等数据随之失效；快照在同一事务中重新渲染
+        trip.updated_at = datetime.utcnow()
+        db.session.flush()
+        snapshot = trip_snapshot.refresh(trip.id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    export_cache.prerender(snapshot)
+    return {"applied": len(ops), "days": sorted(touched)}
+
+
+def _find_row(day_plan, ref: str):
+    for activity in day_plan.activities:
+        if str(activity.id) == ref:
+            return activity
+    raise KeyError(f"activity {ref} not found on day {day_plan.day_number}")
+
+
+def _geocode_addresses(ops: List[Dict[str, Any]],
+                       geocode: Callable[[str], Dict[str, Any] | None] | None) -> Dict[str, Dict[str, Any] | None]:
+    """新增或修改的地址 -> 坐标（同一地址只查一次）"""
+    if not geocode:
+        return {}
+    addresses = []
+    for op in ops:
+        if op["op"] == "replace" and op.get("field") == "address":
+            addresses.append(op["value"])
+        elif op["op"] == "add":
+            addresses.append(op["value"].get("address"))
+    return {address: geocode(address) for address in dict.fromkeys(addresses) if address}
+
+
+def _set_field(activity, field: str, value: Any, locations: Dict[str, Dict[str, Any] | None]) -> None:
+    if field in ("start_time", "end_time"):
+        value = datetime.strptime(value, "%H:%M").time()
+    elif field == "tags":
+        value = json.dumps(value, ensure_ascii=False)
+    setattr(activity, field, value)
+    if field == "address" and value in locations:
+        location = locations[value]
+        activity.latitude = location["latitude"] if location else None
+        activity.longitude = location["longitude"] if location else None
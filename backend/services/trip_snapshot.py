@@ -0,0 +1,50 @@
+"""
+行程快照：完整行程文档（Trip.to_dict()）以 orjson 编码存入 trips.snapshot
+每次写入行程（生成、调整）时在同一事务中重新渲染，GET /api/trips/<id> 直接返回存储的字节，
+不再加载 DayPlan / Activity、逐列 json.loads 与 strftime。
+"""
+import logging
+
+import orjson
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+
+from backend.models import DayPlan, Trip, db
+
+logger = logging.getLogger(__name__)
+
+
+def render(trip) -> bytes:
+    return orjson.dumps(trip.to_dict())
+
+
+def refresh(trip_id: int) -> bytes:
+    """
+    重新加载行程并写入快照（不提交，随调用方的事务一起提交）；
+    显式带上原 updated_at，避免 onupdate 改变行程版本
+    """
+    trip = Trip.query.options(
+        selectinload(Trip.days_plans).selectinload(DayPlan.activities)
+    ).populate_existing().filter_by(id=trip_id).one()
+    snapshot = render(trip)
+    db.session.execute(
+        update(Trip).where(Trip.id == trip_id).values(snapshot=snapshot, updated_at=trip.updated_at)
+    )
+    return snapshot
+
+
+def get(trip_id: int) -> bytes | None:
+    """读取快照；行程不存在返回 None，旧数据没有快照时现场生成并保存"""
+    row = db.session.execute(select(Trip.id, Trip.snapshot).where(Trip.id == trip_id)).first()
+    if row is None:
+        return None
+    if row.snapshot is not None:
+        return row.snapshot
+    try:
+        snapshot = refresh(trip_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info("Backfilled snapshot for trip %s", trip_id)
+    return snapshot
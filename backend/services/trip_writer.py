@@ -0,0 +1,104 @@
+"""
+行程批量写入
+生成行程时按表批量插入：Trip 一条、DayPlan / Activity / Route 各一次 executemany，
+id 在内存中预先分配，父子关系与"前一个活动"都在本地记录，不再逐行 flush、也不回查数据库。
+同一事务中顺带渲染行程快照（trip_snapshot），读取时直接返回；提交后在后台预渲染导出文件（export_cache）。
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import func, insert, select
+
+from backend.models import Activity, DayPlan, Route, Trip, db
+from backend.services import export_cache, trip_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def _allocate_ids(session, model, count: int) -> List[int] | None:
+    """
+    在内存中为 count 行分配连续 id
+    SQLite 在事务的第一条写语句后即持有写锁，此后读取 MAX(id) 再顺延是安全的；
+    其他数据库的 id 由序列生成，返回 None 由调用方改用 INSERT ... RETURNING 取回
+    """
+    if session.get_bind().dialect.name != "sqlite" or not count:
+        return None
+    start = session.execute(select(func.coalesce(func.max(model.id), 0))).scalar_one() + 1
+    return list(range(start, start + count))
+
+
+def _insert_many(session, model, rows: List[Dict[str, Any]]) -> List[int]:
+    """批量插入并按输入顺序返回 id"""
+    if not rows:
+        return []
+    ids = _allocate_ids(session, model, len(rows))
+    if ids is not None:
+        for row, row_id in zip(rows, ids):
+            row["id"] = row_id
+        session.execute(insert(model), rows)
+        return ids
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(session.execute(stmt, rows).scalars())
+
+
+def insert_trip(trip_fields: Dict[str, Any], days: List[Dict[str, Any]], commit: bool = True) -> int:
+    """
+    写入一趟完整行程，返回 trip id
+    days: [{"day_number", "date", "description",
+            "activities": [Activity 列值 dict（不含 id / day_plan_id）],
+            "routes": [{"from": 当天活动下标, "to": 当天活动下标, 其余为 Route 列值}]}]
+    全部语句在同一事务中执行，任一步失败整体回滚
+    """
+    session = db.session
+    now = datetime.utcnow()
+    try:
+        trip_id = session.execute(
+            insert(Trip).returning(Trip.id),
+            {**trip_fields, "created_at": now, "updated_at": now},
+        ).scalar_one()
+
+        day_ids = _insert_many(session, DayPlan, [
+            {"trip_id": trip_id, "day_number": day["day_number"], "date": day.get("date"),
+             "description": day.get("description")}
+            for day in days
+        ])
+
+        activity_rows = []
+        for day, day_id in zip(days, day_ids):
+            activity_rows.extend({**act, "day_plan_id": day_id} for act in day.get("activities", []))
+        activity_ids = iter(_insert_many(session, Activity, activity_rows))
+
+        route_rows = []
+        for day in days:
+            ids = [next(activity_ids) for _ in day.get("activities", [])]
+            for leg in day.get("routes", []):
+                leg = dict(leg)
+                from_index, to_index = leg.pop("from"), leg.pop("to")
+                route_rows.append({**leg, "from_activity_id": ids[from_index], "to_activity_id": ids[to_index]})
+        _insert_many(session, Route, route_rows)
+        snapshot = trip_snapshot.refresh(trip_id)
+
+        if commit:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    if commit:
+        export_cache.prerender(snapshot)
+    logger.debug("Inserted trip %s: %s days, %s activities, %s routes",
+                 trip_id, len(days), len(activity_rows), len(route_rows))
+    return trip_id
+
+
+def insert_routes(rows: List[Dict[str, Any]], commit: bool = True) -> List[int]:
+    """批量写入路线（Route 列值 dict），返回 id"""
+    session = db.session
+    try:
+        ids = _insert_many(session, Route, rows)
+        if commit:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return ids
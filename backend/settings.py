@@ -1,7 +1,9 @@
 import os
-from dotenv import load_dotenv
+from pathlib import Path
+from dotenv import find_dotenv, load_dotenv
 
 load_dotenv()  # 读取根目录 .env
+ENV_FILE = find_dotenv() or str(Path(__file__).resolve().parent.parent / ".env")
 
 LLM_PRIMARY = os.getenv("LLM_PRIMARY", "aliyun")
 
@@ -13,3 +15,101 @@ DIFY_API_BASE = os.getenv("DIFY_API_BASE", "").rstrip("/")
 DIFY_API_KEY  = os.getenv("DIFY_API_KEY", "")
 DIFY_APP_USER = os.getenv("DIFY_APP_USER", "web-user")
 
+
+# LLM HTTP 连接池（所有 LLM 客户端按提供商共享）
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# LLM 响应缓存（CachingLLMClient：内存 LRU + SQLite）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")  # 留空则只使用内存
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_DEFAULT_TTL = float(os.getenv("LLM_CACHE_DEFAULT_TTL", str(24 * 3600)))
+
+# 备用 OpenAI 兼容提供商（供路由对冲/故障转移使用）
+OPENAI_FALLBACK_BASE_URL = os.getenv("OPENAI_FALLBACK_BASE_URL", "").rstrip("/")
+OPENAI_FALLBACK_API_KEY  = os.getenv("OPENAI_FALLBACK_API_KEY", "")
+OPENAI_FALLBACK_MODEL    = os.getenv("OPENAI_FALLBACK_MODEL", OPENAI_MODEL)
+
+# 多提供商路由（LLM_PRIMARY=router 时启用），按优先级逗号分隔，如 "aliyun,openai_fallback,dify"
+LLM_ROUTER_PROVIDERS = [p.strip() for p in os.getenv("LLM_ROUTER_PROVIDERS", "").split(",") if p.strip()]
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "8"))            # 样本不足时的对冲等待（秒）
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # 使用 p95 作为对冲阈值所需的样本数
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))     # 连续失败多少次熔断
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # 熔断冷却（秒）
+
+# LLM 客户端限流（进程内共享令牌桶，0 表示不限）
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_RATE_BURST_SECONDS = float(os.getenv("LLM_RATE_BURST_SECONDS", "5"))
+LLM_RATE_COMPLETION_TOKENS = int(os.getenv("LLM_RATE_COMPLETION_TOKENS", "800"))  # 估算 TPM 时预留的输出 token
+
+# 批量评价摘要：每次 LLM 调用合并的景点数
+REVIEWS_BATCH_SIZE = int(os.getenv("REVIEWS_BATCH_SIZE", "10"))
+
+# 生成行程后的地理编码 / 价格 / 路线补全：进程内共享线程池大小
+ENRICH_MAX_WORKERS = int(os.getenv("ENRICH_MAX_WORKERS", "16"))
+ENRICH_GEOCODE_CONCURRENCY = int(os.getenv("ENRICH_GEOCODE_CONCURRENCY", "4"))  # 单趟行程同时在途的地理编码数
+# Nominatim 公共服务限 1 次/秒：进程内串行并保持最小间隔（秒）
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))
+
+# 异步任务模式（/api/trips/generate、/api/generate_trip 带 async=true）：后台线程池与排队上限
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))                  # 排队 + 执行中的任务上限，超出返回 503
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "3600"))          # 启动时超过该时长无更新的未完成任务视为中断
+JOB_EVENTS_POLL_INTERVAL = float(os.getenv("JOB_EVENTS_POLL_INTERVAL", "1"))  # SSE 查库间隔（秒）
+
+# 行程生成：概要与每日增强并发请求时，同一行程同时在途的 LLM 调用上限
+LLM_PLAN_CONCURRENCY = int(os.getenv("LLM_PLAN_CONCURRENCY", "4"))
+
+# 行程缓存：进程内 LRU + 共享层（sqlite 文件 / redis / memory 仅进程内）
+PLAN_CACHE_BACKEND = os.getenv("PLAN_CACHE_BACKEND", "sqlite")
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "plan_cache.db")
+PLAN_CACHE_REDIS_URL = os.getenv("PLAN_CACHE_REDIS_URL", "redis://localhost:6379/0")
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "50"))        # 内存层容量
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", str(6 * 3600)))             # 新鲜期（秒）
+PLAN_CACHE_STALE_TTL = float(os.getenv("PLAN_CACHE_STALE_TTL", str(24 * 3600)))  # 过期后仍可返回并后台刷新的时长
+PLAN_CACHE_MEMORY_TTL = float(os.getenv("PLAN_CACHE_MEMORY_TTL", "60"))        # 内存层多久回共享层确认一次
+PLAN_CACHE_REFRESH_LEASE = float(os.getenv("PLAN_CACHE_REFRESH_LEASE", "600"))  # 后台刷新租约时长
+# 行程片段缓存：行程概要与每日增强结果按输入内容哈希缓存（与行程缓存共用后端）
+PLAN_FRAGMENT_TTL = float(os.getenv("PLAN_FRAGMENT_TTL", str(24 * 3600)))
+PLAN_FRAGMENT_MAX_ENTRIES = int(os.getenv("PLAN_FRAGMENT_MAX_ENTRIES", "500"))
+# 行程地图缓存：按行程版本缓存 /trips/<id>/map 的结果（与行程缓存共用后端）
+TRIP_MAP_CACHE_TTL = float(os.getenv("TRIP_MAP_CACHE_TTL", str(7 * 24 * 3600)))
+TRIP_MAP_CACHE_MAX_ENTRIES = int(os.getenv("TRIP_MAP_CACHE_MAX_ENTRIES", "200"))
+# HTTP 响应：行程 / 地图 / 导出带内容哈希 ETag（If-None-Match 命中返回 304），较大的文本响应按 Accept-Encoding 压缩
+HTTP_COMPRESS_MIN_SIZE = int(os.getenv("HTTP_COMPRESS_MIN_SIZE", "1024"))  # 小于该字节数不压缩
+HTTP_GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+HTTP_BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "5"))          # 仅安装 brotli 时使用
+# 导出文件缓存：PDF / ICS 按行程内容哈希存盘，超过上限按最近访问淘汰；行程生成/调整后后台预渲染
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", "export_cache")
+EXPORT_CACHE_MAX_MB = float(os.getenv("EXPORT_CACHE_MAX_MB", "200"))
+EXPORT_PRERENDER = os.getenv("EXPORT_PRERENDER", "true").lower() in ("1", "true", "yes")
+EXPORT_PRERENDER_FORMATS = [f.strip() for f in os.getenv("EXPORT_PRERENDER_FORMATS", "pdf,ics").split(",") if f.strip()]
+EXPORT_PRERENDER_WORKERS = int(os.getenv("EXPORT_PRERENDER_WORKERS", "1"))
+# 批量导出（POST /api/trips/export，流式 ZIP）
+BULK_EXPORT_MAX_TRIPS = int(os.getenv("BULK_EXPORT_MAX_TRIPS", "500"))    # 单次导出的行程上限
+BULK_EXPORT_BATCH_SIZE = int(os.getenv("BULK_EXPORT_BATCH_SIZE", "50"))   # 每次查库读取的快照数
+# PDF 渲染进程池：工作进程启动时预加载样式与字体（0 表示不用进程池，在请求线程渲染）
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "30"))        # 单次渲染超时（秒，从开始渲染计时），超时后重建进程池
+PDF_RENDER_QUEUE_TIMEOUT = float(os.getenv("PDF_RENDER_QUEUE_TIMEOUT", "120"))  # 排队等待上限（秒），超过直接失败
+PDF_RENDER_WARMUP = os.getenv("PDF_RENDER_WARMUP", "true").lower() in ("1", "true", "yes")  # 应用启动时拉起工作进程
+
+# 行程缓存预热：按请求热度在低峰时段预生成 top-K 组合，并在过期前刷新
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "false").lower() in ("1", "true", "yes")  # 应用内定时运行
+WARMER_TOP_K = int(os.getenv("WARMER_TOP_K", "20"))
+WARMER_CONCURRENCY = int(os.getenv("WARMER_CONCURRENCY", "2"))             # 同时生成的行程数
+WARMER_MAX_LLM_CALLS = int(os.getenv("WARMER_MAX_LLM_CALLS", "200"))       # 单次运行的 LLM 调用预算
+WARMER_INTERVAL = float(os.getenv("WARMER_INTERVAL", "900"))               # 应用内运行间隔（秒）
+WARMER_OFFPEAK_HOURS = os.getenv("WARMER_OFFPEAK_HOURS", "1-6")            # 低峰时段（本地小时），此外只刷新已有条目
+WARMER_REFRESH_MARGIN = float(os.getenv("WARMER_REFRESH_MARGIN", "1800"))  # 剩余新鲜期不足该值时提前刷新
+WARMER_WINDOW_DAYS = float(os.getenv("WARMER_WINDOW_DAYS", "7"))           # 只统计最近 N 天出现过的请求
+
+# LLM 客户端注册表：启动预热、.env 变化时热加载（秒，0 表示不监听文件，仍可用 SIGHUP 触发）
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() in ("1", "true", "yes")
+LLM_RELOAD_INTERVAL = float(os.getenv("LLM_RELOAD_INTERVAL", "5"))
+LLM_POOL_RETIRE_GRACE = float(os.getenv("LLM_POOL_RETIRE_GRACE", "300"))  # 重载后不再使用的连接池延迟关闭，留给在途请求完成
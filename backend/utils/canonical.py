@@ -0,0 +1,113 @@
+"""
+请求参数规范化：城市别名、偏好同义词、交通方式别名
+等价的请求（北京/Beijing/北京市，历史/古迹）映射为同一组参数，
+使行程缓存、片段缓存与本地 POI 查找共用同一份结果
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# 规范名 -> 别名（英文/拼音按小写比较；"xx市" 会自动去掉后缀，无需列出）
+CITY_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "北京": ("beijing", "peking", "bj", "京"),
+    "上海": ("shanghai", "sh", "沪", "申城"),
+    "杭州": ("hangzhou", "hz"),
+    "成都": ("chengdu", "cd", "蓉城"),
+    "西安": ("xian", "xi'an", "xi an", "长安"),
+    "广州": ("guangzhou", "canton", "gz", "羊城"),
+    "深圳": ("shenzhen", "sz", "鹏城"),
+    "南京": ("nanjing", "nj", "金陵"),
+    "苏州": ("suzhou",),
+    "重庆": ("chongqing", "cq", "山城", "渝"),
+    "天津": ("tianjin", "tj", "津"),
+    "武汉": ("wuhan", "江城"),
+    "长沙": ("changsha", "星城"),
+    "厦门": ("xiamen", "amoy", "鹭岛"),
+    "青岛": ("qingdao", "tsingtao"),
+    "大连": ("dalian",),
+    "昆明": ("kunming", "春城"),
+    "丽江": ("lijiang",),
+    "大理": ("dali",),
+    "桂林": ("guilin",),
+    "三亚": ("sanya",),
+    "拉萨": ("lhasa", "lasa"),
+    "哈尔滨": ("harbin", "haerbin", "冰城"),
+    "香港": ("hong kong", "hongkong", "hk", "香港特别行政区"),
+    "澳门": ("macau", "macao", "澳门特别行政区"),
+    "台北": ("taipei",),
+}
+
+# 规范偏好 -> 同义词；规范名尽量使用 poi_data.json 中的标签，便于本地 POI 按偏好筛选
+PREFERENCE_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "历史": ("古迹", "历史古迹", "名胜古迹", "历史遗迹", "古建筑", "history", "historic", "historical", "heritage"),
+    "文化": ("人文", "文化体验", "历史文化", "culture", "cultural"),
+    "美食": ("小吃", "吃货", "餐饮", "美食探店", "特色美食", "food", "foodie", "cuisine"),
+    "自然": ("自然风光", "山水", "户外", "nature", "outdoor", "outdoors"),
+    "风景": ("风光", "景色", "观光", "scenery", "scenic", "sightseeing"),
+    "购物": ("逛街", "买买买", "商场", "shopping"),
+    "博物馆": ("展览", "museum", "museums"),
+    "夜景": ("夜生活", "夜游", "nightlife", "night view"),
+    "艺术": ("文艺", "art", "arts"),
+    "亲子": ("家庭", "带娃", "family", "kids"),
+    "休闲": ("放松", "慢游", "relax", "leisure"),
+    "宗教": ("寺庙", "寺院", "religion", "temple"),
+}
+
+# 交通方式别名 -> 与 MapService / POIService 一致的取值
+TRANSPORT_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "driving": ("drive", "car", "驾车", "自驾", "开车", "打车"),
+    "walking": ("walk", "步行", "徒步"),
+    "transit": ("public transport", "public_transport", "bus", "subway", "metro", "公交", "地铁", "公共交通"),
+    "bicycling": ("bicycle", "bike", "cycling", "骑行", "自行车"),
+}
+
+_CITY_SUFFIXES = ("特别行政区", "市")
+_LATIN_SUFFIX = re.compile(r"\s+(city|shi)$")
+
+
+def _lookup(table: Dict[str, Tuple[str, ...]]) -> Dict[str, str]:
+    index = {}
+    for canonical, aliases in table.items():
+        for alias in (canonical, *aliases):
+            index[alias.lower()] = canonical
+    return index
+
+
+_CITY_INDEX = _lookup(CITY_ALIASES)
+_PREFERENCE_INDEX = _lookup(PREFERENCE_SYNONYMS)
+_TRANSPORT_INDEX = _lookup(TRANSPORT_ALIASES)
+
+
+def canonical_city(city: str) -> str:
+    """城市规范名：别名表命中返回中文规范名，否则返回去掉空白与"市"后缀的原值"""
+    if not isinstance(city, str):
+        return city
+    name = " ".join(city.split())
+    if not name:
+        return name
+    key = name.lower()
+    if key in _CITY_INDEX:
+        return _CITY_INDEX[key]
+    for suffix in _CITY_SUFFIXES:
+        if name.endswith(suffix) and len(name) > len(suffix):
+            name = name[:-len(suffix)]
+            break
+    key = _LATIN_SUFFIX.sub("", name.lower())
+    return _CITY_INDEX.get(key, name)
+
+
+def canonical_preference(preference: str) -> str:
+    key = " ".join(preference.split()).lower()
+    return _PREFERENCE_INDEX.get(key, key)
+
+
+def canonical_preferences(preferences: Iterable[str] | None) -> List[str]:
+    """偏好规范化：同义词合并、去重、排序（偏好顺序不影响行程结果）"""
+    result = {canonical_preference(p) for p in (preferences or []) if isinstance(p, str) and p.strip()}
+    return sorted(result)
+
+
+def canonical_transport(transport_mode: str) -> str:
+    if not isinstance(transport_mode, str):
+        return transport_mode
+    key = transport_mode.strip().lower()
+    return _TRANSPORT_INDEX.get(key, key)
@@ -0,0 +1,53 @@
+"""不可变的 dict / list，用于在缓存与请求之间共享行程结构而无需深拷贝"""
+from typing import Any
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is immutable; use thaw() or .copy() to get a mutable copy")
+
+
+class FrozenDict(dict):
+    """
+    只读 dict：仍是 dict 子类，json/orjson/jsonify 可直接序列化；
+    .copy() 返回普通 dict（浅拷贝，子结构继续共享），即写时复制的入口
+    """
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """只读 list：仍是 list 子类，isinstance(x, list) 判断与序列化不受影响"""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+    __iadd__ = __imul__ = _readonly
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(data: Any) -> Any:
+    """递归转换为不可变结构；已冻结的子树直接复用，不再复制"""
+    if isinstance(data, (FrozenDict, FrozenList)):
+        return data
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return FrozenList(freeze(item) for item in data)
+    return data
+
+
+def thaw(data: Any) -> Any:
+    """递归转换为普通可变结构（需要就地修改整棵树时使用）"""
+    if isinstance(data, dict):
+        return {key: thaw(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [thaw(item) for item in data]
+    return data
@@ -0,0 +1,130 @@
+"""
+HTTP 条件请求与响应压缩
+- conditional_response()：按内容哈希生成强 ETag，If-None-Match 命中时返回 304
+- compress_response()：蓝图 after_request 钩子，按 Accept-Encoding 协商 br / gzip 压缩较大的文本响应；
+  同一内容的压缩结果按 (ETag, 编码) 缓存在进程内，重复请求不再重复压缩
+brotli 为可选依赖（pip install brotli），未安装时只提供 gzip。
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import Response, request
+
+import backend.settings as settings
+
+try:  # 可选依赖
+    import brotli
+except ImportError:  # pragma: no cover - 取决于部署环境
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+_ENCODING_SUFFIX = {'br': '-br', 'gzip': '-gz'}
+
+_compressed: "OrderedDict[tuple, bytes]" = OrderedDict()
+_compressed_lock = threading.Lock()
+_COMPRESSED_MAX_ENTRIES = 256
+
+
+def etag_for(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _matching_etag(etag: str) -> str | None:
+    """If-None-Match 中与当前内容一致的 ETag（忽略压缩后缀，弱比较），原样返回供 304 回显"""
+    if request.if_none_match.star_tag:
+        return etag
+    for tag in request.if_none_match.as_set(include_weak=True):
+        base = tag
+        for suffix in _ENCODING_SUFFIX.values():
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+                break
+        if base == etag:
+            return tag
+    return None
+
+
+def conditional_response(body: bytes, mimetype: str = 'application/json', status: int = 200,
+                         headers=None) -> Response:
+    """
+    带 ETag 的响应；GET/HEAD 请求的 If-None-Match 与当前内容一致时返回 304（无响应体）
+    Cache-Control: no-cache 让浏览器每次带 If-None-Match 回来确认，内容未变时只传输响应头
+    """
+    etag = etag_for(body)
+    if request.method in ('GET', 'HEAD') and status == 200:
+        matched = _matching_etag(etag)
+        if matched is not None:
+            response = Response(status=304)
+            response.set_etag(matched)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Accept-Encoding')
+            return response
+    response = Response(body, status=status, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def attachment_headers(filename: str) -> dict:
+    """下载文件名（含中文时按 RFC 6266 附带 filename*）"""
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii').strip() or 'download'
+    value = f'attachment; filename="{ascii_name}"'
+    if ascii_name != filename:
+        value += f"; filename*=UTF-8''{quote(filename)}"
+    return {'Content-Disposition': value}
+
+
+def _negotiate() -> str | None:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br'] > 0:
+        return 'br'
+    if accepted['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.HTTP_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.HTTP_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response: Response) -> Response:
+    """after_request：压缩足够大的文本响应；流式响应（SSE）、文件直传和已编码的响应原样返回"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < settings.HTTP_COMPRESS_MIN_SIZE:
+        return response
+    encoding = _negotiate()
+    if encoding is None:
+        return response
+
+    etag, _ = response.get_etag()
+    key = (etag, encoding) if etag else None
+    compressed = None
+    if key is not None:
+        with _compressed_lock:
+            compressed = _compressed.get(key)
+            if compressed is not None:
+                _compressed.move_to_end(key)
+    if compressed is None:
+        compressed = _compress(body, encoding)
+        if key is not None:
+            with _compressed_lock:
+                _compressed[key] = compressed
+                while len(_compressed) > _COMPRESSED_MAX_ENTRIES:
+                    _compressed.popitem(last=False)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # 不同编码的表示需要不同的强 ETag；比较 If-None-Match 时会去掉后缀
+        response.set_etag(etag + _ENCODING_SUFFIX[encoding])
+    return response
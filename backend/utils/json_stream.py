@@ -0,0 +1,131 @@
+"""增量 JSON 解析：边接收 LLM 流式输出边解析"""
+import json
+from typing import Any, Dict, List, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    """
+    逐段喂入文本，解析顶层 JSON 对象。
+
+    - 顶层对象中 array_key 数组的每个元素对象一旦闭合，feed() 立即返回它；
+    - 第一个 "{" 之前的内容（Markdown 代码块标记、说明文字）会被忽略；
+    - 响应被截断时，result() 会截到最后一个完整值并补齐括号，尽量恢复可用前缀。
+    """
+
+    def __init__(self, array_key: str | None = None):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self._root_start: int | None = None
+        self._root_end: int | None = None
+        # 栈帧：[括号类型, 当前键, 是否期待键, 是否为目标数组, 起始位置]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        # 最近一个可安全截断的位置及当时的括号栈
+        self._safe_cut: Tuple[int, List[str]] | None = None
+        self.items: List[Dict[str, Any]] = []
+
+    @property
+    def complete(self) -> bool:
+        return self._root_end is not None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """喂入一段文本，返回本次新闭合的数组元素"""
+        if self.complete or not chunk:
+            return []
+        self._text += chunk
+        emitted: List[Dict[str, Any]] = []
+        text = self._text
+        i = self._pos
+        while i < len(text) and not self.complete:
+            ch = text[i]
+            if self._root_start is None:
+                if ch == "{":
+                    self._root_start = i
+                    self._open("{", i)
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:i + 1]
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                self._open(ch, i)
+            elif ch in "}]":
+                frame = self._stack.pop()
+                parent = self._stack[-1] if self._stack else None
+                if parent is not None and parent[3] and ch == "}":
+                    item = self._loads(text[frame[4]:i + 1])
+                    if isinstance(item, dict):
+                        self.items.append(item)
+                        emitted.append(item)
+                if not self._stack:
+                    self._root_end = i + 1
+                else:
+                    self._mark_safe(i + 1)
+            elif ch == ":":
+                frame = self._stack[-1]
+                if frame[0] == "{" and self._last_string is not None:
+                    frame[1] = self._loads(self._last_string)
+                    frame[2] = False
+            elif ch == ",":
+                self._mark_safe(i)
+                frame = self._stack[-1]
+                if frame[0] == "{":
+                    frame[2] = True
+            i += 1
+        self._pos = i
+        return emitted
+
+    def result(self) -> Dict[str, Any]:
+        """返回完整解析结果；未闭合时返回恢复出的前缀，无可用内容时抛出 ValueError"""
+        if self._root_start is None:
+            raise ValueError(f"无法从响应中提取 JSON: {self._text[:120]}")
+        if self.complete:
+            return json.loads(self._text[self._root_start:self._root_end])
+        if self._safe_cut is None:
+            raise ValueError("响应在第一个完整字段之前被截断")
+        cut, stack = self._safe_cut
+        closers = "".join(_CLOSERS[kind] for kind in reversed(stack))
+        return json.loads(self._text[self._root_start:cut] + closers)
+
+    # ------------------------------------------------------------------
+    def _open(self, kind: str, pos: int) -> None:
+        parent = self._stack[-1] if self._stack else None
+        is_target = (
+            kind == "["
+            and self.array_key is not None
+            and parent is not None
+            and len(self._stack) == 1
+            and parent[1] == self.array_key
+        )
+        self._stack.append([kind, None, kind == "{", is_target, pos])
+        self._last_string = None
+        self._mark_safe(pos + 1)
+
+    def _mark_safe(self, cut: int) -> None:
+        # 只在 "{"/"[" 之后、"," 之前、闭合括号之后记录：这些位置之前都是完整的值
+        self._safe_cut = (cut, [frame[0] for frame in self._stack])
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from backend.utils.json_stream import IncrementalJSONParser
+
+
+def _feed(text, size=1, array_key="activities"):
+    parser = IncrementalJSONParser(array_key=array_key)
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.extend(parser.feed(text[start:start + size]))
+    return parser, emitted
+
+
+def test_nested_arrays_emit_only_target_items():
+    doc = {
+        "day_number": 1,
+        "activities": [
+            {"name": "故宫", "tags": ["古建", ["嵌套", []]], "tips": [{"text": "早到"}]},
+            {"name": "景山", "tags": []},
+        ],
+        "tips": [{"name": "不是活动"}],
+    }
+    text = json.dumps(doc, ensure_ascii=False)
+
+    parser, emitted = _feed(text)
+
+    assert emitted == doc["activities"]
+    assert parser.complete
+    assert parser.result() == doc
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    doc = {"activities": [
+        {"name": '引号 \\"}{ 与 ]', "description": 'a "quoted" {brace} [bracket] \\'},
+        {"name": "b"},
+    ]}
+    text = json.dumps(doc, ensure_ascii=False)
+
+    # 逐字符喂入，转义符与被转义的引号落在不同的片段里
+    parser, emitted = _feed(text)
+
+    assert emitted == doc["activities"]
+    assert parser.result() == doc
+
+
+def test_leading_markdown_is_ignored():
+    parser, emitted = _feed('```json\n{"activities": [{"name": "a"}]}\n```', size=7)
+
+    assert emitted == [{"name": "a"}]
+    assert parser.result() == {"activities": [{"name": "a"}]}
+
+
+def test_truncated_prefix_is_recovered():
+    text = '{"day_number": 1, "activities": [{"name": "a"}, {"name": "b", "description": "被截'
+
+    parser, emitted = _feed(text, size=5)
+
+    assert not parser.complete
+    assert emitted == [{"name": "a"}]
+    assert parser.items == [{"name": "a"}]
+    assert parser.result() == {"day_number": 1, "activities": [{"name": "a"}, {"name": "b"}]}
+
+
+def test_no_json_object_raises():
+    parser, _ = _feed("抱歉，我无法回答。")
+
+    with pytest.raises(ValueError):
+        parser.result()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from backend.services.ai_service import AIService
+from backend.services.llm.base import LLMClient
+from backend.services.llm.cache import CachingLLMClient, LLMResponseCache
+
+
+class StreamingClient(LLMClient):
+    name = "fake"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    async def chat(self, messages, model=None, temperature=0.7, force_json=False):
+        self.calls += 1
+        return "".join(self.chunks)
+
+    async def chat_stream(self, messages, model=None, temperature=0.7, force_json=False):
+        self.calls += 1
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _stream_json(chunks):
+    inner = StreamingClient(chunks)
+    client = CachingLLMClient(inner, LLMResponseCache(None), default_ttl=3600)
+    service = SimpleNamespace(llm_client=client, logger=logging.getLogger(__name__))
+
+    def call():
+        return asyncio.run(AIService._achat_json_stream(
+            service, "system", "user", array_key="activities", cache_ttl=3600, label="test"))
+    return inner, call
+
+
+def test_truncated_stream_is_not_cached():
+    # 达到 max_tokens 时回复在第二个活动中途被截断
+    inner, call = _stream_json(['{"activities": [{"name": "故宫"}, ', '{"name": "天'])
+
+    result, complete = call()
+    assert not complete
+    assert result["activities"][0] == {"name": "故宫"}
+
+    call()
+    assert inner.calls == 2
+
+
+def test_complete_stream_is_cached():
+    inner, call = _stream_json(['{"activities": [{"name": "故宫"}, ', '{"name": "天坛"}]}'])
+
+    first = call()
+    second = call()
+    assert first == second
+    assert first[1]
+    assert inner.calls == 1
+
+
+class ReplyClient(LLMClient):
+    name = "fake"
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    async def chat(self, messages, model=None, temperature=0.7, force_json=False):
+        self.calls += 1
+        return self.replies.pop(0)
+
+
+def _review_service(replies):
+    inner = ReplyClient(replies)
+    service = AIService.__new__(AIService)
+    service.logger = logging.getLogger(__name__)
+    service._llm_client = CachingLLMClient(inner, LLMResponseCache(None), default_ttl=3600)
+    return inner, service
+
+
+def test_malformed_review_reply_is_not_cached():
+    good = '{"rating": 4.8, "tags": ["古建"], "summary": "值得一去"}'
+    inner, service = _review_service(['{"rating": 4.8, "tags": [', good, '{"oops": 1}'])
+
+    assert service.get_reviews_summary("故宫", "北京") == service._default_review()
+    assert service.get_reviews_summary("故宫", "北京")["rating"] == 4.8
+    assert service.get_reviews_summary("故宫", "北京")["summary"] == "值得一去"
+    assert inner.calls == 2
+
+
+def test_review_batch_without_reviews_array_is_not_cached():
+    inner, service = _review_service(['{"items": []}', '{"reviews": [{"name": "故宫", "rating": 4.7}]}'])
+
+    cache = service._llm_client.cache
+    service._chat("system", "user", cache_ttl=3600, validate=service._json_has_key("reviews", list))
+    assert cache.stats()["writes"] == 0
+    service._chat("system", "user", cache_ttl=3600, validate=service._json_has_key("reviews", list))
+    assert cache.stats()["writes"] == 1
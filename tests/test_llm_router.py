@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.services.llm import router
+from backend.services.llm.base import LLMClient
+from backend.services.llm.router import CLOSED, HALF_OPEN, OPEN, RouterLLMClient
+
+
+class FakeClient(LLMClient):
+    def __init__(self, name, reply="ok", delay=0.0, error=None):
+        self.name = name
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def chat(self, messages, model=None, temperature=0.7, force_json=False):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+
+@pytest.fixture(autouse=True)
+def _fresh_health(monkeypatch):
+    # 健康状态按提供商名称进程内共享，每个测试从空表开始
+    monkeypatch.setattr(router, "_health", {})
+
+
+def _chat(client):
+    return asyncio.run(client.chat([{"role": "user", "content": "hi"}]))
+
+
+def test_hedge_fires_after_delay_and_faster_provider_wins():
+    slow = FakeClient("slow", reply="slow", delay=1.0)
+    fast = FakeClient("fast", reply="fast", delay=0.01)
+    client = RouterLLMClient([("slow", slow), ("fast", fast)], hedge_delay=0.1, min_samples=100)
+
+    start = time.monotonic()
+    assert _chat(client) == "fast"
+    elapsed = time.monotonic() - start
+
+    assert 0.1 <= elapsed < 0.5
+    assert fast.calls == 1
+    assert (client.hedges_sent, client.hedges_won) == (1, 1)
+    # 被取消的首选请求不算失败
+    assert client.health["slow"].consecutive_failures == 0
+
+
+def test_no_hedge_when_primary_answers_in_time():
+    primary = FakeClient("primary", reply="primary", delay=0.01)
+    backup = FakeClient("backup")
+    client = RouterLLMClient([("primary", primary), ("backup", backup)], hedge_delay=0.2, min_samples=100)
+
+    assert _chat(client) == "primary"
+    assert backup.calls == 0
+    assert client.hedges_sent == 0
+
+
+def test_breaker_opens_then_half_open_trial_closes_it():
+    flaky = FakeClient("flaky", error=RuntimeError("API error (503)"))
+    backup = FakeClient("backup", reply="backup")
+    client = RouterLLMClient([("flaky", flaky), ("backup", backup)], hedge_delay=5,
+                             failure_threshold=2, cooldown=0.2)
+    health = client.health["flaky"]
+
+    # 前两次失败后故障转移到备用提供商，第二次失败时熔断
+    assert _chat(client) == "backup"
+    assert health.state == CLOSED
+    assert _chat(client) == "backup"
+    assert health.state == OPEN
+
+    # 熔断期间不再请求该提供商
+    assert _chat(client) == "backup"
+    assert flaky.calls == 2
+
+    # 冷却后半开：只放行一个试探请求，成功后恢复
+    time.sleep(0.25)
+    flaky.error = None
+    assert _chat(client) == "ok"
+    assert flaky.calls == 3
+    assert health.state == CLOSED
+
+
+def test_half_open_allows_single_trial_and_failure_reopens():
+    client = RouterLLMClient([("flaky", FakeClient("flaky"))], failure_threshold=1, cooldown=0.1)
+    health = client.health["flaky"]
+
+    health.record_failure()
+    assert health.state == OPEN
+    assert not health.allow_request()
+
+    time.sleep(0.15)
+    assert health.allow_request()
+    assert health.state == HALF_OPEN
+    assert not health.allow_request()
+
+    health.record_failure()
+    assert health.state == OPEN
+    assert health.trips == 2
@@ -0,0 +1,48 @@
+import logging
+
+from backend.services.ai_service import AIService
+from backend.services.llm.base import LLMClient
+
+
+class ScriptedClient(LLMClient):
+    name = "fake"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    async def chat(self, messages, model=None, temperature=0.7, force_json=False):
+        self.calls += 1
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return self.reply
+
+
+def _service(reply):
+    client = ScriptedClient(reply)
+    service = AIService.__new__(AIService)
+    service.logger = logging.getLogger(__name__)
+    service._llm_client = client
+    return client, service
+
+
+NAMES = ["故宫", "天坛", "颐和园", "长城"]
+
+
+def test_transport_failure_does_not_split_batch():
+    client, service = _service(RuntimeError("API error (503): upstream unavailable"))
+
+    result = service.get_reviews_summaries(NAMES, "北京", batch_size=4)
+
+    assert client.calls == 1
+    assert result == {name: service._default_review() for name in NAMES}
+
+
+def test_malformed_reply_splits_batch():
+    client, service = _service('{"reviews": "none"}')
+
+    result = service.get_reviews_summaries(NAMES, "北京", batch_size=4)
+
+    # 4 -> 2 + 2 -> 1 x 4：整批与两个子批各一次，单个景点各一次
+    assert client.calls == 7
+    assert set(result) == set(NAMES)
@@ -0,0 +1,29 @@
+import asyncio
+import gc
+
+import pytest
+
+from backend.services.llm import transport
+
+
+def test_pools_of_finished_loops_are_dropped():
+    async def open_pool():
+        return transport.get_client("fake@http://example.invalid")
+
+    before = len(transport._clients)
+    first = asyncio.run(open_pool())
+    gc.collect()
+    second = asyncio.run(open_pool())
+
+    # 每个事件循环各有自己的连接池，循环结束后不再保留在表中
+    assert first is not second
+    gc.collect()
+    assert len(transport._clients) == before
+
+
+def test_run_sync_from_loop_thread_raises():
+    async def nested():
+        return transport.run_sync(asyncio.sleep(0))
+
+    with pytest.raises(RuntimeError):
+        transport.run_sync(nested())
@@ -0,0 +1,73 @@
+from datetime import date, time
+
+from backend.models import Route, Trip, db
+from backend.services import trip_patch, trip_writer
+
+
+def _insert_trip():
+    days = [{
+        "day_number": day, "date": date.today(), "description": f"第{day}天",
+        "activities": [{"name": f"景点{day}-{order}", "order": order, "start_time": time(8 + order)}
+                       for order in range(1, 4)],
+        "routes": [{"from": 0, "to": 1, "duration_minutes": 10}, {"from": 1, "to": 2, "duration_minutes": 10}],
+    } for day in (1, 2)]
+    return db.session.get(Trip, trip_writer.insert_trip({"city": "北京", "days": 2, "preferences": "[]"}, days))
+
+
+def _route_ids(activity_ids):
+    return {r.id for r in Route.query.filter(db.or_(Route.from_activity_id.in_(activity_ids),
+                                                    Route.to_activity_id.in_(activity_ids)))}
+
+
+def test_remove_activity_with_routes_under_foreign_keys(app):
+    trip = _insert_trip()
+    day1 = trip.days_plans[0]
+    middle = sorted(day1.activities, key=lambda a: a.order)[1]
+    day2_ids = [a.id for a in trip.days_plans[1].activities]
+
+    summary = trip_patch.apply_to_db(trip, [{"op": "remove", "day": 1, "activity": str(middle.id), "field": None}])
+
+    assert summary == {"applied": 1, "days": [1]}
+    assert [a.name for a in db.session.get(Trip, trip.id).days_plans[0].activities] == ["景点1-1", "景点1-3"]
+    assert not _route_ids([middle.id])
+    # 未涉及的天保留已有路线
+    assert len(_route_ids(day2_ids)) == 2
+
+
+def test_move_activity_drops_routes_of_both_days(app):
+    trip = _insert_trip()
+    moved = sorted(trip.days_plans[0].activities, key=lambda a: a.order)[0]
+    all_ids = [a.id for dp in trip.days_plans for a in dp.activities]
+
+    trip_patch.apply_to_db(trip, [{"op": "move", "day": 2, "activity": "-", "field": None,
+                                   "from_day": 1, "from_activity": str(moved.id)}])
+
+    trip = db.session.get(Trip, trip.id)
+    assert len(trip.days_plans[0].activities) == 2
+    assert moved.id in [a.id for a in trip.days_plans[1].activities]
+    assert not _route_ids(all_ids)
+
+
+def test_addresses_are_geocoded_before_writing(app):
+    trip = _insert_trip()
+    first = sorted(trip.days_plans[0].activities, key=lambda a: a.order)[0]
+    all_ids = [a.id for dp in trip.days_plans for a in dp.activities]
+    looked_up = []
+
+    def geocode(address):
+        # 外部请求期间事务中还没有任何写入
+        assert len(_route_ids(all_ids)) == 4
+        assert not db.session.dirty and not db.session.new
+        looked_up.append(address)
+        return {"latitude": 39.9, "longitude": 116.4}
+
+    trip_patch.apply_to_db(trip, [
+        {"op": "replace", "day": 1, "activity": str(first.id), "field": "address", "value": "景山前街4号"},
+        {"op": "add", "day": 2, "activity": "-", "field": None,
+         "value": {"name": "天坛", "address": "景山前街4号", "start_time": "15:00"}},
+    ], geocode=geocode)
+
+    assert looked_up == ["景山前街4号"]
+    trip = db.session.get(Trip, trip.id)
+    assert db.session.get(type(first), first.id).latitude == 39.9
+    assert [a.latitude for a in trip.days_plans[1].activities if a.name == "天坛"] == [39.9]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark per-call LLM latency: new client per call vs. shared pool.
+
+Usage::
+
+    PYTHONPATH=. python tools/bench_llm_transport.py [--calls 50] [--delay-ms 20]
+
+Starts a local stand-in for an OpenAI-compatible ``/v1/chat/completions``
+endpoint and compares:
+
+* ``before`` — a fresh ``httpx.AsyncClient`` per call (the old behaviour of
+  ``OpenAICompat.chat`` / ``DifyClient.chat``), i.e. a new TCP connection
+  for every request;
+* ``after``  — ``OpenAICompat.chat`` using the shared keep-alive pool from
+  ``backend.services.llm.transport``.
+
+The stand-in server is plain HTTP, so the numbers only include the TCP
+handshake; against a real TLS endpoint the gap is considerably larger.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from backend.services.llm import transport
+from backend.services.llm.openai_compat import OpenAICompat
+
+REPLY = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+
+
+def _make_handler(delay: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 允许 keep-alive
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(REPLY)))
+            self.end_headers()
+            self.wfile.write(REPLY)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def _summary(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    return (f"mean={statistics.mean(samples) * 1000:7.2f}ms  "
+            f"p50={statistics.median(samples) * 1000:7.2f}ms  "
+            f"p95={p95 * 1000:7.2f}ms")
+
+
+async def _bench_before(url: str, calls: int) -> list[float]:
+    payload = {"model": "bench", "messages": [{"role": "user", "content": "hi"}]}
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=60) as client:
+            r = await client.post(url, json=payload)
+            r.json()["choices"][0]["message"]["content"]
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def _bench_after(base_url: str, calls: int) -> list[float]:
+    client = OpenAICompat(base_url, "bench-key", "bench")
+    messages = [{"role": "user", "content": "hi"}]
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await client.chat(messages)
+        samples.append(time.perf_counter() - start)
+    await transport.aclose()
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=0.0,
+                        help="simulated server-side model latency")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args.delay_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    before = asyncio.run(_bench_before(f"{base_url}/chat/completions", args.calls))
+    after = asyncio.run(_bench_after(base_url, args.calls))
+    server.shutdown()
+
+    print(f"calls={args.calls} server_delay={args.delay_ms}ms")
+    print(f"before (client per call): {_summary(before)}")
+    print(f"after  (shared pool)    : {_summary(after)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark concurrent PDF exports: in-thread reportlab vs. the warmed process pool.
+
+Usage::
+
+    PYTHONPATH=. python tools/bench_pdf_export.py [--days 7] [--per-day 5] [--exports 40] [--concurrency 1,4,8] [--workers 4]
+
+Renders ``--exports`` synthetic trips from ``--concurrency`` client threads
+(like Flask worker threads serving ``POST /api/trips/<id>/export``) and reports
+throughput and latency for:
+
+* ``before`` — ``ExportService().export_to_pdf()`` in the request thread,
+  rebuilding the style sheet on every call (the original code path);
+* ``after``  — ``PdfRenderer.render()`` on a ``--workers`` process pool whose
+  workers built their styles and rendered a warm-up document at start-up.
+
+``probe ms`` is the median latency of a small CPU-bound task (serialising a
+trip dict) run by a separate thread during the exports — i.e. how much the
+rendering slows down everything else in the same process through the GIL.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.services.export_service import ExportService, pdf_styles
+from backend.services.pdf_renderer import PdfRenderer
+
+
+def _make_trip(days: int, per_day: int, seed: int):
+    return {
+        "city": f"City{seed}", "days": days, "pace": "中庸", "transport_mode": "driving", "priority": "效率优先",
+        "days_plans": [{
+            "day_number": day, "description": f"Day {day} overview " * 8,
+            "activities": [{
+                "start_time": f"{8 + 2 * order:02d}:00", "end_time": f"{9 + 2 * order:02d}:00",
+                "name": f"Sight {day}-{order}", "address": f"{order} Some Road, District {day}", "type": "culture",
+            } for order in range(per_day)],
+        } for day in range(1, days + 1)],
+    }
+
+
+def _run(render, trips, concurrency: int):
+    latencies = []
+    probe = []
+    stop = threading.Event()
+
+    def _probe():
+        sample = trips[0]
+        while not stop.is_set():
+            start = time.perf_counter()
+            for _ in range(20):
+                json.dumps(sample)
+            probe.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    def _one(trip):
+        start = time.perf_counter()
+        render(trip)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    prober = threading.Thread(target=_probe, daemon=True)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(_one, trips))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return len(trips) / elapsed, statistics.median(latencies), p95, statistics.median(probe) if probe else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--per-day", type=int, default=5)
+    parser.add_argument("--exports", type=int, default=40)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    trips = [_make_trip(args.days, args.per_day, i) for i in range(args.exports)]
+
+    def before(trip):
+        pdf_styles.cache_clear()
+        return ExportService().export_to_pdf(trip).getvalue()
+
+    renderer = PdfRenderer(args.workers, timeout=60)
+    warm_start = time.perf_counter()
+    renderer.warm_up()
+    print(f"pool warm-up: {args.workers} workers in {time.perf_counter() - warm_start:.2f}s")
+    print(f"{args.exports} exports, {args.days} days x {args.per_day} activities")
+    print(f"{'path':<7} {'threads':>7} {'pdf/s':>8} {'median ms':>10} {'p95 ms':>8} {'probe ms':>9}")
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            for label, render in (("before", before), ("after", renderer.render)):
+                rate, median, p95, probe = _run(render, trips, concurrency)
+                print(f"{label:<7} {concurrency:>7} {rate:>8.1f} {median:>10.1f} {p95:>8.1f} {probe:>9.2f}")
+    finally:
+        renderer.shutdown()
+
+
+if __name__ == "__main__":
+    main()
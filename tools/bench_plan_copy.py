@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark plan copying: JSON round-trip deep copies vs. frozen plans.
+
+Usage::
+
+    PYTHONPATH=. python tools/bench_plan_copy.py [--repeat 200]
+
+Builds synthetic 1/7/30-day plans (4 activities per day) and times the
+copies ``AIService`` makes per request:
+
+* ``before`` — ``json.loads(json.dumps(...))`` round trips: base itinerary
+  and every day in ``_merge_itinerary``/``_merge_day``, once more on cache
+  write, and once on every cache hit;
+* ``after``  — frozen plans: merges copy only the dicts they change,
+  ``freeze()`` runs once on cache write and a cache hit copies the top level.
+
+Both sides then serialise the response once with ``json.dumps`` (what
+Flask's ``jsonify`` does), so that cost is reported separately.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+
+from backend.services.ai_service import AIService
+from backend.utils.frozen import freeze
+
+ACTIVITIES_PER_DAY = 4
+
+
+def _deep_copy(data):
+    return json.loads(json.dumps(data, ensure_ascii=False))
+
+
+def _make_plans(days: int):
+    base = {"city": "北京", "total_days": days, "pace": "中庸", "transport_mode": "driving", "days": []}
+    ai_days = []
+    for day in range(1, days + 1):
+        activities, ai_activities = [], []
+        for order in range(1, ACTIVITIES_PER_DAY + 1):
+            activities.append({
+                "name": f"景点{day}-{order}", "type": "文化", "address": f"北京市东城区某路{order}号",
+                "latitude": 39.9 + order / 100, "longitude": 116.4 + order / 100,
+                "start_time": "09:00", "end_time": "11:00", "duration_minutes": 120,
+                "description": "基础描述", "rating": 4.5, "price_range": "$", "price_estimate": 50,
+                "tags": ["历史", "文化"], "order": order,
+            })
+            ai_activities.append({
+                "name": f"景点{day}-{order}", "order": order,
+                "description": "这里是一段八十到一百二十字的详细描述，介绍景点特色、体验内容、适合人群与拍照建议。" * 2,
+                "tags": ["历史", "文化", "摄影", "亲子"], "tips": ["提前预约", "避开高峰"],
+                "price_estimate": 80, "price_range": "$$", "rating": 4.7,
+            })
+        base["days"].append({"day_number": day, "description": f"第{day}天", "activities": activities})
+        ai_days.append({"day_number": day, "description": "当日概述" * 10, "theme": "文化探索",
+                        "activities": ai_activities})
+    ai_plan = {"summary": "行程概要" * 40, "tips": ["贴士"] * 5, "days": ai_days}
+    return base, ai_plan
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    service = AIService.__new__(AIService)  # 只用到合并方法，不初始化外部服务
+
+    def merge_before(base, ai_plan):
+        copied = _deep_copy(base)
+        for day in copied["days"]:
+            _deep_copy(day)
+        return service._merge_itinerary(copied, ai_plan, [])
+
+    print(f"{'days':>4} {'op':<12} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for days in (1, 7, 30):
+        base, ai_plan = _make_plans(days)
+        merged = service._merge_itinerary(base, ai_plan, [])
+        frozen = freeze(merged)
+        rows = [
+            ("merge", _time(lambda: merge_before(base, ai_plan), args.repeat),
+             _time(lambda: service._merge_itinerary(base, ai_plan, []), args.repeat)),
+            ("cache write", _time(lambda: _deep_copy(merged), args.repeat),
+             _time(lambda: freeze(merged), args.repeat)),
+            ("cache hit", _time(lambda: _deep_copy(merged), args.repeat),
+             _time(lambda: frozen.copy(), args.repeat)),
+            ("serialise", _time(lambda: json.dumps(merged, ensure_ascii=False), args.repeat),
+             _time(lambda: json.dumps(frozen, ensure_ascii=False), args.repeat)),
+        ]
+        for op, before, after in rows:
+            print(f"{days:>4} {op:<12} {before:>10.3f} {after:>10.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Benchmark persisting a generated trip: per-row ORM flushes vs. bulk insert.
+
+Usage::
+
+    PYTHONPATH=. python tools/bench_trip_persist.py [--days 30] [--per-day 4] [--repeat 20]
+
+Writes a synthetic ``--days`` x ``--per-day`` trip (with a route between
+every pair of consecutive activities) into a fresh SQLite file and compares:
+
+* ``before`` — the old ``generate_trip`` write path: ``flush()`` after every
+  ``DayPlan`` and ``Activity`` and an ``Activity.query.filter_by(order=n-1)``
+  lookup for the previous activity of each route;
+* ``after``  — ``trip_writer.insert_trip``: ids assigned in memory and one
+  ``executemany`` per table, in a single transaction.
+
+Statement counts come from a SQLAlchemy ``before_cursor_execute`` listener;
+an ``executemany`` counts as one statement.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+from flask import Flask
+from sqlalchemy import event
+
+from backend.models import Activity, DayPlan, Route, Trip, db
+from backend.services import trip_writer
+
+TRIP_FIELDS = {"city": "北京", "preferences": json.dumps(["历史"], ensure_ascii=False), "pace": "中庸",
+               "transport_mode": "driving", "priority": "效率优先"}
+
+
+def _make_days(days: int, per_day: int):
+    result = []
+    for day in range(1, days + 1):
+        activities = [{
+            "name": f"景点{day}-{order}", "type": "文化", "address": f"北京市东城区某路{order}号",
+            "latitude": 39.9 + order / 100, "longitude": 116.4 + order / 100,
+            "start_time": dtime(9 + 2 * (order - 1)), "end_time": dtime(10 + 2 * (order - 1)),
+            "duration_minutes": 60, "description": "描述" * 20, "rating": 4.5, "price_range": "$$",
+            "price_estimate": 50, "tags": json.dumps(["历史", "文化"], ensure_ascii=False), "order": order,
+        } for order in range(1, per_day + 1)]
+        routes = [{"from": i - 1, "to": i, "transport_mode": "driving", "duration_minutes": 15,
+                   "distance_km": 3.2, "route_data": json.dumps([[39.9, 116.4], [39.91, 116.41]])}
+                  for i in range(1, per_day)]
+        result.append({"day_number": day, "date": date.today() + timedelta(days=day - 1),
+                       "description": f"第{day}天", "activities": activities, "routes": routes})
+    return result
+
+
+def persist_before(days):
+    """原 generate_trip 的写法（去掉外部调用）"""
+    trip = Trip(days=len(days), **TRIP_FIELDS)
+    db.session.add(trip)
+    db.session.flush()
+    for day in days:
+        day_plan = DayPlan(trip_id=trip.id, day_number=day["day_number"], date=day["date"],
+                           description=day["description"])
+        db.session.add(day_plan)
+        db.session.flush()
+        routes = {leg["to"]: leg for leg in day["routes"]}
+        for index, act in enumerate(day["activities"]):
+            activity = Activity(day_plan_id=day_plan.id, **act)
+            db.session.add(activity)
+            db.session.flush()
+            if activity.order > 1:
+                prev_activity = Activity.query.filter_by(day_plan_id=day_plan.id, order=activity.order - 1).first()
+                if prev_activity and index in routes:
+                    leg = {k: v for k, v in routes[index].items() if k not in ("from", "to")}
+                    db.session.add(Route(from_activity_id=prev_activity.id, to_activity_id=activity.id, **leg))
+    db.session.commit()
+    return trip.id
+
+
+def persist_after(days):
+    return trip_writer.insert_trip({"days": len(days), **TRIP_FIELDS}, days)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    db.init_app(app)
+    days = _make_days(args.days, args.per_day)
+    activities = args.days * args.per_day
+
+    with app.app_context():
+        db.create_all()
+        statements = {"count": 0}
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *a, **k: statements.__setitem__("count", statements["count"] + 1))
+
+        print(f"{args.days} days x {args.per_day} activities ({activities} activities, "
+              f"{args.days * (args.per_day - 1)} routes), {args.repeat} runs")
+        print(f"{'path':<7} {'median ms':>10} {'p95 ms':>8} {'statements':>11}")
+        for label, persist in (("before", persist_before), ("after", persist_after)):
+            samples = []
+            for _ in range(args.repeat):
+                statements["count"] = 0
+                start = time.perf_counter()
+                persist(days)
+                samples.append((time.perf_counter() - start) * 1000)
+                db.session.remove()
+            samples.sort()
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(f"{label:<7} {statistics.median(samples):>10.2f} {p95:>8.2f} {statements['count']:>11}")
+
+        counts = {model.__tablename__: db.session.query(model).count() for model in (Trip, DayPlan, Activity, Route)}
+        print("rows:", counts)
+
+
+if __name__ == "__main__":
+    main()
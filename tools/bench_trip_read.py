@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark GET /api/trips/<id>: ORM to_dict() vs. stored orjson snapshot.
+
+Usage::
+
+    PYTHONPATH=. python tools/bench_trip_read.py [--days 30] [--per-day 4] [--repeat 200]
+
+Writes a synthetic ``--days`` x ``--per-day`` trip into a fresh SQLite file
+with ``trip_writer.insert_trip`` (which also renders the snapshot) and times
+the response body each path produces, with a fresh session per request:
+
+* ``before`` — ``Trip.query.get()`` + ``to_dict()`` (lazy-loads every day's
+  activities, ``json.loads`` on tags, ``strftime`` on times) + ``jsonify``;
+* ``after``  — ``trip_snapshot.get()``: one ``SELECT snapshot`` and the bytes
+  are returned as they are.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+from flask import Flask, Response, jsonify
+from sqlalchemy import event
+
+from backend.models import Trip, db
+from backend.services import trip_snapshot, trip_writer
+
+
+def _make_days(days: int, per_day: int):
+    return [{
+        "day_number": day, "date": date.today() + timedelta(days=day - 1), "description": f"第{day}天行程概述" * 5,
+        "activities": [{
+            "name": f"景点{day}-{order}", "type": "文化", "address": f"北京市东城区某路{order}号",
+            "latitude": 39.9 + order / 100, "longitude": 116.4 + order / 100,
+            "start_time": dtime(9 + 2 * (order - 1)), "end_time": dtime(10 + 2 * (order - 1)),
+            "duration_minutes": 60, "description": "描述" * 60, "rating": 4.5, "price_range": "$$",
+            "price_estimate": 50, "tags": json.dumps(["历史", "文化", "必游"], ensure_ascii=False), "order": order,
+        } for order in range(1, per_day + 1)],
+        "routes": [],
+    } for day in range(1, days + 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db.init_app(app)
+
+    def before(trip_id):
+        return jsonify(Trip.query.get(trip_id).to_dict()).get_data()
+
+    def after(trip_id):
+        return Response(trip_snapshot.get(trip_id), mimetype="application/json").get_data()
+
+    with app.app_context():
+        db.create_all()
+        trip_id = trip_writer.insert_trip({"city": "北京", "days": args.days, "preferences": "[]"},
+                                          _make_days(args.days, args.per_day))
+        statements = {"count": 0}
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *a, **k: statements.__setitem__("count", statements["count"] + 1))
+
+        print(f"{args.days} days x {args.per_day} activities, {args.repeat} requests")
+        print(f"{'path':<7} {'median ms':>10} {'p95 ms':>8} {'queries':>8} {'bytes':>8}")
+        with app.test_request_context():
+            for label, read in (("before", before), ("after", after)):
+                samples = []
+                for _ in range(args.repeat):
+                    db.session.remove()
+                    statements["count"] = 0
+                    start = time.perf_counter()
+                    body = read(trip_id)
+                    samples.append((time.perf_counter() - start) * 1000)
+                samples.sort()
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+                print(f"{label:<7} {statistics.median(samples):>10.3f} {p95:>8.3f} "
+                      f"{statements['count']:>8} {len(body):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -88,7 +88,7 @@ async def generate_itinerary(
     """
     logger.info("MCP tool generate_itinerary called: city=%s, days=%s", city, days)
     pref_list = _parse_preferences(preferences)
-    itinerary = ai_service.generate_trip_plan(
+    itinerary = await ai_service.generate_trip_plan_async(
         city=city,
         days=int(days),
         preferences=pref_list,
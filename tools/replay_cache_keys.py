@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Replay a trip request log against the plan cache key functions.
+
+Usage::
+
+    PYTHONPATH=. python tools/replay_cache_keys.py [--log requests.jsonl]
+        [--capacity 50] [--synthetic 5000] [--seed 7]
+
+``--log`` is a JSONL file with one ``/api/trips/generate`` body per line
+(``city``, ``days``, ``preferences``, ``pace``, ``transport_mode``,
+``priority``).  Without it a synthetic log is generated in which users spell
+the same trip in different ways (北京/Beijing/北京市, 历史/古迹, 驾车/driving,
+preferences in any order).
+
+Each request is replayed through an LRU of ``--capacity`` entries (the
+memory tier, ``PLAN_CACHE_MAX_ENTRIES``) and an unbounded cache (the shared
+tier), comparing:
+
+* ``before`` — the old key: values only stripped and lower-cased;
+* ``after``  — ``AIService._cache_key`` with city aliases, preference
+  synonyms and transport aliases from ``backend.utils.canonical``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from collections import OrderedDict
+
+from backend import settings
+from backend.services.ai_service import AIService
+
+_SPELLINGS = {
+    "北京": ["北京", "北京市", "Beijing", "beijing", "BEIJING "],
+    "上海": ["上海", "上海市", "Shanghai", "shanghai"],
+    "杭州": ["杭州", "杭州市", "Hangzhou"],
+    "成都": ["成都", "成都市", "Chengdu"],
+    "西安": ["西安", "西安市", "Xi'an", "xian"],
+}
+_PREFERENCES = [["历史", "古迹", "history"], ["美食", "小吃", "food"], ["文化", "人文"], ["自然", "山水", "nature"]]
+_TRANSPORT = [["driving", "驾车", "自驾"], ["transit", "公共交通", "地铁"], ["walking", "步行"]]
+
+
+def _legacy_key(city, days, preferences, pace, transport_mode, priority):
+    """本次改动之前的 AIService._cache_key"""
+    pref_key = tuple(sorted(p.strip().lower() for p in (preferences or []) if isinstance(p, str)))
+    return (city.strip().lower(), int(days), pref_key, pace.strip().lower(),
+            transport_mode.strip().lower(), priority.strip().lower())
+
+
+def _synthetic_log(count: int, seed: int):
+    rng = random.Random(seed)
+    cities = list(_SPELLINGS)
+    # 热门城市与常见组合占多数，模拟真实流量的长尾分布
+    weights = [0.35, 0.25, 0.15, 0.15, 0.10]
+    for _ in range(count):
+        city = rng.choices(cities, weights)[0]
+        groups = rng.sample(_PREFERENCES, rng.choice([1, 1, 2]))
+        preferences = [rng.choice(group) for group in groups]
+        rng.shuffle(preferences)
+        yield {
+            "city": rng.choice(_SPELLINGS[city]),
+            "days": rng.choice([2, 3, 3, 3, 4, 5]),
+            "preferences": preferences,
+            "pace": "中庸",
+            "transport_mode": rng.choice(rng.choices(_TRANSPORT, [0.6, 0.3, 0.1])[0]),
+            "priority": rng.choice(["效率优先", "效率优先", "价格优先"]),
+        }
+
+
+def _load_log(path: str):
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _replay(requests, key_fn, capacity: int):
+    lru: OrderedDict = OrderedDict()
+    seen = set()
+    lru_hits = shared_hits = 0
+    for req in requests:
+        key = key_fn(req["city"], req.get("days", 3), req.get("preferences") or [],
+                     req.get("pace", "中庸"), req.get("transport_mode", "driving"), req.get("priority", "效率优先"))
+        if key in lru:
+            lru_hits += 1
+            lru.move_to_end(key)
+        else:
+            lru[key] = True
+            if len(lru) > capacity:
+                lru.popitem(last=False)
+        if key in seen:
+            shared_hits += 1
+        seen.add(key)
+    total = len(requests) or 1
+    return len(seen), lru_hits / total, shared_hits / total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", help="JSONL request log; synthetic traffic when omitted")
+    parser.add_argument("--capacity", type=int, default=settings.PLAN_CACHE_MAX_ENTRIES)
+    parser.add_argument("--synthetic", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    requests = list(_load_log(args.log) if args.log else _synthetic_log(args.synthetic, args.seed))
+    service = AIService.__new__(AIService)  # 只用到 _cache_key，不初始化外部服务
+
+    print(f"{len(requests)} requests, memory tier capacity {args.capacity}")
+    print(f"{'key':<7} {'distinct':>9} {'memory hit':>11} {'shared hit':>11}")
+    for label, key_fn in (("before", _legacy_key), ("after", service._cache_key)):
+        distinct, lru_rate, shared_rate = _replay(requests, key_fn, args.capacity)
+        print(f"{label:<7} {distinct:>9} {lru_rate:>10.1%} {shared_rate:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Pre-generate popular trip plans into the shared plan cache.
+
+Usage::
+
+    PYTHONPATH=. python tools/warm_plan_cache.py [--top-k 20] [--concurrency 2]
+        [--max-llm-calls 200] [--force] [--dry-run]
+
+Reads the request frequencies ``AIService.generate_trip_plan`` records in the
+``plan_requests`` table (same SQLite file as the plan cache), then generates
+the top-K combinations that are missing from the cache or whose fresh period
+ends within ``WARMER_REFRESH_MARGIN`` seconds.
+
+Outside ``WARMER_OFFPEAK_HOURS`` only entries that already exist are
+refreshed; ``--force`` also fills cold entries.  Generation stops taking new
+work once the LLM call budget is spent.  Intended to run from cron during
+off-peak hours; the app can run the same job in-process (``WARMER_ENABLED``).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from backend import settings
+from backend.services.ai_service import AIService
+from backend.services.cache_warmer import CacheWarmer, in_offpeak
+from backend.services.llm import transport
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=settings.WARMER_TOP_K)
+    parser.add_argument("--concurrency", type=int, default=settings.WARMER_CONCURRENCY)
+    parser.add_argument("--max-llm-calls", type=int, default=settings.WARMER_MAX_LLM_CALLS)
+    parser.add_argument("--force", action="store_true", help="ignore WARMER_OFFPEAK_HOURS and fill cold entries")
+    parser.add_argument("--dry-run", action="store_true", help="only list the combinations that would be generated")
+    args = parser.parse_args()
+
+    warmer = CacheWarmer(AIService(), top_k=args.top_k, concurrency=args.concurrency,
+                         max_llm_calls=args.max_llm_calls)
+    offpeak = True if args.force else in_offpeak(settings.WARMER_OFFPEAK_HOURS)
+
+    if args.dry_run:
+        targets = warmer.plan(offpeak)
+        print(f"{'hits':>5} {'reason':<9} params")
+        for target in targets:
+            print(f"{target['hits']:>5} {target['reason']:<9} {json.dumps(target['params'], ensure_ascii=False)}")
+        print(f"{len(targets)} combination(s), offpeak={offpeak}")
+        return
+
+    try:
+        report = transport.run_sync(warmer.run(offpeak))
+    finally:
+        transport.shutdown()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()